@@ -93,186 +93,187 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'csp.middleware.CSPMiddleware',
     'trading_hub.middleware.IPAllowlistMiddleware',
-]   'trading_hub.middleware.performance.PerformanceMonitorMiddleware',  # Add performance middleware
+    'trading_hub.middleware.metrics.RequestMetricsMiddleware',  # Per-endpoint latency histograms (REQUEST_METRICS_SAMPLE_RATE)
+    'trading_hub.middleware.query_budget.QueryBudgetMiddleware',  # Per-view query budgets (QUERY_BUDGET_MODE)
+    'trading_hub.middleware.performance.PerformanceMonitorMiddleware',  # Add performance middleware
 ]
+
 ROOT_URLCONF = 'the_bit_hub_project.urls'
-ROOT_URLCONF = 'the_bit_hub_project.urls'
+
 TEMPLATES = [
-    {ATES = [
+    {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],  # Add project-level templates directory
-        'APP_DIRS': True,join(BASE_DIR, 'templates')],  # Add project-level templates directory
-        'OPTIONS': {True,
+        'APP_DIRS': True,
+        'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'trading_hub.context_processors.current_year',ssages',
-            ],  'trading_hub.context_processors.current_year',
-        },  ],
-    },  },
-]   },
+                'trading_hub.context_processors.current_year',
+            ],
+        },
+    },
 ]
-WSGI_APPLICATION = 'the_bit_hub_project.wsgi.application'
+
 WSGI_APPLICATION = 'the_bit_hub_project.wsgi.application'
 
+
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
-# https://docs.djangoproject.com/en/4.1/ref/settings/#databases
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',lite3',
-    }   'NAME': BASE_DIR / 'db.sqlite3',
-}   }
+        'NAME': BASE_DIR / 'db.sqlite3',
+    }
 }
+
 # Database configuration with connection pooling for production
 if not DEBUG:
     try:
-        import psycopg2# https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
+        import psycopg2
         import django_db_geventpool
-        PASSWORD_VALIDATORS = [
         DATABASES = {
-            'default': {  'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
-                'ENGINE': 'django_db_geventpool.backends.postgresql_psycopg2',,
+            'default': {
+                'ENGINE': 'django_db_geventpool.backends.postgresql_psycopg2',
                 'NAME': os.environ.get('DB_NAME', 'bithub'),
-                'USER': os.environ.get('DB_USER', 'bithub_user'),  'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
-                'PASSWORD': os.environ.get('DB_PASSWORD', ''),,
+                'USER': os.environ.get('DB_USER', 'bithub_user'),
+                'PASSWORD': os.environ.get('DB_PASSWORD', ''),
                 'HOST': os.environ.get('DB_HOST', 'localhost'),
-                'PORT': os.environ.get('DB_PORT', '5432'),  'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
-                'ATOMIC_REQUESTS': False,,
+                'PORT': os.environ.get('DB_PORT', '5432'),
+                'ATOMIC_REQUESTS': False,
                 'CONN_MAX_AGE': 0,
-                'OPTIONS': {  'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
-                    'MAX_CONNS': 20,  # Max number of connections in the pool   },
-                }]
+                'OPTIONS': {
+                    'MAX_CONNS': 20,  # Max number of connections in the pool
+                }
             }
         }
         print("Using PostgreSQL with connection pooling")
-    except ImportError:# https://docs.djangoproject.com/en/4.1/topics/i18n/
+    except ImportError:
         print("Connection pooling requires django_db_geventpool")
-LANGUAGE_CODE = 'en-us'
 
-# Password validationTIME_ZONE = 'UTC'
+
+# Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
-USE_I18N = True
+
 AUTH_PASSWORD_VALIDATORS = [
-    {USE_TZ = True
+    {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',# https://docs.djangoproject.com/en/4.1/howto/static-files/
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
-    },STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+    },
     {
-        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',ploads)
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
-]MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+]
 
 
-# Internationalization# https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
+# Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
 LANGUAGE_CODE = 'en-us'
- in development for ease of testing
-TIME_ZONE = 'UTC'e in production!
+
+TIME_ZONE = 'UTC'
 
 USE_I18N = True
-ear
-USE_TZ = TrueAINS = True
+
+USE_TZ = True
 
 
-# Static files (CSS, JavaScript, Images)IFF = True
+# Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.1/howto/static-files/
 
-STATIC_URL = 'static/'ESSION_COOKIE_SECURE = True
+STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]    SECURE_SSL_REDIRECT = False  # Disable in development
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
-# Media files (User uploads)Ls - updated to work with directly included two-factor URLs
+# Media files (User uploads)
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')rd'
-LOGOUT_REDIRECT_URL = 'login'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
 # Default primary key field type
-# https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-fieldP)
+# https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField', 'https://unpkg.com')
-://cdn.jsdelivr.net')
 # Security settings - Disable in development for ease of testing
-# Enable these in production!CSP_FONT_SRC = ("'self'", 'https://cdn.jsdelivr.net')
+# Enable these in production!
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
-    SECURE_HSTS_SECONDS = 31536000  # 1 year'
-    SECURE_HSTS_INCLUDE_SUBDOMAINS = TrueU2F_FACET = 'https://your-domain.com'
+    SECURE_HSTS_SECONDS = 31536000  # 1 year
+    SECURE_HSTS_INCLUDE_SUBDOMAINS = True
     SECURE_HSTS_PRELOAD = True
     SECURE_BROWSER_XSS_FILTER = True
-    SECURE_CONTENT_TYPE_NOSNIFF = Truens.backends.cached_db'
-    X_FRAME_OPTIONS = 'DENY' weeks
+    SECURE_CONTENT_TYPE_NOSNIFF = True
+    X_FRAME_OPTIONS = 'DENY'
     CSRF_COOKIE_SECURE = True
-    SESSION_COOKIE_SECURE = TrueSESSION_EXPIRE_AT_BROWSER_CLOSE = True
+    SESSION_COOKIE_SECURE = True
 else:
-    SECURE_SSL_REDIRECT = False  # Disable in developmented IP addresses for IP allowlisting
+    SECURE_SSL_REDIRECT = False  # Disable in development
 
-# Authentication URLs - updated to work with directly included two-factor URLs   '127.0.0.1',  # Add your allowed IP addresses here
-LOGIN_URL = 'login']
+# Authentication URLs - updated to work with directly included two-factor URLs
+LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
-# Content Security Policy (CSP)STRIPE_PUBLISHABLE_KEY = 'pk_test_51JvisNEgswk7aQ984rSLm96APZYfJNW8apESNCq5nbpVxVTWyGGSSV9yGNs4iK4cRftXqftD2jg7EHtoo3qYCpzv00c1OUHT8r'
+# Content Security Policy (CSP)
 CSP_DEFAULT_SRC = ("'self'",)
-CSP_SCRIPT_SRC = ("'self'", 'https://cdn.jsdelivr.net', 'https://unpkg.com')ettings
+CSP_SCRIPT_SRC = ("'self'", 'https://cdn.jsdelivr.net', 'https://unpkg.com')
 CSP_STYLE_SRC = ("'self'", 'https://cdn.jsdelivr.net')
 CSP_IMG_SRC = ("'self'", 'data:')
 CSP_FONT_SRC = ("'self'", 'https://cdn.jsdelivr.net')
-  'rest_framework.authentication.SessionAuthentication',
+
 # U2F settings
 U2F_APP_ID = 'https://your-domain.com'
-U2F_FACET = 'https://your-domain.com'  'rest_framework.permissions.IsAuthenticated',
+U2F_FACET = 'https://your-domain.com'
 
-# Session management settingsION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+# Session management settings
 SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_COOKIE_AGE = 1209600  # 2 weeks
-SESSION_SAVE_EVERY_REQUEST = True,
-SESSION_EXPIRE_AT_BROWSER_CLOSE = True  'rest_framework.throttling.UserRateThrottle'
+SESSION_SAVE_EVERY_REQUEST = True
+SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+
+# List of allowed IP addresses for IP allowlisting
+ALLOWED_IPS = [
+    '127.0.0.1',  # Add your allowed IP addresses here
+]
 
-# List of allowed IP addresses for IP allowlisting: {
-ALLOWED_IPS = [,
-    '127.0.0.1',  # Add your allowed IP addresses here   'user': '60/minute'
-]   }
-}
 # Stripe settings
 STRIPE_SECRET_KEY = 'sk_test_51JvisNEgswk7aQ98INM3cer8URjOah60zPpIlvtEVEwuzLfyJHej1QPOSX07KBb3KUC5nidwyEPesGBCeMs9VLjg00zosA81Ax'
 STRIPE_PUBLISHABLE_KEY = 'pk_test_51JvisNEgswk7aQ984rSLm96APZYfJNW8apESNCq5nbpVxVTWyGGSSV9yGNs4iK4cRftXqftD2jg7EHtoo3qYCpzv00c1OUHT8r'
-   "http://localhost:8000",
-# REST Framework settings]
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
 
+# REST Framework settings
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'trading_hub.api.authentication.APIKeyAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'PAGE_SIZE': 50,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'rest_framework.throttling.AnonRateThrottle',
+        'rest_framework.throttling.UserRateThrottle'
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '10/minute',
+        'user': '60/minute'
+    }
+}
 
+# CORS settings for API
+CORS_ALLOWED_ORIGINS = [
+    "http://localhost:8000",
+]
 
-]    "http://localhost:8000",CORS_ALLOWED_ORIGINS = [# CORS settings for API}    }        'user': '60/minute'        'anon': '10/minute',    'DEFAULT_THROTTLE_RATES': {    ],        'rest_framework.throttling.UserRateThrottle'        'rest_framework.throttling.AnonRateThrottle',    'DEFAULT_THROTTLE_CLASSES': [    'PAGE_SIZE': 50,    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',    ],        'rest_framework.permissions.IsAuthenticated',    'DEFAULT_PERMISSION_CLASSES': [    ],        'rest_framework.authentication.SessionAuthentication',        'trading_hub.api.authentication.APIKeyAuthentication',    'DEFAULT_AUTHENTICATION_CLASSES': [REST_FRAMEWORK = {
 # Caching settings
 CACHES = {
     'default': {
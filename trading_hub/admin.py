@@ -18,7 +18,7 @@ from .models import (
 class CoinbaseUserAdmin(admin.ModelAdmin):
     list_display = ('user', 'rating', 'total_trades', 'successful_trades', 'phone_verified', 'identity_verified')
     search_fields = ('user__username', 'user__email')
-    list_filter = ('rating', 'phone_verified', 'identity_verified')
+    list_filter = ('rating', 'phone_verified', 'identity_verified', 'cost_basis_method')
     readonly_fields = ('rating', 'total_trades', 'successful_trades')
 
 # Register Wallet with custom admin display
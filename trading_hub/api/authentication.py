@@ -22,7 +22,7 @@ class APIKeyAuthentication(BaseAuthentication):
             return None
         
         try:
-            api_key_obj = APIKey.objects.get(key=api_key, is_active=True)
+            api_key_obj = APIKey.objects.select_related('user').get(key=api_key, is_active=True)
             
             # Check if key has expired
             if api_key_obj.is_expired():
@@ -21,7 +21,8 @@ class WalletSerializer(serializers.ModelSerializer):
     class Meta:
         model = Wallet
         fields = ('id', 'currency_code', 'name', 'balance', 'address', 'created_at')
-        read_only_fields = ('id', 'address', 'created_at')
+        # Balances only change through trading_hub.services.ledger
+        read_only_fields = ('id', 'balance', 'address', 'created_at')
 
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -49,6 +49,7 @@ class CryptoCurrencyViewSet(APILoggingMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = CryptoCurrencySerializer
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [IsAuthenticated]
+    query_budgets = {'list': 5, 'retrieve': 5}
     
     def get_queryset(self):
         queryset = CryptoCurrency.objects.all()
@@ -62,6 +63,7 @@ class WalletViewSet(APILoggingMixin, viewsets.ModelViewSet):
     serializer_class = WalletSerializer
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [IsAuthenticated, IsAPIKeyReadWrite]
+    query_budgets = {'list': 5, 'retrieve': 5}
     
     def get_queryset(self):
         return Wallet.objects.filter(user=self.request.user)
@@ -74,6 +76,7 @@ class TransactionViewSet(APILoggingMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [IsAuthenticated, IsAPIKeyReadOnly]
+    query_budgets = {'list': 5, 'retrieve': 5}
     
     def get_queryset(self):
         return Transaction.objects.filter(user=self.request.user)
@@ -86,6 +89,7 @@ class LimitOrderViewSet(APILoggingMixin, viewsets.ModelViewSet):
     serializer_class = LimitOrderSerializer
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [IsAuthenticated, IsAPIKeyReadWrite]
+    query_budgets = {'list': 5, 'retrieve': 5}
     
     def get_queryset(self):
         return LimitOrder.objects.filter(user=self.request.user)
@@ -98,6 +102,7 @@ class StopOrderViewSet(APILoggingMixin, viewsets.ModelViewSet):
     serializer_class = StopOrderSerializer
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [IsAuthenticated, IsAPIKeyReadWrite]
+    query_budgets = {'list': 5, 'retrieve': 5}
     
     def get_queryset(self):
         return StopOrder.objects.filter(user=self.request.user)
@@ -111,9 +116,13 @@ class NewsViewSet(APILoggingMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = NewsSerializer
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [IsAuthenticated]
+    # Key and user lookup, last_used update, page count, the articles with their
+    # cryptocurrencies and the request log
+    query_budgets = {'list': 6, 'retrieve': 6}
     
     def get_queryset(self):
-        queryset = News.objects.all()
+        # The serializer lists each article's cryptocurrencies
+        queryset = News.objects.prefetch_related('related_cryptocurrencies')
         # Filter by category
         category = self.request.query_params.get('category')
         if category:
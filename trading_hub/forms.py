@@ -1,5 +1,5 @@
 from django import forms
-from .models import KYC, BankAccount, PriceAlert
+from .models import KYC, BankAccount, CryptoCurrency, PriceAlert
 from django.utils import timezone
 
 class KYCForm(forms.ModelForm):
@@ -37,7 +37,26 @@ class WireTransferForm(forms.Form):
 class PriceAlertForm(forms.ModelForm):
     class Meta:
         model = PriceAlert
-        fields = ['symbol', 'target_price']
+        fields = ['symbol', 'target_price', 'direction']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Alerts without a direction take it from where the price is now
+        self.fields['direction'].required = False
+
+    def clean_direction(self):
+        direction = self.cleaned_data.get('direction')
+        if direction:
+            return direction
+        symbol = self.cleaned_data.get('symbol')
+        target_price = self.cleaned_data.get('target_price')
+        current_price = CryptoCurrency.objects.filter(code__iexact=symbol).values_list(
+            'current_price_usd', flat=True
+        ).first() if symbol else None
+        # A target under the current price is waiting for a fall; unknown prices keep the model default
+        if current_price is not None and target_price is not None and target_price < current_price:
+            return 'below'
+        return PriceAlert._meta.get_field('direction').default
 
 class TaxReportForm(forms.Form):
     tax_year = forms.IntegerField(
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from trading_hub.models import PriceHistory
+from trading_hub.services.tick_archive import TickArchive, unarchived_ticks
+
+class Command(BaseCommand):
+    help = 'Copy PriceHistory rows into the columnar tick archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--currency',
+            help='Only archive this cryptocurrency code',
+        )
+        parser.add_argument(
+            '--root',
+            help='Archive directory (defaults to TICK_ARCHIVE_ROOT)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=50000,
+            help='Rows appended per write',
+        )
+
+    def handle(self, *args, **options):
+        archive = TickArchive(options.get('root'))
+        chunk_size = options.get('chunk_size') or 50000
+        history = PriceHistory.objects.all()
+        if options.get('currency'):
+            history = history.filter(currency_id=options['currency'].upper())
+
+        archived = 0
+        for code in history.order_by().values_list('currency_id', flat=True).distinct():
+            series = archive.series(code)
+            # Rows already in the archive are skipped, so the command can be re-run to catch up
+            chunk = []
+            for timestamp, price in unarchived_ticks(history.filter(currency_id=code), series, chunk_size):
+                chunk.append((timestamp, price))
+                if len(chunk) >= chunk_size:
+                    archived += series.append_ticks(chunk)
+                    chunk = []
+            archived += series.append_ticks(chunk)
+            self.stdout.write(f'{code}: {len(series)} ticks archived')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully archived {archived} price points to {archive.root}'
+            )
+        )
@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from trading_hub.services import indicators
+
+class Command(BaseCommand):
+    help = 'Time the vectorized and incremental technical indicators on a synthetic series'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--points',
+            type=int,
+            default=1000000,
+            help='Length of the synthetic candle series',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per indicator; the best run is reported',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+        )
+
+    def handle(self, *args, **options):
+        points = options.get('points') or 1000000
+        repeat = options.get('repeat') or 5
+
+        # A random walk with some spread and volume looks enough like a real market
+        rng = np.random.default_rng(options.get('seed'))
+        close = 50000 + np.cumsum(rng.normal(0, 25, points))
+        spread = rng.random(points) * 50
+        candles = {
+            'open': close - rng.normal(0, 10, points),
+            'high': close + spread,
+            'low': close - spread,
+            'close': close,
+            'volume': rng.random(points) * 10,
+        }
+
+        self.stdout.write(f'Vectorized, {points} points (best of {repeat}):')
+        for name in indicators.INDICATORS:
+            best = min(self._time(lambda: indicators.compute(name, candles)) for _ in range(repeat))
+            self.stdout.write(f'- {name}: {best * 1000:.1f} ms')
+
+        # Appending to a warmed-up stream should cost the same whatever its length
+        updates = 100000
+        streams = [
+            ('sma', indicators.IncrementalSMA(20), lambda stream, i: stream.update(close[i])),
+            ('ema', indicators.IncrementalEMA(20), lambda stream, i: stream.update(close[i])),
+            ('rsi', indicators.IncrementalRSI(14), lambda stream, i: stream.update(close[i])),
+            ('macd', indicators.IncrementalMACD(), lambda stream, i: stream.update(close[i])),
+            ('bollinger', indicators.IncrementalBollinger(20), lambda stream, i: stream.update(close[i])),
+            ('vwap', indicators.IncrementalVWAP(), lambda stream, i: stream.update(
+                candles['high'][i], candles['low'][i], close[i], candles['volume'][i])),
+            ('atr', indicators.IncrementalATR(14), lambda stream, i: stream.update(
+                candles['high'][i], candles['low'][i], close[i])),
+        ]
+        count = min(updates, points)
+        self.stdout.write(f'Incremental, per appended candle ({count} updates):')
+        for name, stream, update in streams:
+            elapsed = self._time(lambda: [update(stream, i) for i in range(count)])
+            self.stdout.write(f'- {name}: {elapsed / count * 1e6:.2f} us')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    @staticmethod
+    def _time(func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from trading_hub.models import PriceCandle, PriceHistory
+from trading_hub.services.candles import RESOLUTIONS, CandleAggregator
+
+class Command(BaseCommand):
+    help = 'Build OHLCV candles from stored price history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--currency',
+            help='Only rebuild candles for this cryptocurrency code',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Price points folded in between candle writes',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options.get('chunk_size') or 5000
+        history = PriceHistory.objects.order_by('currency_id', 'timestamp')
+        candles = PriceCandle.objects.all()
+        if options.get('currency'):
+            history = history.filter(currency_id=options['currency'].upper())
+            candles = candles.filter(currency_id=options['currency'].upper())
+
+        # Rebuilding on top of existing candles would count every point twice
+        deleted, _ = candles.delete()
+
+        aggregator = CandleAggregator()
+        points = 0
+        created = 0
+        for code, price, timestamp in history.values_list('currency_id', 'price_usd', 'timestamp').iterator(chunk_size=chunk_size):
+            aggregator.add_tick(code, timestamp, price)
+            points += 1
+            if points % chunk_size == 0:
+                created += aggregator.flush()['created']
+        created += aggregator.flush()['created']
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully built candles:\n'
+                f'- {points} price points read\n'
+                f'- {created} candles written across {len(RESOLUTIONS)} resolutions\n'
+                f'- {deleted} old candles replaced'
+            )
+        )
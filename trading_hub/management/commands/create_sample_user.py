@@ -14,6 +14,7 @@ from trading_hub.models import (
     Transaction,
     PaymentMethod
 )
+from trading_hub.services import ledger
 
 
 class Command(BaseCommand):
@@ -126,12 +127,11 @@ class Command(BaseCommand):
             currency_code='USD',
             defaults={
                 'name': 'US Dollar Wallet',
-                'balance': Decimal('10000.00'),  # $10,000 balance
                 'address': f'usd_{uuid.uuid4().hex[:16]}',
             }
         )
-        usd_wallet.balance = Decimal('10000.00')
-        usd_wallet.save()
+        # Top up (or down) to a $10,000 balance
+        usd_wallet.balance = ledger.credit(usd_wallet, Decimal('10000.00') - usd_wallet.balance)
         
         for crypto in cryptos:
             # Create or update wallet for this crypto
@@ -147,8 +147,7 @@ class Command(BaseCommand):
             
             # Reset balance for existing wallets if needed
             if not created:
-                wallet.balance = Decimal('0')
-                wallet.save()
+                wallet.balance = ledger.debit(wallet, wallet.balance)
                 
             # Create sample buy transactions over the past month
             self.create_buy_transactions(user, crypto, wallet)
@@ -193,8 +192,7 @@ class Command(BaseCommand):
             )
             
             # Update wallet balance
-            wallet.balance += crypto_amount
-            wallet.save()
+            wallet.balance = ledger.credit(wallet, crypto_amount)
             
     def create_sell_transactions(self, user, crypto, wallet, usd_wallet):
         """Create sample sell transactions for the given crypto"""
@@ -240,11 +238,7 @@ class Command(BaseCommand):
             )
             
             # Update wallet balances
-            wallet.balance -= crypto_amount
-            wallet.save()
-            
-            usd_wallet.balance += usd_amount
-            usd_wallet.save()
+            wallet.balance, usd_wallet.balance = ledger.transfer(wallet, usd_wallet, crypto_amount, usd_amount)
             
     def create_send_receive_transactions(self, user, crypto, wallet):
         """Create sample send/receive transactions"""
@@ -277,8 +271,7 @@ class Command(BaseCommand):
                 )
                 
                 # Update wallet balance
-                wallet.balance -= send_amount
-                wallet.save()
+                wallet.balance = ledger.debit(wallet, send_amount)
         
         # Maybe create a small receive transaction
         if random.random() > 0.5:
@@ -305,5 +298,4 @@ class Command(BaseCommand):
                 )
                 
                 # Update wallet balance
-                wallet.balance += receive_amount
-                wallet.save()
\ No newline at end of file
+                wallet.balance = ledger.credit(wallet, receive_amount)
\ No newline at end of file
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from trading_hub.services.price_feed import FileTickSource, PriceIngestor, SocketTickSource
+
+
+class Command(BaseCommand):
+    help = 'Ingest price ticks from a feed and write coalesced prices in batches'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument(
+            '--file',
+            help='Replay ticks from a file (CSV symbol,price[,timestamp[,volume]] or JSON lines)',
+        )
+        source.add_argument(
+            '--socket',
+            help='Read newline-delimited ticks from host:port',
+        )
+        source.add_argument(
+            '--source',
+            help='Dotted path to a callable returning an iterable of ticks',
+        )
+        parser.add_argument(
+            '--window',
+            type=float,
+            default=1.0,
+            help='Seconds of ticks coalesced into each database write',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=None,
+            help='Ticks per second when replaying a file',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Replay the file continuously',
+        )
+
+    def handle(self, *args, **options):
+        if options.get('file'):
+            source = FileTickSource(options['file'], rate=options.get('rate'), loop=options.get('loop'))
+        elif options.get('socket'):
+            host, _, port = options['socket'].rpartition(':')
+            if not host or not port.isdigit():
+                raise CommandError('--socket must be given as host:port')
+            source = SocketTickSource(host, int(port))
+        else:
+            source = import_string(options['source'])()
+
+        ingestor = PriceIngestor(source, window=options.get('window') or 1.0)
+        try:
+            stats = ingestor.run()
+        except KeyboardInterrupt:
+            ingestor.flush()
+            stats = ingestor.stats
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Ingested {stats["ticks"]} ticks in {stats["flushes"]} flushes:\n'
+                f'- {stats["written"]} prices written\n'
+                f'- {stats["unknown"]} unknown symbols skipped'
+            )
+        )
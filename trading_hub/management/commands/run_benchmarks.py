@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from trading_hub.services.benchmarks import (
+    DEFAULT_TOLERANCE, SCALES, BenchmarkSuite, compare, environment
+)
+
+class Command(BaseCommand):
+    help = 'Benchmark the trading hot paths on seeded test databases and compare against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            default='small',
+            help=f'Comma-separated data scales to run ({", ".join(SCALES)})',
+        )
+        parser.add_argument(
+            '--case',
+            action='append',
+            choices=BenchmarkSuite.CASES,
+            help='Only run this case (repeatable)',
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per case')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed runs per case')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--output',
+            default='benchmark_results.json',
+            help='Where to write the results as JSON',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Baseline JSON to compare against; regressions make the command fail',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Store these results in --baseline for this database vendor instead of comparing',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=DEFAULT_TOLERANCE,
+            help='Allowed fractional median slowdown before a case counts as a regression',
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the test database between runs',
+        )
+
+    def handle(self, *args, **options):
+        scales = [scale.strip() for scale in options['scales'].split(',') if scale.strip()]
+        unknown = [scale for scale in scales if scale not in SCALES]
+        if unknown:
+            raise CommandError(f"Unknown scale {', '.join(unknown)}; choose from {', '.join(SCALES)}")
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline needs --baseline')
+
+        results = self._run(scales, options)
+        env = environment()
+        with open(options['output'], 'w') as f:
+            json.dump({'environment': env, 'results': results}, f, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if not options['baseline']:
+            return
+        baselines = {}
+        if os.path.exists(options['baseline']):
+            with open(options['baseline']) as f:
+                baselines = json.load(f)
+
+        # Baselines are kept per database vendor; SQLite and PostgreSQL numbers never mix
+        vendor = env['vendor']
+        if options['save_baseline']:
+            saved = baselines.setdefault(vendor, {'environment': env, 'results': {}})
+            saved['environment'] = env
+            for scale, cases in results.items():
+                saved['results'].setdefault(scale, {}).update(cases)
+            with open(options['baseline'], 'w') as f:
+                json.dump(baselines, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Saved {vendor} baseline to {options['baseline']}"))
+            return
+
+        if vendor not in baselines:
+            raise CommandError(f"{options['baseline']} has no {vendor} baseline; create one with --save-baseline")
+        regressions = compare(results, baselines[vendor]['results'], options['tolerance'])
+        if regressions:
+            raise CommandError('Benchmark regressions:\n' + '\n'.join(f'- {line}' for line in regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def _run(self, scales, options):
+        # Everything runs on a fresh test database with a private cache and media directory
+        media_root = tempfile.mkdtemp(prefix='benchmarks-')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        cache_settings = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks'}}
+        try:
+            with override_settings(CACHES=cache_settings, MEDIA_ROOT=media_root):
+                results = {}
+                for scale in scales:
+                    call_command('flush', interactive=False, verbosity=0)
+                    suite = BenchmarkSuite(options['repeat'], options['warmup'], options['seed'])
+                    self.stdout.write(f'Seeding {scale} data...')
+                    suite.load(scale)
+                    results[scale] = suite.run(options.get('case'))
+                    self._print(scale, results[scale])
+                return results
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def _print(self, scale, cases):
+        self.stdout.write(f'{scale}:')
+        for case, summary in cases.items():
+            self.stdout.write(
+                f"- {case}: p50 {summary['p50_ms']:.2f} ms, p95 {summary['p95_ms']:.2f} ms, "
+                f"p99 {summary['p99_ms']:.2f} ms, {summary['queries']} queries"
+            )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from trading_hub.services.recurring import RecurringOrderRunner
+
+class Command(BaseCommand):
+    help = 'Execute recurring orders that are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Orders settled per transaction',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Chunks processed concurrently (defaults to RECURRING_ORDER_WORKERS)',
+        )
+
+    def handle(self, *args, **options):
+        results = RecurringOrderRunner(
+            chunk_size=options.get('chunk_size') or 500,
+            workers=options.get('workers'),
+        ).run()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully processed recurring orders:\n'
+                f'- {results["executed"]} orders executed\n'
+                f'- {results["skipped"]} orders skipped\n'
+                f'- {results["completed"]} orders completed'
+            )
+        )
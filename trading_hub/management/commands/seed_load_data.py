@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from trading_hub.services.seeding import SeedLoader
+
+class Command(BaseCommand):
+    help = 'Generate a large, deterministic dataset for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--transactions', type=int, default=100000)
+        parser.add_argument('--limit-orders', type=int, default=10000)
+        parser.add_argument('--stop-orders', type=int, default=5000)
+        parser.add_argument('--recurring-orders', type=int, default=2000)
+        parser.add_argument(
+            '--price-points',
+            type=int,
+            default=10000,
+            help='Price history ticks per cryptocurrency, five minutes apart',
+        )
+        parser.add_argument('--news', type=int, default=500)
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='How far back generated activity reaches',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per bulk insert',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='The same seed always generates the same data',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes inserting orders and transactions (ignored on SQLite)',
+        )
+        parser.add_argument(
+            '--defer-indexes',
+            action='store_true',
+            help='Drop order, transaction and price history indexes during the load and rebuild them after',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help='Username prefix marking seeded users',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete previously seeded users, their data and seeded news first',
+        )
+
+    def handle(self, *args, **options):
+        loader = SeedLoader(
+            seed=options['seed'],
+            batch_size=options.get('batch_size') or 5000,
+            prefix=options['prefix'],
+            days=options['days'],
+        )
+
+        if options['clear']:
+            self.stdout.write(f'Deleted {loader.clear()} previously seeded rows')
+        elif options['users'] and loader.seeded_users().exists():
+            raise CommandError(
+                f"Users prefixed {options['prefix']}_ already exist; pass --clear, another --prefix or --users 0"
+            )
+
+        report = loader.run(
+            users=options['users'],
+            transactions=options['transactions'],
+            limit_orders=options['limit_orders'],
+            stop_orders=options['stop_orders'],
+            recurring_orders=options['recurring_orders'],
+            price_points=options['price_points'],
+            news=options['news'],
+            workers=options['workers'],
+            defer_indexes=options['defer_indexes'],
+        )
+
+        lines = []
+        for kind, (rows, seconds) in report.items():
+            rate = f', {rows / seconds:,.0f} rows/s' if rows and seconds else ''
+            lines.append(f"- {rows} {kind.replace('_', ' ')} rows in {seconds:.1f}s{rate}")
+        self.stdout.write(self.style.SUCCESS('Successfully seeded load test data:\n' + '\n'.join(lines)))
+        if report['price_history'][0]:
+            self.stdout.write('Run build_candles to roll the new price history up into candles')
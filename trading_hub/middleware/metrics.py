@@ -0,0 +1,55 @@
+import logging
+import random
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+
+from trading_hub.services.request_metrics import QueryTimer, StackSampler, registry, save_profile
+
+logger = logging.getLogger('performance')
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, query count and database time per URL name
+
+    Cheap enough for production: one perf_counter pair, an execute_wrapper
+    that only counts and times queries, and a histogram increment.
+    REQUEST_METRICS_SAMPLE_RATE (default 1.0) limits recording to a
+    fraction of requests. A further REQUEST_PROFILE_RATE fraction (default
+    0) is run under the stack sampler, as is any request from a staff user
+    that sends an X-Profile header; the profile id comes back in the
+    X-Profile-Id response header. Place it after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 1.0):
+            return self.get_response(request)
+
+        profile = self._should_profile(request)
+        sampler = StackSampler(interval=getattr(settings, 'REQUEST_PROFILE_INTERVAL', 0.005)) if profile else None
+        started = time.perf_counter()
+        with QueryTimer() as timer, (sampler or nullcontext()):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        # Unresolved paths share one name, so 404 probes cannot grow the registry
+        name = match.view_name if match else 'unresolved'
+        registry.record(name, duration, timer.count, timer.seconds, response.status_code)
+        if sampler:
+            try:
+                response['X-Profile-Id'] = save_profile(name, request, duration, timer, sampler)
+            except Exception as e:
+                logger.warning("Could not store profile for %s: %s", request.path, e)
+        return response
+
+    def _should_profile(self, request):
+        if request.headers.get('X-Profile'):
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_staff:
+                return True
+        return random.random() < getattr(settings, 'REQUEST_PROFILE_RATE', 0.0)
@@ -4,6 +4,8 @@ import re
 from django.db import connection
 from django.conf import settings
 
+from trading_hub.services.request_metrics import QueryTimer
+
 logger = logging.getLogger('performance')
 
 class PerformanceMonitorMiddleware:
@@ -11,24 +13,25 @@ class PerformanceMonitorMiddleware:
         self.get_response = get_response
         
     def __call__(self, request):
-        # Start timing
-        start_time = time.time()
+        # Start timing; perf_counter is monotonic, unlike time.time()
+        start_time = time.perf_counter()
         
-        # Process request
-        response = self.get_response(request)
+        # Process request, counting queries without needing DEBUG
+        with QueryTimer() as timer:
+            response = self.get_response(request)
         
         # End timing
-        duration = time.time() - start_time
+        duration = time.perf_counter() - start_time
         
         # Log slow requests (>1 second)
         if duration > 1:
             path = request.path
-            query_count = len(connection.queries)
+            query_count = timer.count
             
-            logger.warning(f"Slow request: {path} took {duration:.2f}s ({query_count} queries)")
+            logger.warning(f"Slow request: {path} took {duration:.2f}s ({query_count} queries, {timer.seconds:.2f}s in the database)")
             
-            # Log the most time-consuming queries
-            if query_count > 10:  # If there are many queries, look for N+1 problems
+            # Log the most time-consuming queries; their SQL is only kept with DEBUG on
+            if query_count > 10 and connection.queries:  # If there are many queries, look for N+1 problems
                 self._log_queries(connection.queries)
                 
         return response
@@ -0,0 +1,51 @@
+import logging
+from django.conf import settings
+
+from trading_hub.services.query_budget import QueryBudgetExceeded, QueryCounter, budget_for
+
+logger = logging.getLogger('performance')
+
+class QueryBudgetMiddleware:
+    """
+    Checks every request against its view's query budget
+
+    QUERY_BUDGET_MODE selects what happens when a budget is exceeded:
+    'warn' (the default, for staging) logs a structured warning on the
+    performance logger, 'raise' raises QueryBudgetExceeded and 'off'
+    disables counting.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = getattr(settings, 'QUERY_BUDGET_MODE', 'warn')
+        if mode == 'off':
+            return self.get_response(request)
+
+        with QueryCounter() as counter:
+            response = self.get_response(request)
+
+        label, limit = getattr(request, '_query_budget', (None, None))
+        if limit is not None and counter.count > limit:
+            repeated = counter.repeated()
+            details = {
+                'view': label,
+                'path': request.path,
+                'method': request.method,
+                'queries': counter.count,
+                'budget': limit,
+                'repeated_query': repeated[0][0][:500] if repeated else None,
+                'repeated_count': repeated[0][1] if repeated else 0,
+            }
+            if mode == 'raise':
+                raise QueryBudgetExceeded(f'{label} made {counter.count} queries, budget {limit}')
+            logger.warning(
+                "Query budget exceeded: %s made %s queries (budget %s)", label, counter.count, limit,
+                extra={'query_budget': details},
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = budget_for(view_func, request.method)
+        return None
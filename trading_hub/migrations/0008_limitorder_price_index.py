@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_hub', '0007_merge_tax_and_news'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='limitorder',
+            index=models.Index(fields=['cryptocurrency', 'status', 'side', 'limit_price'], name='trading_hub_cryptoc_cf54d9_idx'),
+        ),
+    ]
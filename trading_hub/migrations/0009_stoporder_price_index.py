@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_hub', '0008_limitorder_price_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stoporder',
+            index=models.Index(fields=['cryptocurrency', 'status', 'side', 'stop_price'], name='trading_hub_cryptoc_8d520b_idx'),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_hub', '0009_stoporder_price_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recurringorder',
+            index=models.Index(fields=['status', 'next_execution'], name='trading_hub_status_da4a3b_idx'),
+        ),
+    ]
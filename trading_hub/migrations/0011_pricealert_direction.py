@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def infer_direction(apps, schema_editor):
+    """Pending alerts with a target under the current price are waiting for a fall"""
+    CryptoCurrency = apps.get_model('trading_hub', 'CryptoCurrency')
+    PriceAlert = apps.get_model('trading_hub', 'PriceAlert')
+    for code, price in CryptoCurrency.objects.values_list('code', 'current_price_usd'):
+        PriceAlert.objects.filter(symbol__iexact=code, triggered=False, target_price__lt=price).update(direction='below')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_hub', '0010_recurringorder_due_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricealert',
+            name='direction',
+            field=models.CharField(choices=[('above', 'Price rises to or above target'), ('below', 'Price falls to or below target')], default='above', max_length=5),
+        ),
+        migrations.RunPython(infer_direction, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pricealert',
+            index=models.Index(fields=['symbol', 'triggered', 'direction', 'target_price'], name='trading_hub_symbol_0a142b_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_hub', '0011_pricealert_direction'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pricehistory',
+            index=models.Index(fields=['currency', 'timestamp'], name='trading_hub_currenc_82c474_idx'),
+        ),
+        migrations.CreateModel(
+            name='PriceCandle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 Minute'), ('5m', '5 Minutes'), ('1h', '1 Hour'), ('1d', '1 Day'), ('1w', '1 Week')], max_length=2)),
+                ('bucket_start', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('high', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('low', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('close', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('volume', models.DecimalField(decimal_places=8, default=0, max_digits=24)),
+                ('tick_count', models.PositiveIntegerField(default=0)),
+                ('currency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candles', to='trading_hub.cryptocurrency')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('currency', 'resolution', 'bucket_start'), name='unique_candle_bucket')],
+            },
+        ),
+    ]
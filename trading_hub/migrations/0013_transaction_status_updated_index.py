@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_hub', '0012_pricecandle'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['status', 'updated_at'], name='trading_hub_status_b28e42_idx'),
+        ),
+    ]
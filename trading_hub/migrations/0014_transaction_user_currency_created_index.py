@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_hub', '0013_transaction_status_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'currency', 'created_at'], name='trading_hub_user_id_3d1cae_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trading_hub', '0014_transaction_user_currency_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coinbaseuser',
+            name='cost_basis_method',
+            field=models.CharField(choices=[('fifo', 'First In, First Out'), ('lifo', 'Last In, First Out'), ('hifo', 'Highest In, First Out'), ('acb', 'Average Cost Basis')], default='fifo', max_length=4),
+        ),
+        migrations.CreateModel(
+            name='TaxLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=10)),
+                ('acquired_at', models.DateTimeField()),
+                ('amount', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('cost', models.DecimalField(decimal_places=2, max_digits=24)),
+                ('remaining', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('unit_cost', models.DecimalField(decimal_places=10, max_digits=30)),
+                ('transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tax_lot', to='trading_hub.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_lots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', 'currency', 'acquired_at'], name='trading_hub_user_id_b707af_idx'),
+                    models.Index(fields=['user', 'currency', '-unit_cost'], name='trading_hub_user_id_082cd2_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='RealizedGain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=10)),
+                ('acquired_at', models.DateTimeField(blank=True, null=True)),
+                ('disposed_at', models.DateTimeField()),
+                ('amount', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('cost_basis', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('proceeds', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('is_long_term', models.BooleanField()),
+                ('buy_transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='disposals', to='trading_hub.transaction')),
+                ('sell_transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='realized_gains', to='trading_hub.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='realized_gains', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', 'currency', 'disposed_at'], name='trading_hub_user_id_95c997_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaxLedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=10)),
+                ('method', models.CharField(choices=[('fifo', 'First In, First Out'), ('lifo', 'Last In, First Out'), ('hifo', 'Highest In, First Out'), ('acb', 'Average Cost Basis')], default='fifo', max_length=4)),
+                ('last_created_at', models.DateTimeField(blank=True, null=True)),
+                ('last_transaction_id', models.UUIDField(blank=True, null=True)),
+                ('fill_count', models.PositiveIntegerField(default=0)),
+                ('quantity', models.DecimalField(decimal_places=8, default=0, max_digits=24)),
+                ('cost', models.DecimalField(decimal_places=8, default=0, max_digits=24)),
+                ('weighted_time', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_ledger_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'currency'), name='unique_tax_ledger_checkpoint')],
+            },
+        ),
+    ]
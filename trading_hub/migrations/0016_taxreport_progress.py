@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_hub', '0015_tax_lot_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxreport',
+            name='cost_basis_method',
+            field=models.CharField(choices=[('fifo', 'First In, First Out'), ('lifo', 'Last In, First Out'), ('hifo', 'Highest In, First Out'), ('acb', 'Average Cost Basis')], default='fifo', max_length=4),
+        ),
+        migrations.AddField(
+            model_name='taxreport',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trading_hub', '0016_taxreport_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIKey',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(help_text='A name to help you identify this API key', max_length=100)),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('secret', models.CharField(max_length=128)),
+                ('permissions', models.CharField(choices=[('read', 'Read Only'), ('read_write', 'Read & Write'), ('admin', 'Admin Access')], default='read', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('allowed_ips', models.TextField(blank=True, help_text='Comma-separated list of IP addresses allowed to use this key', null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='APIRequestLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=255)),
+                ('method', models.CharField(max_length=10)),
+                ('status_code', models.IntegerField()),
+                ('ip_address', models.GenericIPAddressField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('execution_time', models.FloatField(help_text='API request execution time in milliseconds')),
+                ('api_key', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='requests', to='trading_hub.apikey')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='api_requests', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', '-timestamp'], name='trading_hub_user_id_a28706_idx'),
+                    models.Index(fields=['api_key', '-timestamp'], name='trading_hub_api_key_2c45ff_idx'),
+                    models.Index(fields=['endpoint', '-timestamp'], name='trading_hub_endpoin_ce1680_idx'),
+                    models.Index(fields=['ip_address', '-timestamp'], name='trading_hub_ip_addr_4d5dab_idx'),
+                ],
+            },
+        ),
+    ]
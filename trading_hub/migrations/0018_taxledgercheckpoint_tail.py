@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_hub', '0017_apikey_apirequestlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxledgercheckpoint',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='taxledgercheckpoint',
+            name='tail_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'currency', 'updated_at'], name='trading_hub_user_id_06fbc3_idx'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_hub', '0018_taxledgercheckpoint_tail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='taxlot',
+            name='cost',
+            field=models.DecimalField(decimal_places=8, max_digits=24),
+        ),
+    ]
@@ -1,15 +1,23 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from decimal import Decimal
+import calendar
 import uuid
 import random
 import string
 
 
 class CoinbaseUser(models.Model):
+    COST_BASIS_METHOD_CHOICES = (
+        ('fifo', 'First In, First Out'),
+        ('lifo', 'Last In, First Out'),
+        ('hifo', 'Highest In, First Out'),
+        ('acb', 'Average Cost Basis'),
+    )
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='coinbase_profile')
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=5.00)
     total_trades = models.PositiveIntegerField(default=0)
@@ -17,17 +25,24 @@ class CoinbaseUser(models.Model):
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
     phone_verified = models.BooleanField(default=False)
     identity_verified = models.BooleanField(default=False)
+    # Method the tax lot ledger is kept under; changing it rebuilds the ledger
+    cost_basis_method = models.CharField(max_length=4, choices=COST_BASIS_METHOD_CHOICES, default='fifo')
 
     def __str__(self):
         return f"{self.user.username}'s Coinbase Profile"
 
+    @staticmethod
+    def rating_for(total_trades, successful_trades):
+        """Rating for the given trade counts, used when counters are updated in bulk"""
+        success_rate = successful_trades / total_trades
+        # Rating formula: 50% based on success rate (0-5 points) + base rating of 5
+        new_rating = (success_rate * 5) + 5
+        # Cap rating between 0-10
+        return min(max(new_rating / 2, 0), 5)
+
     def calculate_rating(self):
         if self.total_trades > 0:
-            success_rate = self.successful_trades / self.total_trades
-            # Rating formula: 50% based on success rate (0-5 points) + base rating of 5
-            new_rating = (success_rate * 5) + 5
-            # Cap rating between 0-10
-            self.rating = min(max(new_rating / 2, 0), 5)
+            self.rating = self.rating_for(self.total_trades, self.successful_trades)
             self.save()
 
 
@@ -102,43 +117,54 @@ class Transaction(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['from_wallet']),
             models.Index(fields=['to_wallet']),
+            models.Index(fields=['status', 'updated_at']),
+            models.Index(fields=['user', 'currency', 'created_at']),
+            models.Index(fields=['user', 'currency', 'updated_at']),
         ]
 
     def __str__(self):
         return f"{self.transaction_type} - {self.amount} {self.currency}"
 
+    def ledger_entries(self):
+        """Wallet debits and credits for this transaction as (wallet_id, amount) pairs"""
+        entries = []
+        if self.transaction_type == 'buy':
+            if self.from_wallet_id:
+                entries.append((self.from_wallet_id, -self.native_amount))
+            entries.append((self.to_wallet_id, self.amount))
+        elif self.transaction_type == 'sell':
+            entries.append((self.from_wallet_id, -self.amount))
+            if self.to_wallet_id:
+                entries.append((self.to_wallet_id, self.native_amount))
+        elif self.transaction_type == 'send':
+            entries.append((self.from_wallet_id, -self.amount))
+            if self.to_wallet_id:
+                entries.append((self.to_wallet_id, self.amount))
+        elif self.transaction_type == 'receive':
+            entries.append((self.to_wallet_id, self.amount))
+        return entries
+
     def complete_transaction(self, successful=True):
         """Mark a transaction as complete and update user profile"""
-        if successful:
-            self.status = 'completed'
+        from .services import ledger
 
-            # Update wallet balances
-            if self.transaction_type == 'buy':
-                self.to_wallet.balance += self.amount
-                self.to_wallet.save()
-            elif self.transaction_type == 'sell':
-                self.from_wallet.balance -= self.amount
-                self.from_wallet.save()
-            elif self.transaction_type == 'send':
-                self.from_wallet.balance -= self.amount
-                self.from_wallet.save()
-                if self.to_wallet:
-                    self.to_wallet.balance += self.amount
-                    self.to_wallet.save()
-            elif self.transaction_type == 'receive':
-                self.to_wallet.balance += self.amount
-                self.to_wallet.save()
-        else:
-            self.status = 'failed'
+        with transaction.atomic():
+            if successful:
+                # Update wallet balances; a transaction that cannot be funded fails
+                try:
+                    ledger.post(self.ledger_entries())
+                except ledger.InsufficientFunds:
+                    successful = False
 
-        self.save()
+            self.status = 'completed' if successful else 'failed'
+            self.save()
 
-        # Update trader profile
-        profile = self.user.coinbase_profile
-        profile.total_trades += 1
-        if successful:
-            profile.successful_trades += 1
-        profile.calculate_rating()
+            # Update trader profile
+            profile = self.user.coinbase_profile
+            profile.total_trades += 1
+            if successful:
+                profile.successful_trades += 1
+            profile.calculate_rating()
 
 
 class CryptoCurrency(models.Model):
@@ -186,10 +212,45 @@ class PriceHistory(models.Model):
     timestamp = models.DateTimeField()
     period = models.CharField(max_length=10, choices=TIME_PERIODS)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['currency', 'timestamp']),
+        ]
+
     def __str__(self):
         return f"{self.currency.code} price at {self.timestamp}"
 
 
+class PriceCandle(models.Model):
+    """OHLCV bucket rolled up from price ticks by services.candles"""
+    RESOLUTIONS = (
+        ('1m', '1 Minute'),
+        ('5m', '5 Minutes'),
+        ('1h', '1 Hour'),
+        ('1d', '1 Day'),
+        ('1w', '1 Week'),
+    )
+
+    currency = models.ForeignKey(CryptoCurrency, on_delete=models.CASCADE, related_name='candles')
+    resolution = models.CharField(max_length=2, choices=RESOLUTIONS)
+    bucket_start = models.DateTimeField()
+    open = models.DecimalField(max_digits=24, decimal_places=8)
+    high = models.DecimalField(max_digits=24, decimal_places=8)
+    low = models.DecimalField(max_digits=24, decimal_places=8)
+    close = models.DecimalField(max_digits=24, decimal_places=8)
+    volume = models.DecimalField(max_digits=24, decimal_places=8, default=0)
+    tick_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index chart range reads scan
+            models.UniqueConstraint(fields=['currency', 'resolution', 'bucket_start'], name='unique_candle_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.currency_id} {self.resolution} candle at {self.bucket_start}"
+
+
 # Payment Methods (like in Coinbase)
 class PaymentMethod(models.Model):
     METHOD_TYPES = (
@@ -236,71 +297,67 @@ class LimitOrder(models.Model):
     expires_at = models.DateTimeField(null=True, blank=True)
     from_wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='limit_order_source')
     to_wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='limit_order_destination', null=True, blank=True)
-    
+
+    SETTLEMENT_FIELDS = ['filled_amount', 'status', 'updated_at']
+
+    class Meta:
+        indexes = [
+            # Supports the per-currency price range scans in services.order_engine
+            models.Index(fields=['cryptocurrency', 'status', 'side', 'limit_price']),
+        ]
+
     def __str__(self):
         return f"{self.side.upper()} {self.amount} {self.cryptocurrency.code} @ {self.limit_price}"
     
+    @staticmethod
+    def price_crosses(side, limit_price, price):
+        """
+        Whether a limit order on this side can fill at price
+
+        Works element-wise when price is a numpy array, which the backtest relies on.
+        """
+        if side == 'buy':
+            return price <= limit_price
+        else:  # sell
+            return price >= limit_price
+
     def can_execute(self):
         """Check if the order can be executed based on current market price"""
-        current_price = self.cryptocurrency.current_price_usd
-        if self.side == 'buy':
-            return current_price <= self.limit_price
-        else:  # sell
-            return current_price >= self.limit_price
+        return self.price_crosses(self.side, self.limit_price, self.cryptocurrency.current_price_usd)
     
+    def settlement_fill(self):
+        """Transaction details for filling the rest of this order at its limit price"""
+        remaining = self.amount - self.filled_amount
+        return {
+            'transaction_type': self.side,
+            'amount': remaining,
+            'native_amount': remaining * self.limit_price,
+            'description': f"Limit order {self.side} executed at {self.limit_price}",
+        }
+
+    def can_settle(self, current):
+        """Whether the fill queued for this order still applies to current, its locked row"""
+        return current.status == 'open'
+
+    def record_fill(self, executed_at):
+        """Update this order for a settled fill; SETTLEMENT_FIELDS lists what changes"""
+        self.filled_amount = self.amount
+        self.status = 'filled'
+        self.updated_at = executed_at
+
     def try_execute(self):
         """Attempt to execute the limit order if conditions are met"""
         if not self.can_execute() or self.status != 'open':
             return False
             
         try:
-            if self.side == 'buy':
-                usd_needed = (self.amount - self.filled_amount) * self.limit_price
-                if self.from_wallet.balance >= usd_needed:
-                    # Create transaction for the buy
-                    transaction = Transaction.objects.create(
-                        user=self.user,
-                        transaction_type='buy',
-                        amount=self.amount - self.filled_amount,
-                        currency=self.cryptocurrency.code,
-                        native_amount=usd_needed,
-                        native_currency='USD',
-                        from_wallet=self.from_wallet,
-                        to_wallet=self.to_wallet,
-                        description=f"Limit order buy executed at {self.limit_price}"
-                    )
-                    transaction.complete_transaction(successful=True)
-                    self.filled_amount = self.amount
-                    self.status = 'filled'
-                    self.save()
-                    return True
-            else:  # sell
-                crypto_available = self.from_wallet.balance
-                if crypto_available >= (self.amount - self.filled_amount):
-                    # Create transaction for the sell
-                    usd_value = (self.amount - self.filled_amount) * self.limit_price
-                    transaction = Transaction.objects.create(
-                        user=self.user,
-                        transaction_type='sell',
-                        amount=self.amount - self.filled_amount,
-                        currency=self.cryptocurrency.code,
-                        native_amount=usd_value,
-                        native_currency='USD',
-                        from_wallet=self.from_wallet,
-                        to_wallet=self.to_wallet,
-                        description=f"Limit order sell executed at {self.limit_price}"
-                    )
-                    transaction.complete_transaction(successful=True)
-                    self.filled_amount = self.amount
-                    self.status = 'filled'
-                    self.save()
-                    return True
-                    
+            from .services.settlement import SettlementBatch
+            batch = SettlementBatch()
+            batch.add(self, **self.settlement_fill())
+            return batch.commit()['settled'] == 1
         except Exception as e:
             print(f"Error executing limit order: {e}")
             return False
-            
-        return False
     
     def cancel(self):
         """Cancel an open limit order"""
@@ -339,91 +396,92 @@ class StopOrder(models.Model):
     expires_at = models.DateTimeField(null=True, blank=True)
     from_wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='stop_order_source')
     to_wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='stop_order_destination', null=True, blank=True)
-    
+
+    SETTLEMENT_FIELDS = ['filled_amount', 'status', 'updated_at']
+
+    class Meta:
+        indexes = [
+            # Supports the per-currency stop price range scans in services.order_engine
+            models.Index(fields=['cryptocurrency', 'status', 'side', 'stop_price']),
+        ]
+
     def __str__(self):
         order_type = "Stop-Limit" if self.limit_price else "Stop"
         return f"{order_type} {self.side.upper()} {self.amount} {self.cryptocurrency.code} @ {self.stop_price}"
     
-    def should_trigger(self):
-        """Check if the stop order should be triggered based on current market price"""
-        current_price = self.cryptocurrency.current_price_usd
-        if self.side == 'buy':
+    @staticmethod
+    def price_triggers(side, stop_price, price):
+        """
+        Whether a stop order on this side triggers at price
+
+        Works element-wise when price is a numpy array, which the backtest relies on.
+        """
+        if side == 'buy':
             # Buy stop triggers when price rises above stop price
-            return current_price >= self.stop_price
+            return price >= stop_price
         else:  # sell
             # Sell stop triggers when price falls below stop price
-            return current_price <= self.stop_price
+            return price <= stop_price
+
+    def should_trigger(self):
+        """Check if the stop order should be triggered based on current market price"""
+        return self.price_triggers(self.side, self.stop_price, self.cryptocurrency.current_price_usd)
     
+    def settlement_fill(self, price=None):
+        """Transaction details for executing this stop order at the market price"""
+        if price is None:
+            price = self.cryptocurrency.current_price_usd
+        return {
+            'transaction_type': self.side,
+            'amount': self.amount,
+            'native_amount': self.amount * price,
+            'description': f"Stop order {self.side} executed at market price {price}",
+        }
+
+    def can_settle(self, current):
+        """Whether the fill queued for this order still applies to current, its locked row"""
+        return current.status == 'open'
+
+    def record_fill(self, executed_at):
+        """Update this order for a settled fill; SETTLEMENT_FIELDS lists what changes"""
+        self.filled_amount = self.amount
+        self.status = 'filled'
+        self.updated_at = executed_at
+
+    def create_limit_order(self):
+        """Place the limit order for a triggered stop-limit order"""
+        return LimitOrder.objects.create(
+            user=self.user,
+            cryptocurrency=self.cryptocurrency,
+            side=self.side,
+            amount=self.amount,
+            limit_price=self.limit_price,
+            from_wallet=self.from_wallet,
+            to_wallet=self.to_wallet,
+            expires_at=self.expires_at
+        )
+
     def try_trigger(self):
         """Attempt to trigger the stop order if conditions are met"""
         if not self.should_trigger() or self.status != 'open':
             return False
             
-        # Update status to triggered
-        self.status = 'triggered'
-        self.save()
-        
         # If it's a stop-limit order, create a limit order
         if self.limit_price:
-            limit_order = LimitOrder.objects.create(
-                user=self.user,
-                cryptocurrency=self.cryptocurrency,
-                side=self.side,
-                amount=self.amount,
-                limit_price=self.limit_price,
-                from_wallet=self.from_wallet,
-                to_wallet=self.to_wallet,
-                expires_at=self.expires_at
-            )
+            self.status = 'triggered'
+            self.save()
+            self.create_limit_order()
             return True
             
         # Otherwise execute as market order
         try:
-            if self.side == 'buy':
-                usd_needed = self.amount * self.cryptocurrency.current_price_usd
-                if self.from_wallet.balance >= usd_needed:
-                    transaction = Transaction.objects.create(
-                        user=self.user,
-                        transaction_type='buy',
-                        amount=self.amount,
-                        currency=self.cryptocurrency.code,
-                        native_amount=usd_needed,
-                        native_currency='USD',
-                        from_wallet=self.from_wallet,
-                        to_wallet=self.to_wallet,
-                        description=f"Stop order buy executed at market price {self.cryptocurrency.current_price_usd}"
-                    )
-                    transaction.complete_transaction(successful=True)
-                    self.filled_amount = self.amount
-                    self.status = 'filled'
-                    self.save()
-                    return True
-            else:  # sell
-                crypto_available = self.from_wallet.balance
-                if crypto_available >= self.amount:
-                    usd_value = self.amount * self.cryptocurrency.current_price_usd
-                    transaction = Transaction.objects.create(
-                        user=self.user,
-                        transaction_type='sell',
-                        amount=self.amount,
-                        currency=self.cryptocurrency.code,
-                        native_amount=usd_value,
-                        native_currency='USD',
-                        from_wallet=self.from_wallet,
-                        to_wallet=self.to_wallet,
-                        description=f"Stop order sell executed at market price {self.cryptocurrency.current_price_usd}"
-                    )
-                    transaction.complete_transaction(successful=True)
-                    self.filled_amount = self.amount
-                    self.status = 'filled'
-                    self.save()
-                    return True
-                    
+            from .services.settlement import SettlementBatch
+            batch = SettlementBatch()
+            batch.add(self, **self.settlement_fill())
+            return batch.commit()['settled'] == 1
         except Exception as e:
             print(f"Error executing stop order: {e}")
             return False
-            
-        return False
     
     def cancel(self):
         """Cancel an open stop order"""
@@ -469,28 +527,42 @@ class RecurringOrder(models.Model):
     next_execution = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    SETTLEMENT_FIELDS = ['last_executed', 'next_execution', 'status', 'updated_at']
+
+    class Meta:
+        indexes = [
+            # Supports the due-order scan in services.recurring
+            models.Index(fields=['status', 'next_execution']),
+        ]
+
     def __str__(self):
         return f"{self.order_type.upper()} {self.amount} {self.cryptocurrency.code} ({self.interval})"
         
-    def calculate_next_execution(self):
-        """Calculate the next execution date based on the interval and last execution"""
-        now = timezone.now()
-        base_date = self.last_executed if self.last_executed else self.start_date
-        
-        if self.interval == 'daily':
+    @staticmethod
+    def interval_after(interval, base_date):
+        """The execution one interval after base_date, ignoring any catch-up"""
+        if interval == 'daily':
             next_date = base_date + timezone.timedelta(days=1)
-        elif self.interval == 'weekly':
+        elif interval == 'weekly':
             next_date = base_date + timezone.timedelta(weeks=1)
-        elif self.interval == 'biweekly':
+        elif interval == 'biweekly':
             next_date = base_date + timezone.timedelta(weeks=2)
-        elif self.interval == 'monthly':
-            # Add one month (approximately handling month transitions)
+        elif interval == 'monthly':
+            # Add one month, keeping to the last day of shorter months
             next_month = base_date.month + 1
             next_year = base_date.year + (next_month > 12)
             if next_month > 12:
                 next_month -= 12
-            next_date = base_date.replace(year=next_year, month=next_month)
+            day = min(base_date.day, calendar.monthrange(next_year, next_month)[1])
+            next_date = base_date.replace(year=next_year, month=next_month, day=day)
+        return next_date
+
+    def calculate_next_execution(self):
+        """Calculate the next execution date based on the interval and last execution"""
+        now = timezone.now()
+        base_date = self.last_executed if self.last_executed else self.start_date
+        next_date = self.interval_after(self.interval, base_date)
         
         # If the calculated next date is in the past (could happen after pausing/resuming)
         # set it to the next occurrence from now
@@ -548,80 +620,62 @@ class RecurringOrder(models.Model):
             return True
         return False
     
+    def settlement_fill(self, price=None):
+        """Transaction details for one execution of this order at the given price"""
+        if price is None:
+            price = self.cryptocurrency.current_price_usd
+
+        if self.order_type == 'buy':
+            if self.from_wallet.currency_code == 'USD':
+                usd_amount = self.amount
+                crypto_amount = usd_amount / price
+            else:
+                # If amount is specified in crypto for a buy order
+                crypto_amount = self.amount
+                usd_amount = crypto_amount * price
+        else:  # sell
+            if self.from_wallet.currency_code == self.cryptocurrency_id:
+                crypto_amount = self.amount
+                usd_amount = crypto_amount * price
+            else:
+                # If amount is specified in USD for a sell order
+                usd_amount = self.amount
+                crypto_amount = usd_amount / price
+
+        return {
+            'transaction_type': self.order_type,
+            'amount': crypto_amount,
+            'native_amount': usd_amount,
+            'description': f"Recurring {self.order_type} order executed at {price}",
+        }
+
+    def can_settle(self, current):
+        """Whether the execution queued for this order is still due on current, its locked row"""
+        return current.status == 'active' and current.next_execution == self.next_execution
+
+    def record_fill(self, executed_at):
+        """Advance the schedule after a settled execution; SETTLEMENT_FIELDS lists what changes"""
+        self.last_executed = executed_at
+        self.next_execution = self.calculate_next_execution()
+
+        # Check if we've reached the end date
+        if self.end_date and self.next_execution > self.end_date:
+            self.status = 'completed'
+        self.updated_at = executed_at
+
     def execute(self):
         """Execute this recurring order"""
         if self.status != 'active':
             return False
             
         try:
-            current_price = self.cryptocurrency.current_price_usd
-            
-            if self.order_type == 'buy':
-                if self.from_wallet.currency_code == 'USD':
-                    usd_amount = self.amount
-                    crypto_amount = usd_amount / current_price
-                else:
-                    # If amount is specified in crypto for a buy order
-                    crypto_amount = self.amount
-                    usd_amount = crypto_amount * current_price
-                
-                # Check if user has enough balance
-                if self.from_wallet.balance < usd_amount:
-                    print(f"Insufficient balance for recurring buy order {self.id}")
-                    return False
-                
-                # Create transaction
-                transaction = Transaction.objects.create(
-                    user=self.user,
-                    transaction_type='buy',
-                    amount=crypto_amount,
-                    currency=self.cryptocurrency.code,
-                    native_amount=usd_amount,
-                    native_currency='USD',
-                    from_wallet=self.from_wallet,
-                    to_wallet=self.to_wallet,
-                    description=f"Recurring buy order executed at {current_price}"
-                )
-            else:  # sell
-                if self.from_wallet.currency_code == self.cryptocurrency.code:
-                    crypto_amount = self.amount
-                    usd_amount = crypto_amount * current_price
-                else:
-                    # If amount is specified in USD for a sell order
-                    usd_amount = self.amount
-                    crypto_amount = usd_amount / current_price
-                
-                # Check if user has enough crypto
-                if self.from_wallet.balance < crypto_amount:
-                    print(f"Insufficient balance for recurring sell order {self.id}")
-                    return False
-                
-                # Create transaction
-                transaction = Transaction.objects.create(
-                    user=self.user,
-                    transaction_type='sell',
-                    amount=crypto_amount,
-                    currency=self.cryptocurrency.code,
-                    native_amount=usd_amount,
-                    native_currency='USD',
-                    from_wallet=self.from_wallet,
-                    to_wallet=self.to_wallet,
-                    description=f"Recurring sell order executed at {current_price}"
-                )
-            
-            # Complete the transaction
-            transaction.complete_transaction(successful=True)
-            
-            # Update recurring order
-            self.last_executed = timezone.now()
-            self.next_execution = self.calculate_next_execution()
-            
-            # Check if we've reached the end date
-            if self.end_date and self.next_execution > self.end_date:
-                self.status = 'completed'
-                
-            self.save()
-            return True
+            from .services.settlement import SettlementBatch
+            batch = SettlementBatch()
+            batch.add(self, **self.settlement_fill())
+            if batch.commit()['settled'] == 1:
+                return True
+            print(f"Insufficient balance for recurring {self.order_type} order {self.id}")
+            return False
                 
         except Exception as e:
             print(f"Error executing recurring order: {e}")
@@ -738,12 +792,24 @@ class PaymentMethod(models.Model):
 
 
 class PriceAlert(models.Model):
+    DIRECTION_CHOICES = (
+        ('above', 'Price rises to or above target'),
+        ('below', 'Price falls to or below target'),
+    )
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     symbol = models.CharField(max_length=10)
     target_price = models.DecimalField(max_digits=20, decimal_places=8)
+    direction = models.CharField(max_length=5, choices=DIRECTION_CHOICES, default='above')
     created_at = models.DateTimeField(auto_now_add=True)
     triggered = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Supports the per-symbol threshold range scans in services.price_alerts
+            models.Index(fields=['symbol', 'triggered', 'direction', 'target_price']),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.symbol} - {self.target_price}"
 
@@ -903,6 +969,9 @@ class TaxReport(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     report_file = models.FileField(upload_to='tax_reports/', null=True, blank=True)
     error_message = models.TextField(blank=True, null=True)
+    cost_basis_method = models.CharField(max_length=4, choices=CoinbaseUser.COST_BASIS_METHOD_CHOICES, default='fifo')
+    # Percentage done while a background task generates the report
+    progress = models.PositiveSmallIntegerField(default=0)
     
     def __str__(self):
         return f"{self.user.username}'s {self.tax_year} Tax Report"
@@ -938,3 +1007,83 @@ class TaxTransaction(models.Model):
     
     def __str__(self):
         return f"Tax info for {self.transaction}"
+
+
+class TaxLot(models.Model):
+    """A buy with units still held, kept by services.tax_ledger"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tax_lots')
+    currency = models.CharField(max_length=10)
+    transaction = models.OneToOneField(Transaction, on_delete=models.CASCADE, related_name='tax_lot')
+    acquired_at = models.DateTimeField()
+    amount = models.DecimalField(max_digits=24, decimal_places=8)
+    # Kept at full precision: partial disposals prorate it by remaining/amount
+    cost = models.DecimalField(max_digits=24, decimal_places=8)
+    remaining = models.DecimalField(max_digits=24, decimal_places=8)
+    # Rounded cost per unit, only for ordering HIFO disposals in the database
+    unit_cost = models.DecimalField(max_digits=30, decimal_places=10)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'currency', 'acquired_at']),
+            models.Index(fields=['user', 'currency', '-unit_cost']),
+        ]
+
+    def __str__(self):
+        return f"{self.remaining}/{self.amount} {self.currency} lot from {self.acquired_at}"
+
+    @property
+    def price_per_unit(self):
+        return self.cost / self.amount if self.amount else Decimal('0')
+
+
+class RealizedGain(models.Model):
+    """The part of a sell matched against one lot (or the average cost), kept by services.tax_ledger"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='realized_gains')
+    currency = models.CharField(max_length=10)
+    sell_transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='realized_gains')
+    # None for the average cost method and for units no lot covered
+    buy_transaction = models.ForeignKey(
+        Transaction, on_delete=models.CASCADE, related_name='disposals', null=True, blank=True
+    )
+    acquired_at = models.DateTimeField(null=True, blank=True)
+    disposed_at = models.DateTimeField()
+    amount = models.DecimalField(max_digits=24, decimal_places=8)
+    cost_basis = models.DecimalField(max_digits=24, decimal_places=8)
+    proceeds = models.DecimalField(max_digits=24, decimal_places=8)
+    is_long_term = models.BooleanField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'currency', 'disposed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.amount} {self.currency} disposed of at {self.disposed_at}"
+
+
+class TaxLedgerCheckpoint(models.Model):
+    """How far services.tax_ledger has applied a user's fills of one currency"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tax_ledger_checkpoints')
+    currency = models.CharField(max_length=10)
+    method = models.CharField(max_length=4, choices=CoinbaseUser.COST_BASIS_METHOD_CHOICES, default='fifo')
+    # Last fill applied, in (created_at, id) order, and how many fills up to it
+    last_created_at = models.DateTimeField(null=True, blank=True)
+    last_transaction_id = models.UUIDField(null=True, blank=True)
+    fill_count = models.PositiveIntegerField(default=0)
+    # When the last sync read the fills, and how many applied fills lie
+    # within LATE_COMMIT_WINDOW of the last one
+    synced_at = models.DateTimeField(null=True, blank=True)
+    tail_count = models.PositiveIntegerField(default=0)
+    # Average cost pool, for the 'acb' method
+    quantity = models.DecimalField(max_digits=24, decimal_places=8, default=0)
+    cost = models.DecimalField(max_digits=24, decimal_places=8, default=0)
+    weighted_time = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'currency'], name='unique_tax_ledger_checkpoint'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}'s {self.currency} tax ledger ({self.method})"
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.utils import timezone
 from django_q.models import Schedule
 from django_q.tasks import async_task
@@ -9,23 +10,35 @@ def check_and_process_orders():
     cmd = Command()
     cmd.handle()
 
+def process_recurring_orders():
+    """Execute recurring orders that are due"""
+    from .services.recurring import RecurringOrderRunner
+    RecurringOrderRunner().run()
+
 def check_price_alerts():
     """Check price alerts and trigger them if conditions are met"""
-    alerts = PriceAlert.objects.filter(triggered=False)
-    for alert in alerts:
-        current_price = get_current_price(alert.symbol)  # Implement this function to get the current price
-        if (alert.target_price >= current_price and alert.symbol == 'buy') or \
-           (alert.target_price <= current_price and alert.symbol == 'sell'):
-            alert.triggered = True
-            alert.save()
-            # Notify the user (implement the notification logic)
+    from .services.price_alerts import PriceAlertEvaluator
+    PriceAlertEvaluator().run()
 
 def setup_scheduler():
     """Set up all scheduled tasks for the trading hub app"""
-    # Schedule order checking every minute
+    # Price writes and marketable new orders are evaluated as they happen
+    # (services.price_events); this sweep catches evaluations that were lost
     Schedule.objects.get_or_create(
         func='trading_hub.scheduler.check_and_process_orders',
         name='Process Trading Orders',
+        defaults={
+            'schedule_type': Schedule.MINUTES,
+            'minutes': getattr(settings, 'ORDER_SWEEP_MINUTES', 5),
+            'repeats': -1,  # Repeat indefinitely
+            'next_run': timezone.now(),
+        }
+    )
+
+    # Schedule due recurring orders every minute; idle runs are one index lookup
+    Schedule.objects.get_or_create(
+        func='trading_hub.scheduler.process_recurring_orders',
+        name='Process Recurring Orders',
         defaults={
             'schedule_type': Schedule.MINUTES,
             'minutes': 1,  # Run every minute
@@ -0,0 +1,273 @@
+import logging
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.utils.dateparse import parse_datetime
+
+from trading_hub.models import LimitOrder, RecurringOrder, StopOrder
+from trading_hub.services.charting import lttb, load_series
+from trading_hub.services.tick_archive import from_micros, to_micros
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_TYPES = ('limit', 'stop', 'recurring')
+
+# Points kept in the returned equity curve
+EQUITY_POINTS = 300
+
+
+class BacktestError(ValueError):
+    """A strategy specification that cannot be backtested"""
+
+
+def _decimal(spec, key, required=True):
+    value = spec.get(key)
+    if value in (None, ''):
+        if required:
+            raise BacktestError(f"{key} is required")
+        return None
+    try:
+        value = Decimal(str(value))
+    except InvalidOperation:
+        raise BacktestError(f"{key} must be a number")
+    if value <= 0:
+        raise BacktestError(f"{key} must be greater than zero")
+    return value
+
+
+def parse_spec_datetime(spec, key):
+    """Aware datetime from an ISO 8601 string (or datetime) in spec, or None"""
+    value = spec.get(key)
+    if value in (None, '') or isinstance(value, datetime):
+        return value or None
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise BacktestError(f"{key} must be an ISO 8601 datetime")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)
+
+
+def spec_for_order(order):
+    """Strategy spec that replays an existing LimitOrder, StopOrder or RecurringOrder"""
+    if isinstance(order, LimitOrder):
+        return {
+            'type': 'limit', 'side': order.side, 'amount': order.amount - order.filled_amount,
+            'limit_price': order.limit_price, 'expires_at': order.expires_at,
+        }
+    if isinstance(order, StopOrder):
+        return {
+            'type': 'stop', 'side': order.side, 'amount': order.amount, 'stop_price': order.stop_price,
+            'limit_price': order.limit_price, 'expires_at': order.expires_at,
+        }
+    if isinstance(order, RecurringOrder):
+        amount_in = 'usd' if (
+            order.from_wallet.currency_code == 'USD' if order.order_type == 'buy'
+            else order.from_wallet.currency_code != order.cryptocurrency_id
+        ) else 'crypto'
+        return {
+            'type': 'recurring', 'side': order.order_type, 'amount': order.amount, 'interval': order.interval,
+            'amount_in': amount_in, 'start_date': order.start_date, 'end_date': order.end_date,
+        }
+    raise BacktestError(f"Cannot backtest {type(order).__name__}")
+
+
+class Backtest:
+    """
+    Replays order strategies over a historical price series in memory
+
+    Trigger rules are the model predicates the live engine uses
+    (LimitOrder.price_crosses, StopOrder.price_triggers and
+    RecurringOrder.interval_after) applied to the whole price array at once.
+    Finding a fill is a vectorized scan, and the equity curve and drawdown
+    come from cumulative sums over the fills, so multi-year per-minute series
+    run in milliseconds. Fills are priced the way settlement prices them:
+    limit orders at their limit, stops and recurring orders at the market.
+    Wallet balances are not simulated. The account starts with exactly the
+    cash and coins the strategies spend, so P&L is measured against that.
+    """
+
+    def __init__(self, timestamps, prices):
+        """
+        Initialize the backtest
+
+        Args:
+            timestamps (ndarray): Ascending epoch microsecond timestamps
+            prices (ndarray): Prices at those timestamps
+        """
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        if len(self.timestamps) != len(self.prices):
+            raise BacktestError("timestamps and prices must be the same length")
+
+    @classmethod
+    def for_currency(cls, code, start=None, end=None):
+        """Backtest over the stored price history of a currency"""
+        return cls(*load_series(code.upper(), start, end))
+
+    def _index_at(self, when):
+        """First tick at or after when (len(timestamps) when there is none)"""
+        if when is None:
+            return 0
+        return int(np.searchsorted(self.timestamps, to_micros(when), side='left'))
+
+    def _expiry_index(self, expires_at):
+        return self._index_at(expires_at) if expires_at else len(self.timestamps)
+
+    @staticmethod
+    def _first(mask, offset=0):
+        """Index of the first True in mask, shifted by offset, or None"""
+        if not len(mask):
+            return None
+        found = int(mask.argmax())
+        return offset + found if mask[found] else None
+
+    def _fill(self, index, side, amount, price, reason):
+        return {
+            'index': index,
+            'timestamp': from_micros(self.timestamps[index]),
+            'side': side,
+            'amount': float(amount),
+            'price': float(price),
+            'usd': float(amount) * float(price),
+            'reason': reason,
+        }
+
+    def limit_fills(self, side, amount, limit_price, expires_at=None, start_index=0, reason='limit'):
+        end = self._expiry_index(expires_at)
+        window = self.prices[start_index:end]
+        index = self._first(LimitOrder.price_crosses(side, float(limit_price), window), start_index)
+        if index is None:
+            return []
+        # Settlement fills limit orders at the limit price
+        return [self._fill(index, side, amount, limit_price, reason)]
+
+    def stop_fills(self, side, amount, stop_price, limit_price=None, expires_at=None):
+        end = self._expiry_index(expires_at)
+        index = self._first(StopOrder.price_triggers(side, float(stop_price), self.prices[:end]))
+        if index is None:
+            return []
+        if limit_price:
+            # A triggered stop-limit places a limit order with the same expiry
+            return self.limit_fills(side, amount, limit_price, expires_at, index, reason='stop-limit')
+        return [self._fill(index, side, amount, self.prices[index], 'stop')]
+
+    def recurring_fills(self, side, amount, interval, start_date=None, end_date=None, amount_in='usd'):
+        if interval not in dict(RecurringOrder.INTERVAL_CHOICES):
+            raise BacktestError(f"Unknown interval {interval!r}")
+        if not len(self.timestamps):
+            return []
+
+        # The order's first execution is one interval after it starts, as when it is saved
+        last_tick = from_micros(self.timestamps[-1])
+        due = RecurringOrder.interval_after(interval, start_date or from_micros(self.timestamps[0]))
+        schedule = []
+        while due <= last_tick and (end_date is None or due <= end_date):
+            schedule.append(to_micros(due))
+            due = RecurringOrder.interval_after(interval, due)
+
+        # Each execution happens at the first price at or after it falls due
+        indices = np.searchsorted(self.timestamps, np.array(schedule, dtype=np.int64), side='left')
+        fills = []
+        for index in indices[indices < len(self.timestamps)].tolist():
+            price = self.prices[index]
+            crypto_amount = float(amount) / price if amount_in == 'usd' else float(amount)
+            fills.append(self._fill(index, side, crypto_amount, price, 'recurring'))
+        return fills
+
+    def fills_for(self, spec):
+        """
+        Fills for one strategy spec
+
+        Args:
+            spec (dict): type (limit, stop or recurring) and side, amount plus
+                limit_price/expires_at, stop_price/limit_price/expires_at or
+                interval/amount_in/start_date/end_date respectively
+
+        Raises:
+            BacktestError: If the spec is invalid
+        """
+        kind = spec.get('type')
+        side = spec.get('side')
+        if kind not in STRATEGY_TYPES:
+            raise BacktestError(f"type must be one of {', '.join(STRATEGY_TYPES)}")
+        if side not in ('buy', 'sell'):
+            raise BacktestError("side must be buy or sell")
+        amount = _decimal(spec, 'amount')
+
+        if kind == 'limit':
+            return self.limit_fills(side, amount, _decimal(spec, 'limit_price'), parse_spec_datetime(spec, 'expires_at'))
+        if kind == 'stop':
+            return self.stop_fills(
+                side, amount, _decimal(spec, 'stop_price'),
+                _decimal(spec, 'limit_price', required=False), parse_spec_datetime(spec, 'expires_at'),
+            )
+        amount_in = spec.get('amount_in', 'usd')
+        if amount_in not in ('usd', 'crypto'):
+            raise BacktestError("amount_in must be usd or crypto")
+        return self.recurring_fills(
+            side, amount, spec.get('interval'), parse_spec_datetime(spec, 'start_date'),
+            parse_spec_datetime(spec, 'end_date'), amount_in,
+        )
+
+    def run(self, specs, equity_points=EQUITY_POINTS):
+        """
+        Backtest several strategies together on one account
+
+        Returns:
+            dict: Fills, summary figures (invested, P&L, return and maximum
+            drawdown) and a downsampled equity curve
+        """
+        fills = sorted((fill for spec in specs for fill in self.fills_for(spec)), key=lambda fill: fill['index'])
+        n = len(self.prices)
+
+        coins = np.zeros(n)
+        cash = np.zeros(n)
+        for fill in fills:
+            direction = 1 if fill['side'] == 'buy' else -1
+            coins[fill['index']] += direction * fill['amount']
+            cash[fill['index']] -= direction * fill['usd']
+        coins = np.cumsum(coins)
+        cash = np.cumsum(cash)
+
+        # Start with exactly the cash and coins the strategies ever need
+        starting_cash = max(float(-cash.min()), 0.0) if n else 0.0
+        starting_coins = max(float(-coins.min()), 0.0) if n else 0.0
+        equity = starting_cash + cash + (starting_coins + coins) * self.prices
+        starting_equity = float(starting_cash + starting_coins * (self.prices[0] if n else 0.0))
+
+        if n:
+            peaks = np.maximum.accumulate(equity)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                drawdowns = np.where(peaks > 0, (peaks - equity) / peaks, 0.0)
+            max_drawdown = float(drawdowns.max())
+            final_equity = float(equity[-1])
+            kept = lttb(self.timestamps, equity, equity_points)
+        else:
+            max_drawdown = 0.0
+            final_equity = 0.0
+            kept = np.arange(0)
+
+        pnl = final_equity - starting_equity
+        bought = sum(fill['amount'] for fill in fills if fill['side'] == 'buy')
+        spent = sum(fill['usd'] for fill in fills if fill['side'] == 'buy')
+        return {
+            'points': n,
+            'fills': [
+                {key: value for key, value in fill.items() if key != 'index'}
+                for fill in fills
+            ],
+            'summary': {
+                'fills': len(fills),
+                'invested_usd': round(spent, 2),
+                'average_buy_price': round(spent / bought, 2) if bought else None,
+                'position': round(float(coins[-1]), 8) if n else 0.0,
+                'final_price': float(self.prices[-1]) if n else None,
+                'pnl_usd': round(pnl, 2),
+                'return_percent': round(pnl / starting_equity * 100, 2) if starting_equity else None,
+                'max_drawdown_percent': round(max_drawdown * 100, 2),
+            },
+            'equity': {
+                'timestamps': (self.timestamps[kept] // 1000).tolist(),
+                'values': equity[kept].round(2).tolist(),
+            },
+        }
@@ -0,0 +1,266 @@
+import hashlib
+import hmac
+import logging
+import platform
+import time
+from decimal import Decimal
+
+import django
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from trading_hub.models import APIKey, CryptoCurrency, Wallet
+from trading_hub.services.order_engine import OrderEvaluator
+from trading_hub.services.seeding import SeedLoader
+from trading_hub.services.tax_calculator import TaxCalculator
+
+logger = logging.getLogger(__name__)
+
+# Seed volumes per data scale, passed to SeedLoader.run
+SCALES = {
+    'small': {
+        'users': 50, 'transactions': 5000, 'limit_orders': 1000, 'stop_orders': 500,
+        'recurring_orders': 200, 'price_points': 500, 'news': 50,
+    },
+    'medium': {
+        'users': 500, 'transactions': 50000, 'limit_orders': 10000, 'stop_orders': 5000,
+        'recurring_orders': 2000, 'price_points': 5000, 'news': 500,
+    },
+    'large': {
+        'users': 5000, 'transactions': 500000, 'limit_orders': 100000, 'stop_orders': 50000,
+        'recurring_orders': 20000, 'price_points': 50000, 'news': 5000,
+    },
+}
+
+# A case regresses when its median grows by more than this fraction...
+DEFAULT_TOLERANCE = 0.25
+# ...and by at least this many milliseconds, so sub-millisecond noise never fails a run
+MIN_REGRESSION_MS = 1.0
+
+# API list endpoints benchmarked, by URL name
+API_LISTS = {
+    'api_transactions': 'transaction-list',
+    'api_wallets': 'wallet-list',
+    'api_limit_orders': 'limitorder-list',
+    'api_cryptocurrencies': 'cryptocurrency-list',
+    'api_news': 'news-list',
+}
+
+
+def summarize(timings, queries):
+    """
+    Latency percentiles and query count for one case
+
+    Args:
+        timings (list): Seconds per timed run
+        queries (int): Most queries any run made
+
+    Returns:
+        dict: runs, p50/p95/p99/mean/min/max in milliseconds and queries
+    """
+    ms = np.asarray(timings, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0.0, 0.0, 0.0)
+    return {
+        'runs': len(ms),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(ms.mean()), 3) if len(ms) else 0.0,
+        'min_ms': round(float(ms.min()), 3) if len(ms) else 0.0,
+        'max_ms': round(float(ms.max()), 3) if len(ms) else 0.0,
+        'queries': queries,
+    }
+
+
+def measure(func, setup=None, repeat=20, warmup=2):
+    """
+    Time func over repeat runs, each starting from the same data
+
+    Every run happens inside a transaction that is rolled back afterwards,
+    so writes (fills, trades, reports) do not pile up between runs. Queries
+    are counted on the warm-up runs only, keeping the capture overhead out
+    of the timings.
+
+    Args:
+        func (callable): The operation to time
+        setup (callable): Untimed preparation run before each call, inside
+            the same transaction
+        repeat (int): Timed runs
+        warmup (int): Untimed runs before them (at least one, for the query count)
+
+    Returns:
+        dict: See summarize()
+    """
+    timings = []
+    queries = 0
+    for run in range(max(warmup, 1) + repeat):
+        timed = run >= max(warmup, 1)
+        with transaction.atomic():
+            if setup:
+                setup()
+            if timed:
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+            else:
+                with CaptureQueriesContext(connection) as captured:
+                    func()
+                queries = max(queries, len(captured))
+            transaction.set_rollback(True)
+    return summarize(timings, queries)
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, min_ms=MIN_REGRESSION_MS):
+    """
+    Regressions of results against a baseline for the same database vendor
+
+    A case regresses when it makes more queries than before, or when its
+    median latency grows by more than tolerance and min_ms. The median is
+    compared because it holds steady between runs on a busy machine; the
+    tail percentiles are recorded for reading, not gating. Cases missing
+    from either side are skipped.
+
+    Args:
+        results (dict): scale -> case -> summary
+        baseline (dict): The same shape, from an earlier run
+
+    Returns:
+        list: One message per regression
+    """
+    regressions = []
+    for scale, cases in results.items():
+        for case, current in cases.items():
+            previous = baseline.get(scale, {}).get(case)
+            if previous is None:
+                continue
+            if current['queries'] > previous['queries']:
+                regressions.append(
+                    f"{scale}/{case}: {current['queries']} queries, baseline {previous['queries']}"
+                )
+            slower = current['p50_ms'] - previous['p50_ms']
+            if slower > min_ms and current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+                regressions.append(
+                    f"{scale}/{case}: p50 {current['p50_ms']:.2f} ms, baseline {previous['p50_ms']:.2f} ms "
+                    f"(+{slower / previous['p50_ms'] * 100 if previous['p50_ms'] else 100:.0f}%)"
+                )
+    return regressions
+
+
+def environment():
+    """Where the results were measured, stored alongside them"""
+    return {
+        'vendor': connection.vendor,
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+    }
+
+
+class BenchmarkSuite:
+    """
+    Times the trading hot paths on a seeded database
+
+    Cases:
+        check_limit_orders: One OrderEvaluator tick after BTC drops 10%
+        create_trade: A buy through the buy_crypto view
+        dashboard: The dashboard page with a cold cache
+        tax_report: TaxCalculator.generate_tax_report for the benchmark user
+        api_*: The REST API list endpoints, signed with an API key
+
+    The suite writes to whatever database is current, so run it against a
+    throwaway one (the run_benchmarks command creates a test database).
+    """
+
+    CASES = ('check_limit_orders', 'create_trade', 'dashboard', 'tax_report') + tuple(API_LISTS)
+
+    def __init__(self, repeat=20, warmup=2, seed=42):
+        self.repeat = repeat
+        self.warmup = warmup
+        self.seed = seed
+        self.user = None
+        self.api_key = None
+        self.client = Client()
+
+    def load(self, scale):
+        """
+        Seed the data for a scale and pick the benchmark user
+
+        Returns:
+            dict: SeedLoader report
+        """
+        report = SeedLoader(seed=self.seed, prefix='bench').run(**SCALES[scale])
+
+        # The first seeded user acts; enough cash that every buy goes through
+        self.user = User.objects.filter(username__startswith='bench_').order_by('id').first()
+        Wallet.objects.filter(user=self.user, currency_code='USD').update(balance=Decimal('1000000000'))
+        self.api_key = APIKey.objects.create(user=self.user, name='Benchmarks', permissions='read_write')
+        self.client.force_login(self.user)
+        return report
+
+    def _signed_get(self, url):
+        timestamp = str(int(time.time()))
+        signature = hmac.new(
+            self.api_key.secret.encode(), f'{timestamp}GET{url}'.encode(), hashlib.sha256
+        ).hexdigest()
+        response = self.client.get(
+            url, HTTP_X_API_KEY=self.api_key.key, HTTP_X_API_SIGNATURE=signature, HTTP_X_API_TIMESTAMP=timestamp,
+        )
+        self._check(response, url)
+
+    @staticmethod
+    def _check(response, url, expected=(200,)):
+        # A benchmark of an error page measures the wrong thing
+        if response.status_code not in expected:
+            raise RuntimeError(f"{url} returned {response.status_code}")
+
+    def cases(self):
+        """Case name -> (operation, untimed setup or None)"""
+        btc_price = CryptoCurrency.objects.get(code='BTC').current_price_usd
+        buy_url = reverse('buy_crypto', args=['BTC'])
+        dashboard_url = reverse('dashboard')
+        tax_year = (timezone.now() - timezone.timedelta(days=182)).year
+
+        cases = {
+            'check_limit_orders': (
+                lambda: OrderEvaluator().run(),
+                # update() skips the post_save price trigger, leaving the crossed orders to the tick
+                lambda: CryptoCurrency.objects.filter(code='BTC').update(current_price_usd=btc_price * Decimal('0.9')),
+            ),
+            'create_trade': (
+                lambda: self._check(self.client.post(buy_url, {'amount': '0.001'}), buy_url, (200, 302)),
+                None,
+            ),
+            'dashboard': (
+                lambda: self._check(self.client.get(dashboard_url), dashboard_url),
+                cache.clear,
+            ),
+            'tax_report': (
+                lambda: TaxCalculator(self.user, tax_year).generate_tax_report(),
+                None,
+            ),
+        }
+        for case, name in API_LISTS.items():
+            cases[case] = (lambda url=reverse(name): self._signed_get(url), cache.clear)
+        return cases
+
+    def run(self, only=None):
+        """
+        Measure every case (or those in only) on the loaded data
+
+        Returns:
+            dict: Case -> summary
+        """
+        results = {}
+        for case, (func, setup) in self.cases().items():
+            if only and case not in only:
+                continue
+            results[case] = measure(func, setup, self.repeat, self.warmup)
+            logger.debug("Benchmark %s: %s", case, results[case])
+        return results
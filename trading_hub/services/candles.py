@@ -0,0 +1,187 @@
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+
+from trading_hub.models import PriceCandle
+
+logger = logging.getLogger(__name__)
+
+# Bucket length in seconds for each resolution, finest first
+RESOLUTIONS = OrderedDict([
+    ('1m', 60),
+    ('5m', 5 * 60),
+    ('1h', 60 * 60),
+    ('1d', 24 * 60 * 60),
+    ('1w', 7 * 24 * 60 * 60),
+])
+
+# The Unix epoch fell on a Thursday; shift weekly buckets so they start on Monday
+WEEK_OFFSET = 4 * 24 * 60 * 60
+
+# Default upper bound on the candles a chart range reads
+MAX_POINTS = 300
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def bucket_start(timestamp, resolution):
+    """Start of the bucket containing timestamp at the given resolution"""
+    seconds = RESOLUTIONS[resolution]
+    offset = WEEK_OFFSET if resolution == '1w' else 0
+    elapsed = int((timestamp - EPOCH).total_seconds()) - offset
+    return EPOCH + timedelta(seconds=elapsed - elapsed % seconds + offset)
+
+
+def resolution_for_range(start, end, max_points=MAX_POINTS):
+    """
+    Finest resolution that covers start..end in at most max_points candles
+
+    Falls back to the coarsest resolution for ranges too long for any of them.
+    """
+    span = max((end - start).total_seconds(), 0)
+    for resolution, seconds in RESOLUTIONS.items():
+        if span / seconds <= max_points:
+            return resolution
+    return next(reversed(RESOLUTIONS))
+
+
+class CandleAggregator:
+    """
+    Rolls price ticks up into candles at every resolution
+
+    Ticks are merged into pending in-memory candles as they arrive; flush()
+    then merges the pending candles into the stored ones, creating new buckets
+    with one bulk_create and extending existing ones with one bulk_update.
+    Each bucket therefore costs one row write per flush however many ticks it
+    received. Flushes must come from a single writer, such as the ingestion
+    daemon or the backfill command, so merges do not race.
+    """
+
+    def __init__(self, resolutions=None):
+        """
+        Initialize the aggregator
+
+        Args:
+            resolutions (list): Resolutions to maintain (defaults to all of them)
+        """
+        self.resolutions = list(resolutions or RESOLUTIONS)
+        self.pending = {}  # (code, resolution, bucket_start) -> candle dict
+
+    def add(self, code, timestamp, open_price, high, low, close, volume=0, ticks=1):
+        """Merge a price summary that starts at timestamp into the pending candles"""
+        for resolution in self.resolutions:
+            key = (code, resolution, bucket_start(timestamp, resolution))
+            candle = self.pending.get(key)
+            if candle is None:
+                self.pending[key] = {
+                    'open': open_price,
+                    'high': high,
+                    'low': low,
+                    'close': close,
+                    'volume': volume,
+                    'tick_count': ticks,
+                }
+            else:
+                candle['high'] = max(candle['high'], high)
+                candle['low'] = min(candle['low'], low)
+                candle['close'] = close
+                candle['volume'] += volume
+                candle['tick_count'] += ticks
+
+    def add_tick(self, code, timestamp, price, volume=0):
+        self.add(code, timestamp, price, price, price, price, volume)
+
+    def add_window(self, window):
+        """Merge a window summary from price_feed.TickCoalescer"""
+        self.add(
+            window['symbol'], window['start'], window['open'], window['high'],
+            window['low'], window['close'], window['volume'], window['ticks'],
+        )
+
+    def consume(self, windows):
+        """PriceWriter hook: fold the flushed windows in and persist them"""
+        for window in windows:
+            self.add_window(window)
+        return self.flush()
+
+    def flush(self):
+        """
+        Write the pending candles
+
+        Returns:
+            dict: Counts of candles created and updated
+        """
+        if not self.pending:
+            return {'created': 0, 'updated': 0}
+        pending, self.pending = self.pending, {}
+
+        # Per resolution, the touched buckets fall within one short time range
+        ranges = {}
+        for code, resolution, start in pending:
+            codes, first, last = ranges.get(resolution, (set(), start, start))
+            codes.add(code)
+            ranges[resolution] = (codes, min(first, start), max(last, start))
+
+        with transaction.atomic():
+            existing = {}
+            for resolution, (codes, first, last) in ranges.items():
+                for candle in PriceCandle.objects.filter(
+                    resolution=resolution,
+                    currency_id__in=codes,
+                    bucket_start__gte=first,
+                    bucket_start__lte=last,
+                ):
+                    existing[(candle.currency_id, candle.resolution, candle.bucket_start)] = candle
+
+            created = []
+            updated = []
+            for key, values in pending.items():
+                candle = existing.get(key)
+                if candle is None:
+                    code, resolution, start = key
+                    created.append(PriceCandle(currency_id=code, resolution=resolution, bucket_start=start, **values))
+                    continue
+                candle.high = max(candle.high, values['high'])
+                candle.low = min(candle.low, values['low'])
+                candle.close = values['close']
+                candle.volume += values['volume']
+                candle.tick_count += values['tick_count']
+                updated.append(candle)
+
+            PriceCandle.objects.bulk_create(created, batch_size=500)
+            PriceCandle.objects.bulk_update(updated, ['high', 'low', 'close', 'volume', 'tick_count'], batch_size=500)
+
+        logger.debug("Candle flush: %s created, %s updated", len(created), len(updated))
+        return {
+            'created': len(created),
+            'updated': len(updated),
+        }
+
+
+def get_candles(code, start, end, resolution=None, max_points=MAX_POINTS):
+    """
+    Candles for a chart range
+
+    Args:
+        code (str): Cryptocurrency code
+        start (datetime): Start of the range
+        end (datetime): End of the range
+        resolution (str): Resolution to read (defaults to the finest one that
+            fits the range in max_points candles)
+        max_points (int): Upper bound on the candles returned
+
+    Returns:
+        tuple: (resolution, list of candle dicts oldest first)
+    """
+    resolution = resolution or resolution_for_range(start, end, max_points)
+    candles = PriceCandle.objects.filter(
+        currency_id=code,
+        resolution=resolution,
+        bucket_start__gte=bucket_start(start, resolution),
+        bucket_start__lte=end,
+    ).order_by('-bucket_start').values(
+        'bucket_start', 'open', 'high', 'low', 'close', 'volume'
+    )[:max_points]
+    return resolution, list(reversed(candles))
@@ -0,0 +1,200 @@
+import hashlib
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from trading_hub.models import PriceHistory
+from trading_hub.services.tick_archive import PRICE_SCALE, get_tick_archive, to_micros, unarchived_ticks
+
+logger = logging.getLogger(__name__)
+
+# Chart ranges a client can ask for; None means all history
+RANGES = {
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+    '1w': timedelta(weeks=1),
+    '1m': timedelta(days=30),
+    '1y': timedelta(days=365),
+    'all': None,
+}
+
+DEFAULT_POINTS = 300
+MAX_POINTS = 1000
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the point
+    kept from the previous bucket and the mean of the next bucket. Peaks and
+    troughs survive, unlike with plain striding or averaging.
+
+    Args:
+        x (ndarray): Ascending x values (e.g. timestamps)
+        y (ndarray): y values
+        threshold (int): Number of points to keep
+
+    Returns:
+        ndarray: Indices of the kept points, ascending
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket edges over the points between the fixed first and last ones
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            average_x = x[next_start:next_end].mean()
+            average_y = y[next_start:next_end].mean()
+        else:
+            average_x, average_y = x[-1], y[-1]
+
+        # Twice the triangle areas, vectorized over the bucket
+        areas = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def load_series(code, start=None, end=None, archive=None):
+    """
+    Full-resolution price series for a currency
+
+    Ticks up to the tick archive's last timestamp come from the archive and
+    the rest from PriceHistory, which the price writer keeps adding to
+    between archive runs (see unarchived_ticks). With nothing archived it
+    is PriceHistory alone.
+
+    Args:
+        code (str): Cryptocurrency code
+        start (datetime): Start of the range (defaults to the first tick)
+        end (datetime): End of the range (defaults to the last tick)
+        archive (TickArchive): Archive to read (defaults to the shared one)
+
+    Returns:
+        tuple: (epoch microsecond timestamps, float prices) arrays
+    """
+    series = (archive or get_tick_archive()).series(code)
+    archived_until = series.last_timestamp
+    if archived_until is not None:
+        timestamps, prices = series.range(start, end)
+        prices = prices / PRICE_SCALE
+    else:
+        timestamps = np.empty(0, dtype=np.int64)
+        prices = np.empty(0, dtype=np.float64)
+
+    rows = PriceHistory.objects.filter(currency_id=code)
+    if start is not None:
+        rows = rows.filter(timestamp__gte=start)
+    if end is not None:
+        rows = rows.filter(timestamp__lte=end)
+    rows = list(unarchived_ticks(rows, series))
+    if not rows:
+        return timestamps, prices
+    return (
+        np.concatenate((timestamps, np.fromiter(
+            (to_micros(timestamp) for timestamp, _ in rows), dtype=np.int64, count=len(rows)
+        ))),
+        np.concatenate((prices, np.fromiter(
+            (price for _, price in rows), dtype=np.float64, count=len(rows)
+        ))),
+    )
+
+
+class ChartSeries:
+    """
+    Price series for one cryptocurrency over a chart range
+
+    Ticks are read from the columnar tick archive up to its last timestamp
+    and from PriceHistory after that. The full-resolution series is reduced to
+    at most `points` points with LTTB before it leaves the server.
+    """
+
+    def __init__(self, code, range_key='1d', points=DEFAULT_POINTS, now=None):
+        """
+        Initialize the series
+
+        Args:
+            code (str): Cryptocurrency code
+            range_key (str): One of RANGES
+            points (int): Maximum points returned (capped at MAX_POINTS)
+            now (datetime): End of the range (defaults to now)
+        """
+        if range_key not in RANGES:
+            raise ValueError(f"Unknown chart range {range_key!r}")
+        self.code = code.upper()
+        self.range_key = range_key
+        self.points = max(2, min(int(points), MAX_POINTS))
+        self.end = now or timezone.now()
+        span = RANGES[range_key]
+        self.start = self.end - span if span else None
+        self._etag = None
+
+    def last_tick(self):
+        """
+        Timestamp of the newest tick in either source, as epoch microseconds,
+        and the id of the newest PriceHistory row
+
+        The id moves when a row lands at a timestamp already seen. Cheap
+        enough to run on every request: one indexed query plus a file stat.
+        """
+        archived = get_tick_archive().series(self.code).last_timestamp
+        latest, latest_id = (
+            PriceHistory.objects.filter(currency_id=self.code)
+            .order_by('-timestamp', '-id').values_list('timestamp', 'id').first()
+        ) or (None, None)
+        stamps = [stamp for stamp in (archived, latest and to_micros(latest)) if stamp is not None]
+        return (max(stamps) if stamps else None), latest_id
+
+    def etag(self):
+        """ETag for the response, changing only when a new tick lands"""
+        if self._etag is None:
+            key = f"{self.code}:{self.range_key}:{self.points}:{self.last_tick()}"
+            self._etag = hashlib.md5(key.encode()).hexdigest()
+        return self._etag
+
+    def raw(self):
+        """
+        Full-resolution series for the range
+
+        Returns:
+            tuple: (epoch microsecond timestamps, float prices) arrays
+        """
+        return load_series(self.code, self.start, self.end)
+
+    def data(self):
+        """
+        Downsampled series ready for JSON
+
+        Returns:
+            dict: Code, range, point count and parallel timestamp (epoch
+            milliseconds) and price lists
+        """
+        timestamps, prices = self.raw()
+        kept = lttb(timestamps, prices, self.points)
+        return {
+            'code': self.code,
+            'range': self.range_key,
+            'source_points': len(timestamps),
+            'timestamps': (timestamps[kept] // 1000).tolist(),
+            'prices': prices[kept].round(8).tolist(),
+        }
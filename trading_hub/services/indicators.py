@@ -0,0 +1,336 @@
+import logging
+import math
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Weights in the blocked recurrence are kept under this, bounding the rounding error
+_MAX_WEIGHT = 1e8
+
+
+def _recurrence(x, decay, initial=0.0):
+    """
+    y[t] = decay * y[t - 1] + x[t] with y[-1] = initial, vectorized
+
+    The series is cut into blocks short enough that decay ** -block stays
+    below _MAX_WEIGHT. Inside a block the recurrence is a scaled cumulative
+    sum, computed for every block at once. Each block's carry-in is the same
+    recurrence over the block ends, with decay ** block, which is tiny, so
+    that second pass is short.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if n == 0 or decay <= 0:
+        return x.copy()
+
+    block = int(math.log(_MAX_WEIGHT) / -math.log(decay)) if decay < 1 else n
+    if block <= 1:
+        # Decay is so strong that the carry hardly matters; a scalar loop over few terms is cheap
+        y = np.empty(n)
+        previous = initial
+        for t in range(n):
+            previous = decay * previous + x[t]
+            y[t] = previous
+        return y
+
+    powers = decay ** np.arange(min(block, n))
+    if n <= block:
+        return powers * np.cumsum(x / powers) + initial * decay * powers
+
+    blocks = -(-n // block)
+    padded = np.zeros(blocks * block)
+    padded[:n] = x
+    padded = padded.reshape(blocks, block)
+    partial = powers * np.cumsum(padded / powers, axis=1)
+
+    ends = _recurrence(partial[:, -1], decay ** block, initial)
+    carry_in = np.concatenate(([initial], ends[:-1]))
+    y = partial + np.outer(carry_in, decay * powers)
+    return y.reshape(-1)[:n]
+
+
+def sma(values, period):
+    """Simple moving average; the first period - 1 entries are NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if period <= 0 or len(values) < period:
+        return out
+    # Offsetting by the first value keeps the running sum small
+    sums = np.cumsum(values - values[0])
+    out[period - 1] = sums[period - 1]
+    out[period:] = sums[period:] - sums[:-period]
+    out[period - 1:] = out[period - 1:] / period + values[0]
+    return out
+
+
+def ema(values, period):
+    """Exponential moving average with alpha = 2 / (period + 1), seeded with the first value"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values.copy()
+    alpha = 2.0 / (period + 1)
+    return _recurrence(alpha * values, 1 - alpha, values[0])
+
+
+def _wilder(values, period, start):
+    """Wilder smoothing (alpha = 1 / period) seeded with the mean of values[start:start + period]"""
+    out = np.full(len(values), np.nan)
+    seed_end = start + period
+    if len(values) < seed_end:
+        return out
+    seed = values[start:seed_end].mean()
+    out[seed_end - 1] = seed
+    out[seed_end:] = _recurrence(values[seed_end:] / period, 1 - 1.0 / period, seed)
+    return out
+
+
+def rsi(values, period=14):
+    """Relative strength index (Wilder); the first period entries are NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    changes = np.diff(values, prepend=np.nan)
+    gains = np.where(changes > 0, changes, 0.0)
+    losses = np.where(changes < 0, -changes, 0.0)
+    average_gain = _wilder(gains, period, 1)
+    average_loss = _wilder(losses, period, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = 100 - 100 / (1 + average_gain / average_loss)
+    # No losses at all means maximum strength rather than a division by zero
+    out[(average_loss == 0) & ~np.isnan(average_gain)] = 100.0
+    return out
+
+
+def macd(values, fast=12, slow=26, signal=9):
+    """
+    Moving average convergence divergence
+
+    Returns:
+        tuple: (macd line, signal line, histogram) arrays
+    """
+    line = ema(values, fast) - ema(values, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(values, period=20, width=2.0):
+    """
+    Bollinger bands around an SMA, using the population standard deviation
+
+    Returns:
+        tuple: (middle, upper, lower) arrays
+    """
+    values = np.asarray(values, dtype=np.float64)
+    middle = sma(values, period)
+    spread = np.full(len(values), np.nan)
+    if len(values) >= period:
+        shifted = values - values[0]
+        squares = np.cumsum(shifted ** 2)
+        window_squares = np.concatenate(([squares[period - 1]], squares[period:] - squares[:-period]))
+        window_means = middle[period - 1:] - values[0]
+        variance = np.maximum(window_squares / period - window_means ** 2, 0)
+        spread[period - 1:] = np.sqrt(variance)
+    return middle, middle + width * spread, middle - width * spread
+
+
+def vwap(high, low, close, volume):
+    """Cumulative volume-weighted average of the typical price"""
+    typical = (np.asarray(high, dtype=np.float64) + low + close) / 3
+    volume = np.asarray(volume, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.cumsum(typical * volume) / np.cumsum(volume)
+
+
+def true_range(high, low, close):
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    previous_close = np.concatenate(([np.nan], np.asarray(close, dtype=np.float64)[:-1]))
+    ranges = np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+    return ranges
+
+
+def atr(high, low, close, period=14):
+    """Average true range (Wilder); the first period - 1 entries are NaN"""
+    return _wilder(true_range(high, low, close), period, 0)
+
+
+class IncrementalSMA:
+    """SMA over a stream: each update is O(1)"""
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+
+    def update(self, value):
+        self.window.append(value)
+        self.total += value
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        return self.total / self.period if len(self.window) == self.period else None
+
+
+class IncrementalEMA:
+    """EMA over a stream, matching ema() on the same values"""
+
+    def __init__(self, period):
+        self.alpha = 2.0 / (period + 1)
+        self.value = None
+
+    def update(self, value):
+        self.value = value if self.value is None else self.value + self.alpha * (value - self.value)
+        return self.value
+
+
+class IncrementalWilder:
+    """Wilder smoothing over a stream, seeded with the mean of the first period values"""
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.value = 0.0
+
+    def update(self, value):
+        self.count += 1
+        if self.count <= self.period:
+            self.value += (value - self.value) / self.count
+            return self.value if self.count == self.period else None
+        self.value += (value - self.value) / self.period
+        return self.value
+
+
+class IncrementalRSI:
+    """RSI over a stream of closes, matching rsi()"""
+
+    def __init__(self, period=14):
+        self.previous = None
+        self.gains = IncrementalWilder(period)
+        self.losses = IncrementalWilder(period)
+
+    def update(self, value):
+        if self.previous is None:
+            self.previous = value
+            return None
+        change = value - self.previous
+        self.previous = value
+        gain = self.gains.update(max(change, 0.0))
+        loss = self.losses.update(max(-change, 0.0))
+        if gain is None:
+            return None
+        return 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+
+
+class IncrementalMACD:
+    """MACD over a stream of closes; update returns (macd, signal, histogram)"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = IncrementalEMA(fast)
+        self.slow = IncrementalEMA(slow)
+        self.signal = IncrementalEMA(signal)
+
+    def update(self, value):
+        line = self.fast.update(value) - self.slow.update(value)
+        signal = self.signal.update(line)
+        return line, signal, line - signal
+
+
+class IncrementalBollinger:
+    """Bollinger bands over a stream; update returns (middle, upper, lower) or None while warming up"""
+
+    def __init__(self, period=20, width=2.0):
+        self.period = period
+        self.width = width
+        self.window = deque()
+        self.total = 0.0
+        self.squares = 0.0
+
+    def update(self, value):
+        self.window.append(value)
+        self.total += value
+        self.squares += value * value
+        if len(self.window) > self.period:
+            old = self.window.popleft()
+            self.total -= old
+            self.squares -= old * old
+        if len(self.window) < self.period:
+            return None
+        middle = self.total / self.period
+        spread = math.sqrt(max(self.squares / self.period - middle * middle, 0.0))
+        return middle, middle + self.width * spread, middle - self.width * spread
+
+
+class IncrementalVWAP:
+    """Cumulative VWAP over a stream of candles"""
+
+    def __init__(self):
+        self.weighted = 0.0
+        self.volume = 0.0
+
+    def update(self, high, low, close, volume):
+        self.weighted += (high + low + close) / 3 * volume
+        self.volume += volume
+        return self.weighted / self.volume if self.volume else None
+
+
+class IncrementalATR:
+    """ATR over a stream of candles, matching atr()"""
+
+    def __init__(self, period=14):
+        self.previous_close = None
+        self.average = IncrementalWilder(period)
+
+    def update(self, high, low, close):
+        ranges = [high - low]
+        if self.previous_close is not None:
+            ranges += [abs(high - self.previous_close), abs(low - self.previous_close)]
+        self.previous_close = close
+        return self.average.update(max(ranges))
+
+
+def candle_columns(candles):
+    """Candle dicts from candles.get_candles -> OHLCV float arrays"""
+    return {
+        field: np.fromiter((candle[field] for candle in candles), dtype=np.float64, count=len(candles))
+        for field in ('open', 'high', 'low', 'close', 'volume')
+    }
+
+
+def to_json(values):
+    """Array -> list for JSON, with NaN (not yet warmed up) as None"""
+    return [None if math.isnan(value) else round(value, 8) for value in values.tolist()]
+
+
+# Indicators the JSON endpoint can compute
+INDICATORS = ('sma', 'ema', 'rsi', 'macd', 'bollinger', 'vwap', 'atr')
+
+
+def compute(name, candles, period=None):
+    """
+    Compute one indicator over OHLCV arrays
+
+    Args:
+        name (str): One of INDICATORS
+        candles (dict): 'open', 'high', 'low', 'close' and 'volume' arrays
+        period (int): Look-back period (defaults to the indicator's usual one)
+
+    Returns:
+        dict: Output name -> array
+    """
+    close = candles['close']
+    if name == 'sma':
+        return {'sma': sma(close, period or 20)}
+    if name == 'ema':
+        return {'ema': ema(close, period or 20)}
+    if name == 'rsi':
+        return {'rsi': rsi(close, period or 14)}
+    if name == 'macd':
+        line, signal, histogram = macd(close)
+        return {'macd': line, 'signal': signal, 'histogram': histogram}
+    if name == 'bollinger':
+        middle, upper, lower = bollinger(close, period or 20)
+        return {'middle': middle, 'upper': upper, 'lower': lower}
+    if name == 'vwap':
+        return {'vwap': vwap(candles['high'], candles['low'], close, candles['volume'])}
+    if name == 'atr':
+        return {'atr': atr(candles['high'], candles['low'], close, period or 14)}
+    raise ValueError(f"Unknown indicator {name!r}")
@@ -0,0 +1,126 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+
+from trading_hub.models import Wallet
+
+# Wallets per CASE UPDATE statement
+BATCH_SIZE = 500
+
+
+class InsufficientFunds(ValueError):
+    """Raised when a debit would take a wallet balance below zero"""
+
+    def __init__(self, wallet_id, balance, amount):
+        self.wallet_id = wallet_id
+        self.balance = balance
+        self.amount = amount
+        super().__init__(f"Insufficient balance in wallet {wallet_id}: {balance} available, {amount} required")
+
+
+def _wallet_id(wallet):
+    return wallet.pk if isinstance(wallet, Wallet) else wallet
+
+
+def lock_balances(wallet_ids):
+    """
+    Lock wallets for the current transaction and read their balances
+
+    Rows are locked in ascending primary key order, so any two callers that
+    touch overlapping wallets acquire their locks in the same order and
+    cannot deadlock. Must be called inside transaction.atomic().
+
+    Args:
+        wallet_ids (iterable): Primary keys of the wallets to lock
+
+    Returns:
+        dict: Wallet id -> balance at the time of locking
+    """
+    return dict(
+        Wallet.objects.select_for_update()
+        .filter(pk__in=sorted(set(wallet_ids)))
+        .order_by('pk')
+        .values_list('pk', 'balance')
+    )
+
+
+def apply_deltas(deltas):
+    """
+    Add signed amounts to locked wallets with one CASE UPDATE per chunk
+
+    The caller is responsible for having locked the wallets with
+    lock_balances() and checked the resulting balances.
+
+    Args:
+        deltas (dict): Wallet id -> amount to add (negative for debits)
+    """
+    wallet_ids = sorted(wallet_id for wallet_id, delta in deltas.items() if delta)
+    for start in range(0, len(wallet_ids), BATCH_SIZE):
+        chunk = wallet_ids[start:start + BATCH_SIZE]
+        Wallet.objects.filter(pk__in=chunk).update(balance=Case(
+            *[When(pk=wallet_id, then=F('balance') + Value(deltas[wallet_id])) for wallet_id in chunk],
+            output_field=DecimalField(max_digits=24, decimal_places=8),
+        ))
+
+
+def post(entries):
+    """
+    Apply a set of debits and credits atomically
+
+    Args:
+        entries (iterable): (wallet, amount) pairs where wallet is a Wallet or
+            its id and amount is positive for credits and negative for debits
+
+    Returns:
+        dict: Wallet id -> new balance for every wallet in the entries
+
+    Raises:
+        InsufficientFunds: If any wallet would end below zero; nothing is written
+        Wallet.DoesNotExist: If a wallet in the entries does not exist
+    """
+    deltas = defaultdict(Decimal)
+    for wallet, amount in entries:
+        deltas[_wallet_id(wallet)] += Decimal(amount)
+
+    with transaction.atomic():
+        balances = lock_balances(deltas)
+        for wallet_id, delta in sorted(deltas.items()):
+            if wallet_id not in balances:
+                raise Wallet.DoesNotExist(f"Wallet {wallet_id} does not exist")
+            if balances[wallet_id] + delta < 0:
+                raise InsufficientFunds(wallet_id, balances[wallet_id], -delta)
+            balances[wallet_id] += delta
+        apply_deltas(deltas)
+    return balances
+
+
+def credit(wallet, amount):
+    """Add an amount to a wallet and return its new balance"""
+    return post([(wallet, amount)])[_wallet_id(wallet)]
+
+
+def debit(wallet, amount):
+    """Take an amount from a wallet and return its new balance, refusing to overdraw it"""
+    return post([(wallet, -amount)])[_wallet_id(wallet)]
+
+
+def transfer(from_wallet, to_wallet, amount, to_amount=None):
+    """
+    Move funds between two wallets
+
+    Args:
+        from_wallet: Wallet or wallet id to debit
+        to_wallet: Wallet or wallet id to credit
+        amount (Decimal): Amount taken from the source wallet
+        to_amount (Decimal): Amount added to the destination wallet, when it
+            is held in a different currency (defaults to amount)
+
+    Returns:
+        tuple: New balances of the source and destination wallets
+    """
+    if to_amount is None:
+        to_amount = amount
+    balances = post([(from_wallet, -amount), (to_wallet, to_amount)])
+    return balances[_wallet_id(from_wallet)], balances[_wallet_id(to_wallet)]
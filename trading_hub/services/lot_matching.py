@@ -0,0 +1,343 @@
+import heapq
+import logging
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from trading_hub.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+# Disposals held this many days or longer are long-term
+LONG_TERM_DAYS = 365
+
+# Rows fetched per round trip while streaming a history
+STREAM_CHUNK_SIZE = 5000
+
+# Fills passed between progress callbacks
+PROGRESS_EVERY = 1000
+
+ZERO = Decimal('0')
+
+# Lot matching methods, then the running average
+COST_BASIS_METHODS = ('fifo', 'lifo', 'hifo', 'acb')
+
+
+class Lot:
+    """An acquisition that still has units left to dispose of"""
+
+    __slots__ = ('transaction_id', 'acquired_at', 'amount', 'cost', 'remaining', 'price_per_unit')
+
+    def __init__(self, transaction_id, acquired_at, amount, native_amount):
+        self.transaction_id = transaction_id
+        self.acquired_at = acquired_at
+        self.amount = amount
+        self.cost = native_amount
+        self.remaining = amount
+        self.price_per_unit = native_amount / amount if amount else ZERO
+
+
+class LotQueue:
+    """
+    Open lots in the order a cost basis method disposes of them
+
+    FIFO takes from the left of a deque and LIFO from the right, both O(1).
+    HIFO keeps a max-heap on price per unit (oldest first among equal
+    prices), so each disposal is O(log n) instead of a re-sort. A lot that
+    is only partly disposed of stays at the front with its remainder.
+    """
+
+    METHODS = ('fifo', 'lifo', 'hifo')
+
+    def __init__(self, method='fifo'):
+        if method not in self.METHODS:
+            raise ValueError(f"Invalid lot matching method: {method}")
+        self.method = method
+        self._lots = [] if method == 'hifo' else deque()
+        self._sequence = 0
+
+    def __len__(self):
+        return len(self._lots)
+
+    def add(self, lot):
+        if self.method == 'hifo':
+            # The sequence number breaks ties without ever comparing Lot objects
+            heapq.heappush(self._lots, (-lot.price_per_unit, lot.acquired_at, self._sequence, lot))
+            self._sequence += 1
+        else:
+            self._lots.append(lot)
+
+    def peek(self):
+        if self.method == 'hifo':
+            return self._lots[0][-1]
+        return self._lots[-1] if self.method == 'lifo' else self._lots[0]
+
+    def pop(self):
+        if self.method == 'hifo':
+            heapq.heappop(self._lots)
+        elif self.method == 'lifo':
+            self._lots.pop()
+        else:
+            self._lots.popleft()
+
+    def __iter__(self):
+        if self.method == 'hifo':
+            return (entry[-1] for entry in self._lots)
+        return iter(self._lots)
+
+
+class LotMatcher:
+    """
+    Matches disposals against open lots as a history streams past
+
+    Feed acquisitions with acquire() and disposals with dispose() in
+    chronological order. Each disposal only ever sees lots acquired before
+    it, and memory is bounded by the number of open lots rather than the
+    length of the history. Any queue with LotQueue's add/peek/pop can hold
+    the lots, such as the database-backed one in services.tax_ledger.
+    """
+
+    def __init__(self, method='fifo', lots=None):
+        self.lots = lots if lots is not None else LotQueue(method)
+
+    def acquire(self, transaction_id, acquired_at, amount, native_amount):
+        if amount > 0:
+            self.lots.add(Lot(transaction_id, acquired_at, amount, native_amount))
+
+    def dispose(self, transaction_id, disposed_at, amount, native_amount):
+        """
+        Match a disposal against the open lots
+
+        Yields:
+            dict: One record per lot used, with the share of the proceeds
+                proportional to the amount taken from it. Units no open lot
+                covers come last with buy_id None and a zero cost basis.
+        """
+        remaining = amount
+        allocated = ZERO
+        while remaining > 0 and self.lots:
+            lot = self.lots.peek()
+            used = min(remaining, lot.remaining)
+            lot.remaining -= used
+            remaining -= used
+            if lot.remaining <= 0:
+                self.lots.pop()
+            # The last share takes what is left, so the shares add up to the proceeds exactly
+            proceeds = native_amount * used / amount if remaining > 0 else native_amount - allocated
+            allocated += proceeds
+            yield {
+                'sell_id': transaction_id,
+                'buy_id': lot.transaction_id,
+                'acquired_at': lot.acquired_at,
+                'disposed_at': disposed_at,
+                'amount': used,
+                'cost_basis': used * lot.price_per_unit,
+                'proceeds': proceeds,
+                'is_long_term': (disposed_at - lot.acquired_at).days >= LONG_TERM_DAYS,
+            }
+        if remaining > 0:
+            # Coins received from elsewhere: no known cost, treated as short-term
+            yield {
+                'sell_id': transaction_id,
+                'buy_id': None,
+                'acquired_at': None,
+                'disposed_at': disposed_at,
+                'amount': remaining,
+                'cost_basis': ZERO,
+                'proceeds': native_amount - allocated,
+                'is_long_term': False,
+            }
+
+    def open_position(self):
+        """Units and cost basis of the lots still open"""
+        amount = cost = ZERO
+        for lot in self.lots:
+            amount += lot.remaining
+            cost += lot.remaining * lot.price_per_unit
+        return amount, cost
+
+
+class AverageCostPool:
+    """
+    Running average cost basis (ACB) for one currency
+
+    Keeps the quantity held, its total cost and its quantity-weighted
+    acquisition time. A disposal takes the average cost per unit and
+    shrinks all three in proportion, so the average is unchanged by sales.
+    The same interface as LotMatcher: acquire() and dispose() in
+    chronological order, O(1) each.
+    """
+
+    def __init__(self):
+        self.quantity = ZERO
+        self.cost = ZERO
+        # Sum of quantity * acquisition timestamp, for the average holding period
+        self._weighted_time = 0.0
+
+    def acquire(self, transaction_id, acquired_at, amount, native_amount):
+        if amount > 0:
+            self.quantity += amount
+            self.cost += native_amount
+            self._weighted_time += float(amount) * acquired_at.timestamp()
+
+    def average_acquired_at(self):
+        return datetime.fromtimestamp(self._weighted_time / float(self.quantity), tz=dt_timezone.utc)
+
+    def dispose(self, transaction_id, disposed_at, amount, native_amount):
+        """
+        Take a disposal out of the pool at the average cost
+
+        Yields:
+            dict: As LotMatcher.dispose(), with buy_id None and acquired_at
+                the pool's average acquisition time. Units beyond the pool
+                come last with acquired_at None and a zero cost basis.
+        """
+        used = min(amount, self.quantity)
+        proceeds = native_amount
+        if used > 0:
+            acquired_at = self.average_acquired_at()
+            cost_basis = self.cost * used / self.quantity
+            if used < amount:
+                proceeds = native_amount * used / amount
+            held = self.quantity - used
+            self._weighted_time = self._weighted_time * float(held / self.quantity) if held else 0.0
+            self.cost = self.cost - cost_basis if held else ZERO
+            self.quantity = held
+            yield {
+                'sell_id': transaction_id,
+                'buy_id': None,
+                'acquired_at': acquired_at,
+                'disposed_at': disposed_at,
+                'amount': used,
+                'cost_basis': cost_basis,
+                'proceeds': proceeds,
+                'is_long_term': (disposed_at - acquired_at).days >= LONG_TERM_DAYS,
+            }
+        if used < amount:
+            yield {
+                'sell_id': transaction_id,
+                'buy_id': None,
+                'acquired_at': None,
+                'disposed_at': disposed_at,
+                'amount': amount - used,
+                'cost_basis': ZERO,
+                'proceeds': native_amount - proceeds if used > 0 else native_amount,
+                'is_long_term': False,
+            }
+
+    def open_position(self):
+        """Units and cost basis still held"""
+        return self.quantity, self.cost
+
+
+def stream_fills(user, currency, until=None):
+    """
+    A user's completed buys and sells of one currency, oldest first
+
+    Rows are plain tuples fetched in chunks through .iterator(), so even a
+    history of hundreds of thousands of fills is never held in memory.
+
+    Yields:
+        tuple: (id, transaction_type, created_at, amount, native_amount)
+    """
+    fills = Transaction.objects.filter(
+        user=user,
+        currency=currency,
+        transaction_type__in=('buy', 'sell'),
+        status='completed',
+    )
+    if until is not None:
+        fills = fills.filter(created_at__lte=until)
+    return fills.order_by('created_at', 'id').values_list(
+        'id', 'transaction_type', 'created_at', 'amount', 'native_amount'
+    ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+
+def with_progress(fills, progress, every=PROGRESS_EVERY):
+    """
+    Pass fills through unchanged, calling progress(count) after every `every` of them
+
+    Args:
+        fills (iterable): Fill tuples, as from stream_fills()
+        progress (callable): Called with the number of fills passed so far, or None
+        every (int): Fills between calls
+
+    Yields:
+        tuple: Each fill
+    """
+    if progress is None:
+        yield from fills
+        return
+    for count, fill in enumerate(fills, 1):
+        yield fill
+        if count % every == 0:
+            progress(count)
+
+
+def matcher_for(method):
+    """A LotMatcher, or an AverageCostPool for 'acb'"""
+    if method == 'acb':
+        return AverageCostPool()
+    return LotMatcher(method)
+
+
+def match_lots(fills, method='fifo', matcher=None):
+    """
+    Matched lot records for a chronological stream of fills
+
+    Args:
+        fills (iterable): (id, transaction_type, created_at, amount, native_amount)
+            tuples, oldest first, as from stream_fills()
+        method (str): One of COST_BASIS_METHODS
+        matcher (LotMatcher or AverageCostPool): Continue from this matcher's
+            open position instead of starting empty; it is left holding what
+            is still open at the end
+
+    Yields:
+        dict: See LotMatcher.dispose()
+    """
+    matcher = matcher or matcher_for(method)
+    for transaction_id, transaction_type, created_at, amount, native_amount in fills:
+        if transaction_type == 'buy':
+            matcher.acquire(transaction_id, created_at, amount, native_amount)
+        elif amount > 0:
+            yield from matcher.dispose(transaction_id, created_at, amount, native_amount)
+
+
+def summarize_sales(matches, start=None, end=None):
+    """
+    Fold matched lot records into one result per sale
+
+    Records arrive grouped by sale, so only the sale in progress is held.
+    Sales outside start..end are consumed (their lots are still used up)
+    but not yielded.
+
+    Yields:
+        dict: sell_id, cost_basis, proceeds, gain_loss, is_long_term (False
+            if any part was held short-term) and matched_amount
+    """
+    current = None
+    for match in matches:
+        if current is not None and current['sell_id'] != match['sell_id']:
+            yield current
+            current = None
+        if current is None:
+            disposed_at = match['disposed_at']
+            if (start and disposed_at < start) or (end and disposed_at > end):
+                continue
+            current = {
+                'sell_id': match['sell_id'],
+                'cost_basis': ZERO,
+                'proceeds': ZERO,
+                'gain_loss': ZERO,
+                'is_long_term': True,
+                'matched_amount': ZERO,
+            }
+        current['cost_basis'] += match['cost_basis']
+        current['proceeds'] += match['proceeds']
+        current['gain_loss'] = current['proceeds'] - current['cost_basis']
+        current['is_long_term'] = current['is_long_term'] and match['is_long_term']
+        if match['acquired_at'] is not None:
+            current['matched_amount'] += match['amount']
+    if current is not None:
+        yield current
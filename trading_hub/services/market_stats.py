@@ -0,0 +1,304 @@
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from trading_hub.models import CryptoCurrency, PriceCandle, TradingPair, Transaction
+
+logger = logging.getLogger(__name__)
+
+WINDOW_MINUTES = 24 * 60
+
+# Transaction types that count towards traded volume
+TRADE_TYPES = ('buy', 'sell', 'convert')
+
+# Fills are re-read this far behind the last poll so rows committed late are not missed
+FILL_LOOKBACK = timedelta(minutes=5)
+
+# Largest value DecimalField(max_digits=7, decimal_places=2) can hold
+MAX_CHANGE_PERCENT = Decimal('99999.99')
+
+
+def minute_of(timestamp):
+    """Whole minutes since the epoch"""
+    return int(timestamp.timestamp()) // 60
+
+
+class RollingWindow:
+    """
+    Ring buffer of per-minute open/high/low/close/volume buckets
+
+    Slot minute % size holds one minute; a slot is reset the first time a
+    newer minute lands in it, so recording a price or a fill is O(1) however
+    much history the window spans. summary() folds the live slots together
+    with a few vectorized passes over the buffer.
+    """
+
+    def __init__(self, size=WINDOW_MINUTES):
+        self.size = size
+        self.minutes = np.full(size, -1, dtype=np.int64)
+        self.open = np.full(size, np.nan)
+        self.high = np.full(size, np.nan)
+        self.low = np.full(size, np.nan)
+        self.close = np.full(size, np.nan)
+        self.volume = np.zeros(size)
+
+    def _slot(self, minute):
+        slot = minute % self.size
+        if self.minutes[slot] != minute:
+            if self.minutes[slot] > minute:
+                # A newer minute already owns the slot, so this one has left the window
+                return None
+            self.minutes[slot] = minute
+            self.open[slot] = self.high[slot] = self.low[slot] = self.close[slot] = np.nan
+            self.volume[slot] = 0
+        return slot
+
+    def add_price(self, minute, open_price, high, low, close):
+        slot = self._slot(minute)
+        if slot is None:
+            return
+        if np.isnan(self.open[slot]):
+            self.open[slot] = open_price
+            self.high[slot] = high
+            self.low[slot] = low
+        else:
+            self.high[slot] = max(self.high[slot], high)
+            self.low[slot] = min(self.low[slot], low)
+        self.close[slot] = close
+
+    def add_volume(self, minute, amount):
+        slot = self._slot(minute)
+        if slot is not None:
+            self.volume[slot] += amount
+
+    def summary(self, now_minute):
+        """
+        Statistics over the minutes in (now_minute - size, now_minute]
+
+        Returns:
+            dict: open, high, low, close, change_percent (None without
+            prices in the window) and volume
+        """
+        live = (self.minutes > now_minute - self.size) & (self.minutes <= now_minute)
+        volume = float(self.volume[live].sum())
+        priced = live & ~np.isnan(self.open)
+        if not priced.any():
+            return {'open': None, 'high': None, 'low': None, 'close': None, 'change_percent': None, 'volume': volume}
+
+        minutes = np.where(priced, self.minutes, np.iinfo(np.int64).max)
+        first = int(minutes.argmin())
+        last = int(np.where(priced, self.minutes, -1).argmax())
+        open_price = float(self.open[first])
+        close = float(self.close[last])
+        return {
+            'open': open_price,
+            'high': float(self.high[priced].max()),
+            'low': float(self.low[priced].min()),
+            'close': close,
+            'change_percent': (close - open_price) / open_price * 100 if open_price else None,
+            'volume': volume,
+        }
+
+
+class MarketStatsTracker:
+    """
+    Maintains rolling 24h statistics for cryptocurrencies and trading pairs
+
+    Prices come in through consume() as the ingestion daemon's PriceWriter
+    flushes windows, and completed trades are picked up with one indexed
+    query per flush on (status, updated_at). Every event lands in a
+    RollingWindow in O(1). Every flush_interval seconds the windows are
+    summarised and written back with one bulk_update per model. The
+    dashboard's trending list is invalidated so it picks the new numbers up.
+    Only one tracker should write the columns at a time.
+
+    On first use the buffers are warmed from the last day of 1m candles and
+    completed trades, so a restart does not zero the statistics.
+    """
+
+    def __init__(self, window_minutes=WINDOW_MINUTES, flush_interval=None):
+        """
+        Initialize the tracker
+
+        Args:
+            window_minutes (int): Length of the rolling window
+            flush_interval (float): Seconds between column writes (defaults to
+                the MARKET_STATS_FLUSH_SECONDS setting, or 60)
+        """
+        self.window_minutes = window_minutes
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else getattr(settings, 'MARKET_STATS_FLUSH_SECONDS', 60)
+        )
+        self.currencies = {}  # code -> RollingWindow of USD prices and volume
+        self.pairs = {}  # pair id -> RollingWindow of base/quote rates and base volume
+        self.pair_ids = {}  # (base code, quote code) -> pair id
+        self.pairs_by_code = {}  # code -> [(pair id, base code, quote code)]
+        self.last_prices = {}
+        self.counted = {}  # transaction id -> minute it was counted in
+        self.fill_cursor = None
+        self.last_flush = None
+        self.warmed = False
+
+    def _window(self, windows, key):
+        window = windows.get(key)
+        if window is None:
+            window = windows[key] = RollingWindow(self.window_minutes)
+        return window
+
+    def load_pairs(self):
+        self.pair_ids = {}
+        self.pairs_by_code = {}
+        for pair_id, base, quote in TradingPair.objects.filter(is_active=True).values_list(
+            'id', 'base_currency_id', 'quote_currency_id'
+        ):
+            self.pair_ids[(base, quote)] = pair_id
+            for code in (base, quote):
+                self.pairs_by_code.setdefault(code, []).append((pair_id, base, quote))
+
+    def record_price(self, code, timestamp, open_price, high, low, close):
+        """Fold a USD price summary for one currency into its window"""
+        minute = minute_of(timestamp)
+        self._window(self.currencies, code).add_price(minute, float(open_price), float(high), float(low), float(close))
+        self.last_prices[code] = float(close)
+
+        # Pair rates move whenever either side does
+        for pair_id, base, quote in self.pairs_by_code.get(code, ()):
+            base_price = self.last_prices.get(base)
+            quote_price = self.last_prices.get(quote)
+            if base_price and quote_price:
+                rate = base_price / quote_price
+                self._window(self.pairs, pair_id).add_price(minute, rate, rate, rate, rate)
+
+    def record_fill(self, transaction_id, code, quote_code, transaction_type, timestamp, amount, usd_value):
+        """Add a completed trade to the volume of its currency (and pair, for conversions)"""
+        if transaction_id in self.counted:
+            return
+        minute = minute_of(timestamp)
+        self.counted[transaction_id] = minute
+        self._window(self.currencies, code).add_volume(minute, float(usd_value))
+        if transaction_type == 'convert':
+            pair_id = self.pair_ids.get((code, quote_code))
+            if pair_id is not None:
+                self._window(self.pairs, pair_id).add_volume(minute, float(amount))
+
+    def consume(self, windows):
+        """PriceWriter hook: record the flushed windows and write stats when due"""
+        if not self.warmed:
+            self.warm()
+        for window in windows:
+            self.record_price(
+                window['symbol'], window['timestamp'],
+                window['open'], window['high'], window['low'], window['close'],
+            )
+        if self.last_flush is None or time.monotonic() - self.last_flush >= self.flush_interval:
+            return self.flush()
+        return None
+
+    def warm(self, now=None):
+        """Seed the windows from stored 1m candles and trades"""
+        now = now or timezone.now()
+        since = now - timedelta(minutes=self.window_minutes)
+        self.load_pairs()
+        # Replayed in time order, so pair rates are rebuilt from both sides' history
+        candles = PriceCandle.objects.filter(resolution='1m', bucket_start__gt=since).order_by('bucket_start')
+        for candle in candles.values_list('currency_id', 'bucket_start', 'open', 'high', 'low', 'close').iterator():
+            self.record_price(*candle)
+        for code, price in CryptoCurrency.objects.values_list('code', 'current_price_usd'):
+            self.last_prices.setdefault(code, float(price))
+        self.poll_fills(now, since=since)
+        self.warmed = True
+
+    def poll_fills(self, now=None, since=None):
+        """
+        Count trades completed since the last poll
+
+        Returns:
+            int: Trades counted
+        """
+        now = now or timezone.now()
+        if since is None:
+            since = (self.fill_cursor or now - timedelta(minutes=self.window_minutes)) - FILL_LOOKBACK
+        fills = Transaction.objects.filter(
+            status='completed',
+            updated_at__gte=since,
+            transaction_type__in=TRADE_TYPES,
+        ).values_list(
+            'id', 'currency', 'to_wallet__currency_code', 'transaction_type', 'created_at', 'amount', 'native_amount'
+        )
+        counted = len(self.counted)
+        for fill in fills.iterator():
+            self.record_fill(*fill)
+        self.fill_cursor = now
+        return len(self.counted) - counted
+
+    @staticmethod
+    def _percent(value):
+        if value is None:
+            return None
+        value = Decimal(str(round(value, 2)))
+        return max(-MAX_CHANGE_PERCENT, min(value, MAX_CHANGE_PERCENT))
+
+    def flush(self, now=None):
+        """
+        Write the current statistics to CryptoCurrency and TradingPair
+
+        Returns:
+            dict: Number of currencies and pairs written
+        """
+        now = now or timezone.now()
+        self.poll_fills(now)
+        now_minute = minute_of(now)
+
+        # Currencies with trades but no prices in the window keep their last change figure
+        currencies = []
+        volumes = []
+        for code, window in self.currencies.items():
+            stats = window.summary(now_minute)
+            currency = CryptoCurrency(
+                code=code,
+                price_change_24h_percent=self._percent(stats['change_percent']),
+                volume_24h_usd=Decimal(str(round(stats['volume'], 2))),
+            )
+            (volumes if stats['change_percent'] is None else currencies).append(currency)
+
+        pairs = []
+        for pair_id, window in self.pairs.items():
+            stats = window.summary(now_minute)
+            if stats['close'] is None:
+                continue
+            pairs.append(TradingPair(
+                id=pair_id,
+                last_price=Decimal(str(round(stats['close'], 8))),
+                price_change_24h_percent=self._percent(stats['change_percent']),
+                volume_24h=Decimal(str(round(stats['volume'], 8))),
+            ))
+
+        with transaction.atomic():
+            CryptoCurrency.objects.bulk_update(
+                currencies, ['price_change_24h_percent', 'volume_24h_usd'], batch_size=500
+            )
+            CryptoCurrency.objects.bulk_update(volumes, ['volume_24h_usd'], batch_size=500)
+            TradingPair.objects.bulk_update(
+                pairs, ['last_price', 'price_change_24h_percent', 'volume_24h'], batch_size=500
+            )
+        cache.delete('trending_cryptos')
+
+        # Trades older than the window can no longer be double counted
+        self.counted = {
+            transaction_id: minute for transaction_id, minute in self.counted.items()
+            if minute > now_minute - self.window_minutes
+        }
+        self.last_flush = time.monotonic()
+        logger.debug("Market stats flush: %s currencies, %s pairs", len(currencies) + len(volumes), len(pairs))
+        return {
+            'currencies': len(currencies) + len(volumes),
+            'pairs': len(pairs),
+        }
@@ -0,0 +1,281 @@
+import bisect
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from trading_hub.models import LimitOrder
+
+# LimitOrder.limit_price has two decimal places; keys must match what the database returns
+PRICE_STEP = Decimal('0.01')
+
+
+class PriceLevel:
+    """All resting orders at one price, in time priority"""
+
+    __slots__ = ('price', 'orders', 'total')
+
+    def __init__(self, price):
+        self.price = price
+        self.orders = OrderedDict()  # order_id -> remaining amount, oldest first
+        self.total = Decimal('0')
+
+    def __len__(self):
+        return len(self.orders)
+
+
+class BookSide:
+    """
+    One side of an order book
+
+    Prices are kept in an ascending list located with bisect, and each price
+    maps to a PriceLevel whose OrderedDict gives FIFO order plus O(1) removal
+    by order id. Only creating or emptying a level touches the sorted list.
+    """
+
+    def __init__(self, is_bid):
+        self.is_bid = is_bid
+        self.prices = []
+        self.levels = {}
+
+    def add(self, order_id, price, amount):
+        level = self.levels.get(price)
+        if level is None:
+            level = self.levels[price] = PriceLevel(price)
+            bisect.insort(self.prices, price)
+        level.orders[order_id] = amount
+        level.total += amount
+
+    def update(self, order_id, price, amount):
+        """Change the remaining amount of an order without losing its queue position"""
+        level = self.levels[price]
+        level.total += amount - level.orders[order_id]
+        level.orders[order_id] = amount
+
+    def remove(self, order_id, price):
+        level = self.levels[price]
+        amount = level.orders.pop(order_id)
+        level.total -= amount
+        if not level.orders:
+            del self.levels[price]
+            del self.prices[bisect.bisect_left(self.prices, price)]
+        return amount
+
+    def best(self):
+        if not self.prices:
+            return None
+        return self.levels[self.prices[-1] if self.is_bid else self.prices[0]]
+
+    def iter_levels(self):
+        """Yield price levels from the best price outwards"""
+        prices = reversed(self.prices) if self.is_bid else iter(self.prices)
+        for price in prices:
+            yield self.levels[price]
+
+    def __len__(self):
+        return len(self.prices)
+
+
+class OrderBook:
+    """In-memory limit order book for one cryptocurrency against USD"""
+
+    def __init__(self, code):
+        self.code = code
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.version = None
+        self._orders = {}  # order_id -> (side, price)
+
+    def _side(self, side):
+        return self.bids if side == 'buy' else self.asks
+
+    def add_order(self, order_id, side, price, amount):
+        """Add an order, or update it in place if it is already on the book"""
+        existing = self._orders.get(order_id)
+        if existing == (side, price):
+            self._side(side).update(order_id, price, amount)
+            return
+        if existing:
+            self.remove_order(order_id)
+        self._side(side).add(order_id, price, amount)
+        self._orders[order_id] = (side, price)
+
+    def remove_order(self, order_id):
+        """Remove an order from the book, returning its remaining amount"""
+        entry = self._orders.pop(order_id, None)
+        if entry is None:
+            return None
+        side, price = entry
+        return self._side(side).remove(order_id, price)
+
+    def best_bid(self):
+        level = self.bids.best()
+        return level.price if level else None
+
+    def best_ask(self):
+        level = self.asks.best()
+        return level.price if level else None
+
+    def spread(self):
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return ask - bid
+
+    def top_of_book(self):
+        """Best bid and ask with the total amount resting at each"""
+        bid, ask = self.bids.best(), self.asks.best()
+        return {
+            'code': self.code,
+            'best_bid': bid.price if bid else None,
+            'bid_amount': bid.total if bid else None,
+            'best_ask': ask.price if ask else None,
+            'ask_amount': ask.total if ask else None,
+            'spread': self.spread(),
+        }
+
+    def depth(self, levels=20):
+        """
+        Aggregated depth on each side of the book
+
+        Args:
+            levels (int): Maximum number of price levels per side
+
+        Returns:
+            dict: Bids and asks as lists of price level dicts, best price first
+        """
+        def side_depth(book_side):
+            result = []
+            for level in book_side.iter_levels():
+                if len(result) >= levels:
+                    break
+                result.append({
+                    'price': level.price,
+                    'amount': level.total,
+                    'orders': len(level),
+                })
+            return result
+
+        return {
+            'code': self.code,
+            'bids': side_depth(self.bids),
+            'asks': side_depth(self.asks),
+        }
+
+    def iter_orders(self, side):
+        """Yield (order_id, price, amount) for one side in price-time priority"""
+        for level in self._side(side).iter_levels():
+            for order_id, amount in level.orders.items():
+                yield order_id, level.price, amount
+
+    def __contains__(self, order_id):
+        return order_id in self._orders
+
+    def __len__(self):
+        return len(self._orders)
+
+
+class OrderBookRegistry:
+    """
+    Per-process set of order books, one per cryptocurrency
+
+    A book is loaded from the open LimitOrder rows the first time it is used
+    and then kept in sync by the LimitOrder signals in trading_hub.signals.
+    Every change also bumps a per-currency version in the shared cache, so a
+    process notices changes made by other web or django-q workers and reloads
+    that book on its next read instead of serving stale levels.
+    """
+
+    VERSION_KEY = 'order_book_version_{code}'
+
+    def __init__(self):
+        self._books = {}
+        self._lock = threading.RLock()
+
+    def _shared_version(self, code):
+        return cache.get(self.VERSION_KEY.format(code=code), 0)
+
+    def _bump_shared_version(self, code):
+        key = self.VERSION_KEY.format(code=code)
+        cache.add(key, 0, None)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # The key was evicted between add() and incr()
+            cache.set(key, 1, None)
+            return 1
+
+    def load(self, code):
+        """Rebuild the book for a cryptocurrency from the database"""
+        book = OrderBook(code)
+        book.version = self._shared_version(code)
+        open_orders = LimitOrder.objects.filter(
+            cryptocurrency_id=code,
+            status='open'
+        ).order_by('created_at').values_list('id', 'side', 'limit_price', 'amount', 'filled_amount')
+
+        for order_id, side, price, amount, filled_amount in open_orders.iterator():
+            remaining = amount - filled_amount
+            if remaining > 0:
+                book.add_order(order_id, side, price, remaining)
+
+        with self._lock:
+            self._books[code] = book
+        return book
+
+    def load_all(self):
+        """Warm every book that has open orders, e.g. when a worker starts"""
+        codes = LimitOrder.objects.filter(status='open').values_list('cryptocurrency_id', flat=True).distinct()
+        return {code: self.load(code) for code in codes}
+
+    def get(self, code):
+        """Return the book for a cryptocurrency, reloading it if another process changed it"""
+        with self._lock:
+            book = self._books.get(code)
+            if book is not None and book.version == self._shared_version(code):
+                return book
+        return self.load(code)
+
+    def _apply(self, code, change):
+        with self._lock:
+            book = self._books.get(code)
+            if book is None:
+                # Not loaded in this process yet; just tell the others
+                self._bump_shared_version(code)
+                return
+            up_to_date = book.version == self._shared_version(code)
+            change(book)
+            new_version = self._bump_shared_version(code)
+            if up_to_date and new_version == book.version + 1:
+                book.version = new_version
+            else:
+                # Another process changed this book concurrently; reload on next read
+                book.version = None
+
+    def sync_order(self, order):
+        """Apply a saved LimitOrder to its book: open orders rest, anything else is removed"""
+        remaining = order.amount - order.filled_amount
+
+        def change(book):
+            if order.status == 'open' and remaining > 0:
+                book.add_order(order.id, order.side, Decimal(order.limit_price).quantize(PRICE_STEP), remaining)
+            else:
+                book.remove_order(order.id)
+
+        self._apply(order.cryptocurrency_id, change)
+
+    def remove_orders(self, code, order_ids):
+        """Remove orders closed by a bulk update, which does not send signals"""
+        def change(book):
+            for order_id in order_ids:
+                book.remove_order(order_id)
+
+        self._apply(code, change)
+
+    def clear(self):
+        with self._lock:
+            self._books.clear()
+
+
+order_books = OrderBookRegistry()
@@ -0,0 +1,332 @@
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from trading_hub.models import CryptoCurrency, LimitOrder, StopOrder
+from trading_hub.services.order_book import order_books
+from trading_hub.services.settlement import SettlementBatch
+
+logger = logging.getLogger(__name__)
+
+
+class OrderEvaluator:
+    """Price-indexed evaluation of resting orders for one scheduler tick
+
+    Each cryptocurrency's price is read once per tick and only the orders that
+    the price has crossed are loaded, using range queries on the
+    (cryptocurrency, status, side, limit_price) and
+    (cryptocurrency, status, side, stop_price) indexes. Orders the price has
+    not reached are never fetched.
+
+    Currencies are evaluated one at a time, each inside a transaction that
+    holds its CryptoCurrency row with select_for_update(), so a price move
+    task and the periodic sweep never evaluate the same currency's orders
+    at once; whichever comes second waits and then sees the fresh price and
+    order statuses. The fills found for a currency are queued on the
+    SettlementBatch and written together before its lock is released.
+    """
+
+    def __init__(self, now=None, batch=None):
+        """
+        Initialize the evaluator
+
+        Args:
+            now (datetime): Reference time for expiry checks (defaults to now)
+            batch (SettlementBatch): Batch to queue fills on (defaults to a new one)
+        """
+        self.now = now or timezone.now()
+        self.batch = batch or SettlementBatch()
+
+    def expire_limit_orders(self):
+        """Mark open limit orders past their expiry date as expired"""
+        expiring = defaultdict(list)
+        for order_id, code in LimitOrder.objects.filter(
+            status='open',
+            expires_at__lt=self.now
+        ).values_list('id', 'cryptocurrency_id'):
+            expiring[code].append(order_id)
+
+        expired = 0
+        for code, order_ids in expiring.items():
+            expired += LimitOrder.objects.filter(id__in=order_ids, status='open').update(status='expired')
+            # Bulk updates skip post_save, so take the orders off the book here
+            order_books.remove_orders(code, order_ids)
+        return expired
+
+    def crossable_limit_orders(self, crypto, price=None):
+        """
+        Select the open limit orders that can execute at the given price
+
+        Buy orders are crossable when limit_price >= price and sell orders when
+        limit_price <= price, which is the same condition as LimitOrder.can_execute.
+
+        Args:
+            crypto (CryptoCurrency): Cryptocurrency to evaluate
+            price (Decimal): Price to evaluate against (defaults to the current price)
+
+        Returns:
+            QuerySet: Crossable orders, oldest first
+        """
+        if price is None:
+            price = crypto.current_price_usd
+
+        return LimitOrder.objects.filter(
+            cryptocurrency=crypto,
+            status='open',
+        ).filter(
+            Q(side='buy', limit_price__gte=price) |
+            Q(side='sell', limit_price__lte=price)
+        ).order_by('created_at')
+
+    def expire_stop_orders(self):
+        """Mark open stop orders past their expiry date as expired"""
+        return StopOrder.objects.filter(
+            status='open',
+            expires_at__lt=self.now
+        ).update(status='expired')
+
+    @contextmanager
+    def evaluating(self, code):
+        """
+        Hold a currency's row for the length of its evaluation
+
+        Yields:
+            CryptoCurrency: The currency with its current price, or None if it does not exist
+        """
+        with transaction.atomic():
+            yield CryptoCurrency.objects.select_for_update().filter(code=code).first()
+
+    def queue_limit_orders(self, crypto):
+        """
+        Queue a fill for every crossable limit order of one currency
+
+        Returns:
+            int: Number of fills queued
+        """
+        queued = 0
+        for order in self.crossable_limit_orders(crypto):
+            # Share the price we already loaded instead of re-reading it per order
+            order.cryptocurrency = crypto
+            self.batch.add(order, **order.settlement_fill())
+            queued += 1
+        return queued
+
+    def crossed_limit_orders(self, crypto, old_price, new_price):
+        """
+        Select the open limit orders a price move has just made executable
+
+        A fall from old_price to new_price crosses buy orders with a limit in
+        [new_price, old_price) and a rise crosses sell orders with a limit in
+        (old_price, new_price]. Orders that were already crossable at the old
+        price are left to the periodic sweep.
+
+        Args:
+            crypto (CryptoCurrency): Cryptocurrency whose price moved
+            old_price (Decimal): Price before the move
+            new_price (Decimal): Price after the move
+
+        Returns:
+            QuerySet: Crossed orders, oldest first
+        """
+        if new_price < old_price:
+            band = Q(side='buy', limit_price__gte=new_price, limit_price__lt=old_price)
+        else:
+            band = Q(side='sell', limit_price__gt=old_price, limit_price__lte=new_price)
+
+        return LimitOrder.objects.filter(
+            band,
+            Q(expires_at__isnull=True) | Q(expires_at__gte=self.now),
+            cryptocurrency=crypto,
+            status='open',
+        ).order_by('created_at')
+
+    def crossed_stop_orders(self, crypto, old_price, new_price):
+        """
+        Select the open stop orders a price move has just triggered
+
+        A fall triggers sell stops in [new_price, old_price) and a rise
+        triggers buy stops in (old_price, new_price]. Either way it is a single
+        range scan on the (cryptocurrency, status, side, stop_price) index, so
+        the cost follows the number of triggered orders rather than the number
+        of resting ones.
+
+        Args:
+            crypto (CryptoCurrency): Cryptocurrency whose price moved
+            old_price (Decimal): Price before the move
+            new_price (Decimal): Price after the move
+
+        Returns:
+            QuerySet: Triggered orders, oldest first
+        """
+        if new_price < old_price:
+            band = Q(side='sell', stop_price__gte=new_price, stop_price__lt=old_price)
+        else:
+            band = Q(side='buy', stop_price__gt=old_price, stop_price__lte=new_price)
+
+        return StopOrder.objects.filter(
+            band,
+            Q(expires_at__isnull=True) | Q(expires_at__gte=self.now),
+            cryptocurrency=crypto,
+            status='open',
+        ).order_by('created_at')
+
+    def _trigger_stop_order(self, order, price):
+        """Place the limit order for a stop-limit order or queue a market fill; True for stop-limits"""
+        if order.limit_price:
+            # Only the evaluator that flips the order from open places its limit order
+            if not StopOrder.objects.filter(pk=order.pk, status='open').update(
+                status='triggered', updated_at=self.now
+            ):
+                return False
+            order.status = 'triggered'
+            order.create_limit_order()
+            return True
+        self.batch.add(order, **order.settlement_fill(price))
+        return False
+
+    def crossable_stop_orders(self, crypto, price=None):
+        """
+        Select the open stop orders triggered at the given price
+
+        Buy stops trigger when stop_price <= price and sell stops when
+        stop_price >= price, the same condition as StopOrder.should_trigger,
+        so each side is one range scan on the
+        (cryptocurrency, status, side, stop_price) index.
+
+        Args:
+            crypto (CryptoCurrency): Cryptocurrency to evaluate
+            price (Decimal): Price to evaluate against (defaults to the current price)
+
+        Returns:
+            QuerySet: Triggered orders, oldest first
+        """
+        if price is None:
+            price = crypto.current_price_usd
+
+        return StopOrder.objects.filter(
+            cryptocurrency=crypto,
+            status='open',
+        ).filter(
+            Q(side='buy', stop_price__lte=price) |
+            Q(side='sell', stop_price__gte=price)
+        ).order_by('created_at')
+
+    def trigger_stop_orders(self, crypto):
+        """
+        Trigger every open stop order of one currency whose stop price has been reached
+
+        Stop-limit orders place their limit order straight away; stop market
+        orders are queued on the settlement batch at the current price.
+
+        Returns:
+            int: Number of stop-limit orders triggered
+        """
+        triggered = 0
+        for order in self.crossable_stop_orders(crypto):
+            order.cryptocurrency = crypto
+            if self._trigger_stop_order(order, crypto.current_price_usd):
+                triggered += 1
+        return triggered
+
+    def _settle(self):
+        """Commit the batch, returning the number of limit and stop orders it filled"""
+        settled = len(self.batch.settled)
+        self.batch.commit(now=self.now)
+        settled_orders = self.batch.settled[settled:]
+        return (
+            sum(isinstance(order, LimitOrder) for order in settled_orders),
+            sum(isinstance(order, StopOrder) for order in settled_orders),
+        )
+
+    def run_price_move(self, code, old_price, new_price):
+        """
+        Evaluate only the orders crossed by one price move
+
+        Orders are re-checked against the price current when this runs, so a
+        move that has since reversed does not fill orders it no longer crosses.
+
+        Args:
+            code (str): Cryptocurrency code
+            old_price (Decimal): Price before the move
+            new_price (Decimal): Price after the move
+
+        Returns:
+            dict: Counts of executed limit orders and triggered stop orders
+        """
+        with self.evaluating(code) as crypto:
+            if crypto is None:
+                return {'executed': 0, 'stop_triggered': 0}
+            price = crypto.current_price_usd
+
+            for order in self.crossed_limit_orders(crypto, old_price, new_price):
+                order.cryptocurrency = crypto
+                if order.can_execute():
+                    self.batch.add(order, **order.settlement_fill())
+
+            triggered = 0
+            for order in self.crossed_stop_orders(crypto, old_price, new_price):
+                order.cryptocurrency = crypto
+                if order.should_trigger() and self._trigger_stop_order(order, price):
+                    triggered += 1
+
+            executed, stops_filled = self._settle()
+        logger.info(
+            "%s moved %s -> %s: %s limit executed, %s stop triggered",
+            code, old_price, new_price, executed, triggered + stops_filled
+        )
+        return {
+            'executed': executed,
+            'stop_triggered': triggered + stops_filled,
+        }
+
+    def run_currency(self, code):
+        """
+        Evaluate every open order of one currency against its current price
+
+        Args:
+            code (str): Cryptocurrency code
+
+        Returns:
+            dict: Counts of executed limit orders and triggered stop orders
+        """
+        with self.evaluating(code) as crypto:
+            if crypto is None:
+                return {'executed': 0, 'stop_triggered': 0}
+            self.queue_limit_orders(crypto)
+            triggered = self.trigger_stop_orders(crypto)
+            executed, stops_filled = self._settle()
+        return {
+            'executed': executed,
+            'stop_triggered': triggered + stops_filled,
+        }
+
+    def run(self):
+        """
+        Run one evaluation tick for limit and stop orders
+
+        Returns:
+            dict: Counts of expired, executed and triggered orders
+        """
+        expired = self.expire_limit_orders()
+        expired_stops = self.expire_stop_orders()
+
+        executed = triggered_stops = 0
+        for code in CryptoCurrency.objects.values_list('code', flat=True):
+            result = self.run_currency(code)
+            executed += result['executed']
+            triggered_stops += result['stop_triggered']
+
+        logger.info(
+            "Order tick: %s limit executed, %s limit expired, %s stop triggered, %s stop expired",
+            executed, expired, triggered_stops, expired_stops
+        )
+        return {
+            'expired': expired,
+            'executed': executed,
+            'stop_expired': expired_stops,
+            'stop_triggered': triggered_stops,
+        }
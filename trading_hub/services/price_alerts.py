@@ -0,0 +1,131 @@
+import logging
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+from trading_hub.models import CryptoCurrency, PriceAlert
+
+logger = logging.getLogger(__name__)
+
+
+class PriceAlertEvaluator:
+    """
+    Evaluates untriggered price alerts one symbol at a time
+
+    Each symbol is priced once per tick, and the alerts it has crossed are
+    selected with one range query on the
+    (symbol, triggered, direction, target_price) index. Alerts the price has
+    not reached are never loaded. Every crossed alert is then flipped with
+    bulk updates before users are notified.
+    """
+
+    def __init__(self, batch_size=1000):
+        """
+        Initialize the evaluator
+
+        Args:
+            batch_size (int): Alerts per UPDATE statement and notification batch
+        """
+        self.batch_size = batch_size
+
+    def current_prices(self, symbols):
+        """
+        Price every symbol once
+
+        Symbols are matched to cryptocurrency codes case-insensitively; the
+        few that do not match are fetched concurrently through the price client.
+
+        Args:
+            symbols (list): Alert symbols
+
+        Returns:
+            dict: Symbol -> price, for the symbols that could be priced
+        """
+        prices_by_code = dict(
+            CryptoCurrency.objects.filter(
+                code__in={symbol.upper() for symbol in symbols}
+            ).values_list('code', 'current_price_usd')
+        )
+
+        prices = {}
+        unmatched = []
+        for symbol in symbols:
+            price = prices_by_code.get(symbol.upper())
+            if price is None:
+                unmatched.append(symbol)
+            else:
+                prices[symbol] = price
+
+        if unmatched:
+            # Fetched concurrently rather than one blocking request per symbol
+            from trading_hub.services.price_client import get_price_client
+            for symbol, price in get_price_client().get_prices_sync(unmatched).items():
+                if price is not None:
+                    prices[symbol] = price
+        return prices
+
+    def crossed_alerts(self, symbol, price):
+        """
+        Select the untriggered alerts for a symbol that the price has reached
+
+        Args:
+            symbol (str): Alert symbol
+            price (Decimal): Current price of the symbol
+
+        Returns:
+            QuerySet: Crossed alerts
+        """
+        return PriceAlert.objects.filter(
+            symbol=symbol,
+            triggered=False,
+        ).filter(
+            Q(direction='above', target_price__lte=price) |
+            Q(direction='below', target_price__gte=price)
+        )
+
+    def notify(self, alerts, prices):
+        """Notify the owner of each triggered alert"""
+        from trading_hub.utils import notify_user
+
+        for start in range(0, len(alerts), self.batch_size):
+            chunk = alerts[start:start + self.batch_size]
+            users = User.objects.in_bulk({user_id for _, user_id, _, _ in chunk})
+            for _, user_id, symbol, target_price in chunk:
+                notify_user(
+                    users[user_id],
+                    f"{symbol} has reached {prices[symbol]} (your alert at {target_price})"
+                )
+
+    def run(self):
+        """
+        Evaluate every untriggered alert
+
+        Returns:
+            dict: Number of symbols priced and alerts triggered
+        """
+        symbols = list(
+            PriceAlert.objects.filter(triggered=False)
+            .order_by().values_list('symbol', flat=True).distinct()
+        )
+        prices = self.current_prices(symbols)
+
+        triggered = []
+        for symbol, price in prices.items():
+            triggered.extend(
+                self.crossed_alerts(symbol, price)
+                .values_list('id', 'user_id', 'symbol', 'target_price')
+                .iterator()
+            )
+
+        alert_ids = [alert_id for alert_id, _, _, _ in triggered]
+        for start in range(0, len(alert_ids), self.batch_size):
+            PriceAlert.objects.filter(
+                id__in=alert_ids[start:start + self.batch_size]
+            ).update(triggered=True)
+
+        self.notify(triggered, prices)
+        logger.info("Price alerts: %s symbols priced, %s triggered", len(prices), len(triggered))
+        return {
+            'symbols': len(prices),
+            'triggered': len(triggered),
+        }
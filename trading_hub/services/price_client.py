@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRICE_API_URL = 'https://api.coingecko.com/api/v3/simple/price'
+
+# Price API ids for symbols whose id is not simply the lower-cased name
+SYMBOL_IDS = {
+    'BTC': 'bitcoin',
+    'ETH': 'ethereum',
+    'USDT': 'tether',
+    'BNB': 'binancecoin',
+    'SOL': 'solana',
+    'XRP': 'ripple',
+    'USDC': 'usd-coin',
+    'ADA': 'cardano',
+    'DOGE': 'dogecoin',
+    'SHIB': 'shiba-inu',
+}
+
+
+class PriceClient:
+    """
+    Concurrent price fetcher in front of the price API
+
+    All requests share one pooled requests.Session and run on a bounded
+    thread pool, so asyncio callers can fan out across many symbols without
+    opening a connection per call. Concurrent callers asking for the same
+    symbol share one in-flight request, and answers are cached for a few
+    seconds. Failed fetches return None and are not cached.
+    """
+
+    def __init__(self, base_url=None, timeout=None, ttl=None, max_connections=None):
+        """
+        Initialize the client
+
+        Args:
+            base_url (str): Price endpoint (defaults to the PRICE_API_URL setting)
+            timeout (float): Seconds allowed per request (defaults to PRICE_API_TIMEOUT, or 5)
+            ttl (float): Seconds a price stays cached (defaults to PRICE_CACHE_TTL, or 10)
+            max_connections (int): Pooled connections and concurrent requests
+                (defaults to PRICE_API_MAX_CONNECTIONS, or 16)
+        """
+        self.base_url = base_url or getattr(settings, 'PRICE_API_URL', DEFAULT_PRICE_API_URL)
+        self.timeout = timeout if timeout is not None else getattr(settings, 'PRICE_API_TIMEOUT', 5)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'PRICE_CACHE_TTL', 10)
+        max_connections = max_connections or getattr(settings, 'PRICE_API_MAX_CONNECTIONS', 16)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='price-client')
+
+        self._lock = threading.Lock()
+        self._cache = {}  # coin id -> (expires_at, price)
+        self._in_flight = {}  # coin id -> Future
+
+    @staticmethod
+    def coin_id(symbol):
+        """Price API id for a symbol such as 'BTC' or an id such as 'bitcoin'"""
+        return SYMBOL_IDS.get(symbol.upper(), symbol.lower())
+
+    def _request(self, coin_id):
+        response = self.session.get(
+            self.base_url,
+            params={'ids': coin_id, 'vs_currencies': 'usd'},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return Decimal(str(response.json()[coin_id]['usd']))
+
+    def _fetch(self, coin_id):
+        try:
+            price = self._request(coin_id)
+        except Exception as e:
+            logger.warning("Price fetch for %s failed: %s", coin_id, e)
+            price = None
+
+        with self._lock:
+            if price is not None:
+                self._cache[coin_id] = (time.monotonic() + self.ttl, price)
+            self._in_flight.pop(coin_id, None)
+        return price
+
+    def submit(self, symbol):
+        """
+        Start (or join) a fetch for a symbol
+
+        Returns:
+            concurrent.futures.Future: Resolves to the price, or None on failure
+        """
+        coin_id = self.coin_id(symbol)
+        with self._lock:
+            cached = self._cache.get(coin_id)
+            if cached and cached[0] > time.monotonic():
+                future = Future()
+                future.set_result(cached[1])
+                return future
+
+            future = self._in_flight.get(coin_id)
+            if future is None:
+                future = self._in_flight[coin_id] = self._executor.submit(self._fetch, coin_id)
+            return future
+
+    async def get_price(self, symbol):
+        """Price of one symbol, sharing any fetch already in flight"""
+        return await asyncio.wrap_future(self.submit(symbol))
+
+    async def get_prices(self, symbols):
+        """
+        Fetch several symbols concurrently
+
+        Returns:
+            dict: Symbol -> price (None where the fetch failed)
+        """
+        symbols = list(symbols)
+        prices = await asyncio.gather(*(self.get_price(symbol) for symbol in symbols))
+        return dict(zip(symbols, prices))
+
+    def get_price_sync(self, symbol):
+        """Blocking variant of get_price for synchronous callers"""
+        return self.submit(symbol).result()
+
+    def get_prices_sync(self, symbols):
+        """Blocking variant of get_prices; requests still run concurrently"""
+        futures = {symbol: self.submit(symbol) for symbol in symbols}
+        return {symbol: future.result() for symbol, future in futures.items()}
+
+    def get_all_prices_sync(self):
+        """Fetch a price for every CryptoCurrency concurrently"""
+        from trading_hub.models import CryptoCurrency
+
+        symbols = CryptoCurrency.objects.values_list('code', flat=True)
+        return self.get_prices_sync(symbols)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_price_client():
+    """Shared per-process PriceClient"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PriceClient()
+        return _client
@@ -0,0 +1,113 @@
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Dotted path django-q workers import to run a price move
+PRICE_MOVE_TASK = 'trading_hub.services.price_events.process_price_move'
+
+# Dotted path django-q workers import to evaluate a currency after an order is placed
+ORDER_PLACED_TASK = 'trading_hub.services.price_events.process_order_placed'
+
+
+def on_price_update(code, old_price, new_price):
+    """
+    Hook for every write to a cryptocurrency's price
+
+    Once the write commits, the move from old_price to new_price is handed to
+    a django-q worker, which evaluates only the limit and stop orders whose
+    trigger prices lie between the two. Unchanged prices cost nothing.
+
+    Args:
+        code (str): Cryptocurrency code
+        old_price (Decimal): Price before the write, or None for a new currency
+        new_price (Decimal): Price after the write
+    """
+    if old_price is None or new_price is None or old_price == new_price:
+        return
+    transaction.on_commit(lambda: dispatch_price_move(code, old_price, new_price))
+
+
+def dispatch_price_move(code, old_price, new_price):
+    """Enqueue a price move on the django-q cluster, or process it inline when that is not possible"""
+    if not getattr(settings, 'PRICE_EVENTS_ASYNC', True):
+        return process_price_move(code, old_price, new_price)
+
+    try:
+        from django_q.tasks import async_task
+    except ImportError:
+        return process_price_move(code, old_price, new_price)
+
+    try:
+        return async_task(PRICE_MOVE_TASK, code, str(old_price), str(new_price), group=f'price_move_{code}')
+    except Exception:
+        # Broker unavailable: evaluate now rather than miss the move
+        logger.warning("Could not enqueue price move for %s, processing inline", code, exc_info=True)
+        return process_price_move(code, old_price, new_price)
+
+
+def process_price_move(code, old_price, new_price):
+    """
+    Evaluate the orders crossed by one price move
+
+    Args:
+        code (str): Cryptocurrency code
+        old_price (str or Decimal): Price before the move
+        new_price (str or Decimal): Price after the move
+
+    Returns:
+        dict: Counts of executed limit orders and triggered stop orders
+    """
+    from trading_hub.services.order_engine import OrderEvaluator
+
+    return OrderEvaluator().run_price_move(code, Decimal(old_price), Decimal(new_price))
+
+
+def on_order_placed(code):
+    """
+    Hook for a new limit or stop order the current price already reaches
+
+    Such an order is marketable at once, so once it commits its currency's
+    open orders are evaluated on a django-q worker, the same way a price
+    move is, instead of resting until the ORDER_SWEEP_MINUTES sweep.
+
+    Args:
+        code (str): Cryptocurrency code
+    """
+    transaction.on_commit(lambda: dispatch_order_placed(code))
+
+
+def dispatch_order_placed(code):
+    """Enqueue a placed order's evaluation on the django-q cluster, or run it inline when that is not possible"""
+    if not getattr(settings, 'PRICE_EVENTS_ASYNC', True):
+        return process_order_placed(code)
+
+    try:
+        from django_q.tasks import async_task
+    except ImportError:
+        return process_order_placed(code)
+
+    try:
+        return async_task(ORDER_PLACED_TASK, code, group=f'price_move_{code}')
+    except Exception:
+        # Broker unavailable: evaluate now rather than leave the order to the sweep
+        logger.warning("Could not enqueue order evaluation for %s, processing inline", code, exc_info=True)
+        return process_order_placed(code)
+
+
+def process_order_placed(code):
+    """
+    Evaluate a currency's open orders against its current price
+
+    Args:
+        code (str): Cryptocurrency code
+
+    Returns:
+        dict: Counts of executed limit orders and triggered stop orders
+    """
+    from trading_hub.services.order_engine import OrderEvaluator
+
+    return OrderEvaluator().run_currency(code)
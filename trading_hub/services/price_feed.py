@@ -0,0 +1,304 @@
+import json
+import logging
+import socket
+import time
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from trading_hub.models import CryptoCurrency, PriceHistory
+from trading_hub.services.candles import CandleAggregator
+from trading_hub.services.market_stats import MarketStatsTracker
+from trading_hub.services.price_events import on_price_update
+
+logger = logging.getLogger(__name__)
+
+# One price update from a feed; timestamp is an aware datetime and volume is in units of the asset
+Tick = namedtuple('Tick', ['symbol', 'price', 'timestamp', 'volume'], defaults=[None, Decimal('0')])
+
+
+def parse_tick(line):
+    """
+    Parse one feed line into a Tick
+
+    Lines are either JSON objects with symbol, price and optional timestamp
+    (epoch seconds) and volume keys, or CSV in the order
+    symbol,price[,timestamp[,volume]].
+
+    Args:
+        line (str): Raw line from the feed
+
+    Returns:
+        Tick: Parsed tick, or None for blank or malformed lines
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+
+    try:
+        if line.startswith('{'):
+            data = json.loads(line)
+            fields = [data['symbol'], data['price'], data.get('timestamp'), data.get('volume')]
+        else:
+            fields = line.split(',') + [None, None]
+
+        symbol, price, ts, volume = fields[:4]
+        timestamp = (
+            datetime.fromtimestamp(float(ts), tz=dt_timezone.utc) if ts not in (None, '')
+            else timezone.now()
+        )
+        return Tick(
+            symbol=symbol.strip().upper(),
+            price=Decimal(str(price).strip()),
+            timestamp=timestamp,
+            volume=Decimal(str(volume).strip()) if volume not in (None, '') else Decimal('0'),
+        )
+    except (KeyError, ValueError, TypeError, InvalidOperation, json.JSONDecodeError):
+        logger.debug("Skipping malformed tick %r", line)
+        return None
+
+
+class FileTickSource:
+    """
+    Replays ticks from a file, one tick per line
+
+    Stand-in for a live exchange feed during local development.
+    """
+
+    def __init__(self, path, rate=None, loop=False):
+        """
+        Initialize the source
+
+        Args:
+            path (str): File of ticks in a format parse_tick understands
+            rate (float): Ticks per second to replay at (defaults to as fast as possible)
+            loop (bool): Start again from the top when the file ends
+        """
+        self.path = path
+        self.rate = rate
+        self.loop = loop
+
+    def __iter__(self):
+        interval = 1.0 / self.rate if self.rate else 0
+        while True:
+            with open(self.path) as feed:
+                for line in feed:
+                    tick = parse_tick(line)
+                    if tick is None:
+                        continue
+                    if interval:
+                        time.sleep(interval)
+                    # Replays are re-stamped so they look live
+                    yield tick._replace(timestamp=timezone.now()) if self.loop else tick
+            if not self.loop:
+                return
+
+
+class SocketTickSource:
+    """
+    Reads newline-delimited ticks from a TCP socket
+
+    Yields None whenever the socket has been quiet for the timeout, so the
+    ingestor can still flush on time when the feed is idle.
+    """
+
+    def __init__(self, host, port, timeout=1.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def __iter__(self):
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as conn:
+            buffer = b''
+            while True:
+                try:
+                    data = conn.recv(65536)
+                except socket.timeout:
+                    yield None
+                    continue
+                if not data:
+                    return
+                buffer += data
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    tick = parse_tick(line.decode('utf-8', 'replace'))
+                    if tick is not None:
+                        yield tick
+
+
+class TickCoalescer:
+    """Folds ticks into one open/high/low/close/volume summary per symbol per window"""
+
+    def __init__(self):
+        self.windows = {}
+        self.tick_count = 0
+
+    def add(self, tick):
+        window = self.windows.get(tick.symbol)
+        if window is None:
+            self.windows[tick.symbol] = {
+                'symbol': tick.symbol,
+                'open': tick.price,
+                'high': tick.price,
+                'low': tick.price,
+                'close': tick.price,
+                'volume': tick.volume,
+                'ticks': 1,
+                'start': tick.timestamp,
+                'timestamp': tick.timestamp,
+            }
+        else:
+            if tick.price > window['high']:
+                window['high'] = tick.price
+            if tick.price < window['low']:
+                window['low'] = tick.price
+            window['close'] = tick.price
+            window['volume'] += tick.volume
+            window['ticks'] += 1
+            window['timestamp'] = tick.timestamp
+        self.tick_count += 1
+
+    def drain(self):
+        """Return the summaries collected so far and start new windows"""
+        windows = list(self.windows.values())
+        self.windows = {}
+        self.tick_count = 0
+        return windows
+
+    def __len__(self):
+        return len(self.windows)
+
+
+class PriceWriter:
+    """
+    Writes coalesced price windows to the database
+
+    Each flush is one transaction: CryptoCurrency prices are written with a
+    single bulk_update, one PriceHistory row per symbol is added with
+    bulk_create, and the price event hook is told about every move because
+    bulk_update does not send post_save. Consumers such as the candle
+    aggregator and the 24h statistics tracker receive the known windows
+    through consume(windows) in the same transaction.
+    """
+
+    def __init__(self, period='day', consumers=None):
+        """
+        Initialize the writer
+
+        Args:
+            period (str): PriceHistory period recorded for ingested prices
+            consumers (list): Objects with a consume(windows) method (defaults
+                to a CandleAggregator and a MarketStatsTracker)
+        """
+        self.period = period
+        self.consumers = [CandleAggregator(), MarketStatsTracker()] if consumers is None else consumers
+
+    def write(self, windows):
+        """
+        Persist a list of window summaries from TickCoalescer.drain
+
+        Args:
+            windows (list): Window summaries
+
+        Returns:
+            dict: Counts of symbols written and symbols skipped as unknown
+        """
+        if not windows:
+            return {'written': 0, 'unknown': 0}
+
+        now = timezone.now()
+        with transaction.atomic():
+            cryptos = CryptoCurrency.objects.in_bulk([window['symbol'] for window in windows])
+            updated = []
+            history = []
+            moves = []
+            known = []
+            for window in windows:
+                crypto = cryptos.get(window['symbol'])
+                if crypto is None:
+                    continue
+                known.append(window)
+                old_price = crypto.current_price_usd
+                crypto.current_price_usd = window['close']
+                # bulk_update skips auto_now
+                crypto.last_updated = now
+                updated.append(crypto)
+                history.append(PriceHistory(
+                    currency=crypto,
+                    price_usd=window['close'],
+                    timestamp=window['timestamp'],
+                    period=self.period,
+                ))
+                moves.append((crypto.code, old_price, window['close']))
+
+            CryptoCurrency.objects.bulk_update(updated, ['current_price_usd', 'last_updated'])
+            PriceHistory.objects.bulk_create(history)
+            for consumer in self.consumers:
+                consumer.consume(known)
+            for code, old_price, new_price in moves:
+                on_price_update(code, old_price, new_price)
+
+        return {
+            'written': len(updated),
+            'unknown': len(windows) - len(updated),
+        }
+
+
+class PriceIngestor:
+    """
+    Long-running loop that turns a tick stream into batched price writes
+
+    Ticks are coalesced in memory and flushed once per window, so the number
+    of database writes depends on the window length and the number of
+    symbols, not on the tick rate.
+    """
+
+    def __init__(self, source, window=1.0, writer=None):
+        """
+        Initialize the ingestor
+
+        Args:
+            source: Iterable of Tick objects (None entries are idle heartbeats)
+            window (float): Seconds between flushes
+            writer (PriceWriter): Writer for flushed windows (defaults to a new one)
+        """
+        self.source = source
+        self.window = window
+        self.writer = writer or PriceWriter()
+        self.coalescer = TickCoalescer()
+        self.stats = {'ticks': 0, 'flushes': 0, 'written': 0, 'unknown': 0}
+
+    def flush(self):
+        ticks = self.coalescer.tick_count
+        results = self.writer.write(self.coalescer.drain())
+        self.stats['flushes'] += 1
+        self.stats['written'] += results['written']
+        self.stats['unknown'] += results['unknown']
+        logger.debug("Flushed %s ticks into %s price writes", ticks, results['written'])
+        return results
+
+    def run(self, max_ticks=None):
+        """
+        Consume the source until it ends (or max_ticks have been read)
+
+        Returns:
+            dict: Tick, flush and write counts
+        """
+        deadline = time.monotonic() + self.window
+        for tick in self.source:
+            if tick is not None:
+                self.coalescer.add(tick)
+                self.stats['ticks'] += 1
+            if time.monotonic() >= deadline:
+                if len(self.coalescer):
+                    self.flush()
+                deadline = time.monotonic() + self.window
+            if max_ticks and self.stats['ticks'] >= max_ticks:
+                break
+
+        if len(self.coalescer):
+            self.flush()
+        return self.stats
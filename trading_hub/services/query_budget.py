@@ -0,0 +1,122 @@
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+# Queries kept per request for the failure message; the count itself is never capped
+KEPT_QUERIES = 50
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view made more queries than its declared budget"""
+
+
+def query_budget(limit):
+    """
+    Declare the most queries a function view may make per request
+
+    Counts include everything the request does, middleware (session and
+    user lookups) included. Put it above login_required and the other
+    decorators so the URL resolver sees it. Viewsets declare
+    `query_budgets = {'list': ..., 'retrieve': ...}` instead.
+    """
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def normalize_sql(sql):
+    """SQL with literals replaced, so repeats of one query (an N+1) group together"""
+    return re.sub(r"'[^']*'|\b\d+\b", '?', sql)
+
+
+def budget_for(view_func, method):
+    """
+    The budget declared for a resolved view
+
+    The QUERY_BUDGETS setting (label -> limit) overrides declarations.
+
+    Args:
+        view_func (callable): View from the URL resolver
+        method (str): HTTP method of the request
+
+    Returns:
+        tuple: (label such as 'dashboard' or 'TransactionViewSet.list', limit or None)
+    """
+    viewset = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None)
+    if viewset is not None and actions:
+        action = actions.get(method.lower())
+        label = f'{viewset.__name__}.{action}'
+        limit = getattr(viewset, 'query_budgets', {}).get(action)
+    else:
+        label = getattr(view_func, '__name__', repr(view_func))
+        limit = getattr(view_func, 'query_budget', None)
+    return label, getattr(settings, 'QUERY_BUDGETS', {}).get(label, limit)
+
+
+class QueryCounter:
+    """
+    Counts queries on every database connection while active
+
+    Uses connection.execute_wrapper, so it works with DEBUG off, where
+    connection.queries stays empty.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.patterns = Counter()
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.patterns[normalize_sql(sql)] += 1
+        if len(self.queries) < KEPT_QUERIES:
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def repeated(self, threshold=3):
+        """Query patterns run more than threshold times, most frequent first"""
+        return [(sql, count) for sql, count in self.patterns.most_common() if count > threshold]
+
+    def describe(self):
+        lines = [f'{count}x {sql[:200]}' for sql, count in self.repeated()]
+        return '\n'.join(lines or self.queries[:10])
+
+
+class QueryBudgetAssertions:
+    """
+    TestCase mixin checking views against their declared query budgets
+
+    Seed enough rows that an N+1 would show, then request the view through
+    assertWithinQueryBudget. Views without a budget fail the assertion, so
+    a budget cannot be dropped by accident.
+    """
+
+    def assertWithinQueryBudget(self, url, method='get', **kwargs):
+        match = resolve(url.split('?')[0])
+        label, limit = budget_for(match.func, method)
+        if limit is None:
+            self.fail(f'{label} has no query budget')
+        with QueryCounter() as counter:
+            response = getattr(self.client, method)(url, **kwargs)
+        if counter.count > limit:
+            self.fail(f'{label} made {counter.count} queries, budget {limit}:\n{counter.describe()}')
+        return response
@@ -0,0 +1,128 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from trading_hub.models import CryptoCurrency, RecurringOrder
+from trading_hub.services.settlement import SettlementBatch
+
+logger = logging.getLogger(__name__)
+
+
+class RecurringOrderRunner:
+    """
+    Executes every recurring order that has come due
+
+    Due orders are found with one scan of the (status, next_execution) index
+    and processed in chunks. Each chunk loads its orders in one query, prices
+    each cryptocurrency once, and settles all of its fills together, which
+    also advances next_execution for the whole chunk in a bulk update. Chunks
+    can run on a small thread pool; wallet locks are taken in a fixed order
+    by the ledger, so concurrent chunks cannot deadlock.
+    """
+
+    def __init__(self, now=None, chunk_size=500, workers=None):
+        """
+        Initialize the runner
+
+        Args:
+            now (datetime): Orders due at or before this time run (defaults to now)
+            chunk_size (int): Orders settled per transaction
+            workers (int): Chunks processed concurrently (defaults to the
+                RECURRING_ORDER_WORKERS setting, or 1)
+        """
+        self.now = now or timezone.now()
+        self.chunk_size = chunk_size
+        self.workers = max(1, workers or getattr(settings, 'RECURRING_ORDER_WORKERS', 1))
+
+    def due_order_ids(self):
+        """Ids of active orders due now, earliest first"""
+        return list(
+            RecurringOrder.objects.filter(
+                status='active',
+                next_execution__lte=self.now
+            ).order_by('next_execution').values_list('id', flat=True)
+        )
+
+    def complete_ended_orders(self):
+        """Mark active orders whose end date has passed as completed"""
+        return RecurringOrder.objects.filter(
+            status='active',
+            end_date__lt=self.now
+        ).update(status='completed', updated_at=self.now)
+
+    def run_chunk(self, order_ids):
+        """
+        Execute one chunk of due orders
+
+        Args:
+            order_ids (list): Ids of the orders to execute
+
+        Returns:
+            dict: Counts of executed and skipped orders
+        """
+        orders = list(
+            RecurringOrder.objects.filter(id__in=order_ids, status='active')
+            .select_related('from_wallet')
+        )
+
+        by_crypto = defaultdict(list)
+        for order in orders:
+            by_crypto[order.cryptocurrency_id].append(order)
+        cryptos = CryptoCurrency.objects.in_bulk(list(by_crypto))
+
+        batch = SettlementBatch(batch_size=self.chunk_size)
+        skipped = 0
+        for code, crypto_orders in by_crypto.items():
+            crypto = cryptos.get(code)
+            if crypto is None or not crypto.current_price_usd:
+                skipped += len(crypto_orders)
+                continue
+            for order in crypto_orders:
+                order.cryptocurrency = crypto
+                batch.add(order, **order.settlement_fill(crypto.current_price_usd))
+
+        results = batch.commit(now=self.now)
+        return {
+            'executed': results['settled'],
+            'skipped': results['rejected'] + len(batch.stale) + skipped,
+        }
+
+    def _run_chunk_in_thread(self, order_ids):
+        try:
+            return self.run_chunk(order_ids)
+        finally:
+            # Each worker thread opens its own connection
+            connection.close()
+
+    def run(self):
+        """
+        Execute every due order
+
+        Returns:
+            dict: Counts of executed, skipped and completed orders
+        """
+        completed = self.complete_ended_orders()
+        order_ids = self.due_order_ids()
+        chunks = [order_ids[i:i + self.chunk_size] for i in range(0, len(order_ids), self.chunk_size)]
+
+        if self.workers == 1 or len(chunks) <= 1:
+            results = [self.run_chunk(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(self._run_chunk_in_thread, chunks))
+
+        executed = sum(result['executed'] for result in results)
+        skipped = sum(result['skipped'] for result in results)
+        logger.info(
+            "Recurring orders: %s executed, %s skipped, %s completed",
+            executed, skipped, completed
+        )
+        return {
+            'executed': executed,
+            'skipped': skipped,
+            'completed': completed,
+        }
@@ -0,0 +1,324 @@
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets: exact below 2 * SUB_BUCKETS microseconds, then SUB_BUCKETS
+# buckets per power of two, so every bucket is within 1/64 of its values
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Recorded latencies are capped at an hour
+MAX_MICROSECONDS = 3600 * 1000000
+
+WORKERS_KEY = 'request_metrics_workers'
+SNAPSHOT_KEY = 'request_metrics_{slot}'
+PROFILES_KEY = 'request_profiles'
+PROFILE_KEY = 'request_profile_{id}'
+# Slots read by the metrics endpoint; older ones belong to long-gone processes
+MAX_WORKER_SLOTS = 256
+
+
+def bucket_index(microseconds):
+    """Histogram bucket holding a latency in microseconds"""
+    value = min(max(int(microseconds), 0), MAX_MICROSECONDS)
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def bucket_bounds(index):
+    """Lowest and highest latency in microseconds that land in a bucket"""
+    if index < 2 * SUB_BUCKETS:
+        return index, index
+    shift = index // SUB_BUCKETS - 1
+    sub_bucket = index % SUB_BUCKETS + SUB_BUCKETS
+    return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram with log-linear buckets
+
+    Recording is one dict increment, memory grows with the number of
+    distinct buckets hit rather than the number of requests, and two
+    histograms merge by adding their counts, so per-process histograms
+    can be combined into one for the whole deployment.
+    """
+
+    def __init__(self, counts=None):
+        self.counts = Counter({int(index): count for index, count in (counts or {}).items()})
+        self.total = sum(self.counts.values())
+        self.max = max((bucket_bounds(index)[1] for index in self.counts), default=0)
+
+    def record(self, microseconds):
+        index = bucket_index(microseconds)
+        self.counts[index] += 1
+        self.total += 1
+        self.max = max(self.max, min(int(microseconds), MAX_MICROSECONDS))
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """
+        Latency in microseconds below which q percent of recordings fall
+
+        Returns the midpoint of the bucket holding that rank, 0 when empty.
+        """
+        if not self.total:
+            return 0
+        rank = max(1, -(-self.total * q // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                return min((low + high) / 2, self.max)
+        return self.max
+
+
+class EndpointStats:
+    """Latency histogram and database totals for one URL name"""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.latency = LatencyHistogram(data.get('latency'))
+        self.queries = data.get('queries', 0)
+        self.db_seconds = data.get('db_seconds', 0.0)
+        self.errors = data.get('errors', 0)
+
+    def record(self, seconds, queries, db_seconds, status_code):
+        self.latency.record(seconds * 1000000)
+        self.queries += queries
+        self.db_seconds += db_seconds
+        if status_code >= 500:
+            self.errors += 1
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.queries += other.queries
+        self.db_seconds += other.db_seconds
+        self.errors += other.errors
+
+    def to_dict(self):
+        return {
+            'latency': dict(self.latency.counts),
+            'queries': self.queries,
+            'db_seconds': self.db_seconds,
+            'errors': self.errors,
+        }
+
+    def summary(self):
+        """
+        Request count, latency percentiles and per-request database averages
+
+        Returns:
+            dict: count, errors, p50/p90/p99/max in milliseconds, queries and db_ms per request
+        """
+        count = self.latency.total
+        return {
+            'count': count,
+            'errors': self.errors,
+            'p50_ms': round(self.latency.percentile(50) / 1000, 3),
+            'p90_ms': round(self.latency.percentile(90) / 1000, 3),
+            'p99_ms': round(self.latency.percentile(99) / 1000, 3),
+            'max_ms': round(self.latency.max / 1000, 3),
+            'queries_per_request': round(self.queries / count, 2) if count else 0,
+            'db_ms_per_request': round(self.db_seconds * 1000 / count, 3) if count else 0,
+        }
+
+
+class MetricsRegistry:
+    """
+    Per-process request metrics, published to the shared cache
+
+    Requests record into this process's stats in memory. Every
+    REQUEST_METRICS_FLUSH_SECONDS the cumulative stats are written to the
+    cache under a slot this process took with cache.incr, so web workers
+    never overwrite each other and the metrics endpoint merges every slot
+    into deployment-wide histograms.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._slot = None
+        self._last_flush = time.monotonic()
+
+    def record(self, name, seconds, queries=0, db_seconds=0.0, status_code=200):
+        with self._lock:
+            stats = self._endpoints.get(name)
+            if stats is None:
+                stats = self._endpoints[name] = EndpointStats()
+            stats.record(seconds, queries, db_seconds, status_code)
+            due = time.monotonic() - self._last_flush >= getattr(settings, 'REQUEST_METRICS_FLUSH_SECONDS', 10)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write this process's stats to its cache slot"""
+        with self._lock:
+            snapshot = {name: stats.to_dict() for name, stats in self._endpoints.items()}
+            self._last_flush = time.monotonic()
+        try:
+            # A missing counter means the cache was flushed, and with it the slot numbering
+            if cache.add(WORKERS_KEY, 0, None) or self._slot is None:
+                self._slot = cache.incr(WORKERS_KEY)
+            cache.set(
+                SNAPSHOT_KEY.format(slot=self._slot), snapshot,
+                getattr(settings, 'REQUEST_METRICS_TTL', 24 * 3600),
+            )
+        except Exception as e:
+            # Metrics must never break a request
+            logger.warning("Could not publish request metrics: %s", e)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def collect(self):
+        """
+        Stats merged across every process that published recently
+
+        Returns:
+            dict: URL name -> EndpointStats
+        """
+        self.flush()
+        workers = cache.get(WORKERS_KEY, 0)
+        keys = [SNAPSHOT_KEY.format(slot=slot) for slot in range(max(1, workers - MAX_WORKER_SLOTS + 1), workers + 1)]
+        merged = {}
+        for snapshot in cache.get_many(keys).values():
+            for name, data in snapshot.items():
+                merged.setdefault(name, EndpointStats()).merge(EndpointStats(data))
+        return merged
+
+
+registry = MetricsRegistry()
+
+
+class QueryTimer:
+    """
+    Counts queries and the time spent in them on every connection while active
+
+    Uses connection.execute_wrapper, so it works with DEBUG off; it keeps
+    no SQL, which keeps it cheap enough to run on every request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self._wrapped = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+    def __enter__(self):
+        for connection in connections.all():
+            wrapper = connection.execute_wrapper(self)
+            wrapper.__enter__()
+            self._wrapped.append(wrapper)
+        return self
+
+    def __exit__(self, *exc_info):
+        while self._wrapped:
+            self._wrapped.pop().__exit__(*exc_info)
+
+
+class StackSampler:
+    """
+    Samples one thread's call stack at a fixed interval
+
+    A background thread reads the target thread's current frame every
+    interval, so the profiled code runs untouched; the cost is one stack
+    walk per sample instead of a hook on every call. Stacks are kept in the
+    collapsed format flamegraph tools read ("outer;inner count").
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_filename}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+
+def save_profile(name, request, seconds, timer, sampler):
+    """
+    Store a sampled profile in the shared cache
+
+    Returns:
+        int: Profile id, for the request_profile endpoint
+    """
+    cache.add(PROFILES_KEY, 0, None)
+    profile_id = cache.incr(PROFILES_KEY)
+    cache.set(PROFILE_KEY.format(id=profile_id), {
+        'id': profile_id,
+        'view': name,
+        'path': request.path,
+        'method': request.method,
+        'created': timezone.now().isoformat(),
+        'duration_ms': round(seconds * 1000, 3),
+        'queries': timer.count,
+        'db_ms': round(timer.seconds * 1000, 3),
+        'samples': sampler.samples,
+        'interval_ms': sampler.interval * 1000,
+        'stacks': sampler.collapsed(),
+    }, getattr(settings, 'REQUEST_PROFILE_TTL', 24 * 3600))
+    return profile_id
+
+
+def recent_profiles(limit=50):
+    """Summaries of the latest stored profiles, newest first"""
+    latest = cache.get(PROFILES_KEY, 0)
+    keys = [PROFILE_KEY.format(id=profile_id) for profile_id in range(latest, max(0, latest - limit), -1)]
+    found = cache.get_many(keys)
+    return [
+        {field: value for field, value in found[key].items() if field != 'stacks'}
+        for key in keys if key in found
+    ]
+
+
+def get_profile(profile_id):
+    return cache.get(PROFILE_KEY.format(id=profile_id))
@@ -0,0 +1,598 @@
+import bisect
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, connections, models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from trading_hub.models import (
+    CoinbaseUser,
+    CryptoCurrency,
+    LimitOrder,
+    News,
+    PriceHistory,
+    RecurringOrder,
+    StopOrder,
+    Transaction,
+    Wallet,
+)
+
+logger = logging.getLogger(__name__)
+
+# Currencies seeded when missing, with the price their random walks centre on
+SEED_CURRENCIES = (
+    ('BTC', 'Bitcoin', 65000),
+    ('ETH', 'Ethereum', 3500),
+    ('SOL', 'Solana', 150),
+    ('ADA', 'Cardano', 0.45),
+    ('DOT', 'Polkadot', 7),
+    ('XRP', 'Ripple', 0.55),
+    ('DOGE', 'Dogecoin', 0.15),
+    ('LTC', 'Litecoin', 85),
+)
+
+# The wallets signals.create_default_wallets gives every new user
+DEFAULT_WALLETS = (
+    ('USD', 'USD Wallet', Decimal('1000.00')),
+    ('BTC', 'Bitcoin Wallet', Decimal('0')),
+    ('ETH', 'Ethereum Wallet', Decimal('0')),
+)
+TRADED_CODES = ('BTC', 'ETH')
+
+
+def _weighted(*choices):
+    """(value, weight) pairs -> (values, cumulative weights)"""
+    return tuple(value for value, _ in choices), tuple(itertools.accumulate(weight for _, weight in choices))
+
+
+TRANSACTION_TYPES = _weighted(('buy', 40), ('sell', 25), ('send', 10), ('receive', 10), ('convert', 15))
+TRANSACTION_STATUSES = _weighted(('completed', 90), ('pending', 4), ('failed', 4), ('canceled', 2))
+ORDER_STATUSES = _weighted(('open', 30), ('filled', 50), ('cancelled', 15), ('expired', 5))
+RECURRING_STATUSES = _weighted(('active', 60), ('paused', 20), ('completed', 10), ('cancelled', 10))
+INTERVAL_DAYS = {'daily': 1, 'weekly': 7, 'biweekly': 14, 'monthly': 30}
+
+NEWS_SOURCES = ('CoinDesk', 'The Block', 'Decrypt', 'CryptoSlate', 'Bitcoin Magazine')
+NEWS_CATEGORIES = ('market', 'regulation', 'technology', 'defi', 'adoption')
+NEWS_HEADLINES = (
+    '{name} rallies as trading volume climbs',
+    '{name} slips after a week of gains',
+    'Analysts split on the outlook for {name}',
+    'Developers ship a major {name} network upgrade',
+    'Institutional interest in {name} keeps growing',
+)
+
+# Receivers that would do per-row work (wallets, profiles, order books, order triggers) during a load
+SIGNAL_RECEIVERS = (
+    (post_save, User, 'trading_hub.models', 'create_coinbase_user'),
+    (post_save, User, 'trading_hub.models', 'save_coinbase_user'),
+    (post_save, User, 'trading_hub.signals', 'create_default_wallets'),
+    (post_save, LimitOrder, 'trading_hub.signals', 'sync_order_book'),
+    (post_delete, LimitOrder, 'trading_hub.signals', 'remove_from_order_book'),
+    (post_save, CryptoCurrency, 'trading_hub.signals', 'trigger_crossed_orders'),
+    (post_save, Transaction, 'trading_hub.signals', 'update_tax_ledger'),
+)
+
+# The loader forked worker processes share; set just before the pool starts
+_worker_loader = None
+
+
+@contextmanager
+def muted_signals():
+    """
+    Disconnect the per-row receivers for the duration of a bulk load
+
+    Bulk inserts never send post_save, but anything saved one at a time
+    would otherwise create profiles and wallets or reach the in-memory order
+    book, and cascading deletes would have to load every row to signal it.
+    """
+    disconnected = []
+    for signal, sender, module, name in SIGNAL_RECEIVERS:
+        receiver = getattr(__import__(module, fromlist=[name]), name, None)
+        if receiver is not None and signal.disconnect(receiver, sender=sender):
+            disconnected.append((signal, sender, receiver))
+    try:
+        yield
+    finally:
+        for signal, sender, receiver in disconnected:
+            signal.connect(receiver, sender=sender)
+
+
+@contextmanager
+def deferred_indexes(*model_classes):
+    """
+    Drop the models' Meta.indexes for a bulk load and rebuild them afterwards
+
+    Building an index once over the loaded table is far cheaper than updating
+    it for every inserted row. Needs to run outside a transaction on SQLite.
+    """
+    dropped = []
+    with connection.schema_editor() as editor:
+        for model in model_classes:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+                dropped.append((model, index))
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in dropped:
+                editor.add_index(model, index)
+
+
+def _load_chunk(task):
+    """Pool entry point: insert one chunk with the loader inherited from the parent"""
+    kind, chunk, count = task
+    return _worker_loader.load_chunk(kind, chunk, count)
+
+
+class SeedLoader:
+    """
+    Generates large, realistic datasets for load testing
+
+    Rows are built in chunks of batch_size, one transaction per chunk.
+    Transactions, orders and price history are the bulk of the data, so
+    they are generated as plain tuples and inserted with raw multi-row
+    INSERTs rather than through model instances. Every chunk draws from a random
+    generator seeded with (seed, kind, chunk number), so a given seed always
+    produces the same data however many worker processes share the work.
+    Workers are forked with their parent's state and open their own
+    database connections. SQLite allows one writer at a time, so there the
+    work stays in one process and the connection's fsyncs are turned off
+    for the load instead.
+
+    Seeded users get the profile and default wallets the post_save signals
+    would create, written in bulk rather than row by row.
+    """
+
+    def __init__(self, seed=0, batch_size=5000, prefix='seed', days=365, now=None):
+        """
+        Initialize the loader
+
+        Args:
+            seed (int): Seed for every random choice
+            batch_size (int): Rows per chunk
+            prefix (str): Username prefix marking seeded users
+            days (int): How far back generated activity reaches
+            now (datetime): End of the generated history (defaults to now)
+        """
+        self.seed = seed
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.span = timedelta(days=days)
+        self.now = now or timezone.now()
+        self.prices = {}
+        self.accounts = []  # (user id, USD wallet id, BTC wallet id, ETH wallet id)
+        self.prepared_pid = None
+
+    def _rng(self, kind, chunk):
+        return random.Random(f'{self.seed}:{kind}:{chunk}')
+
+    @staticmethod
+    def _uuid(rng):
+        return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+    @staticmethod
+    def _pick(rng, weighted):
+        values, cumulative = weighted
+        return values[bisect.bisect(cumulative, rng.random() * cumulative[-1])]
+
+    def _moment(self, rng):
+        return self.now - self.span * rng.random()
+
+    def _price(self, rng, code):
+        return self.prices[code] * rng.uniform(0.6, 1.4)
+
+    def _prepare_connection(self):
+        """Per-connection SQLite settings for a bulk load; they do not outlive the connection"""
+        if self.prepared_pid == os.getpid():
+            return
+        # SQLite refuses to change the safety level inside a transaction
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+                cursor.execute('PRAGMA temp_store = MEMORY')
+                cursor.execute('PRAGMA cache_size = -262144')
+        self.prepared_pid = os.getpid()
+
+    def seeded_users(self):
+        return User.objects.filter(username__startswith=f'{self.prefix}_')
+
+    def clear(self):
+        """Delete previously seeded users (with everything they own) and news"""
+        # Without receivers attached the cascades can delete in bulk
+        with muted_signals():
+            deleted, _ = self.seeded_users().delete()
+            news, _ = News.objects.filter(source_url__startswith=f'https://news.example.com/{self.prefix}/').delete()
+        return deleted + news
+
+    def load_currencies(self):
+        """Create missing seed currencies and remember every currency's price"""
+        CryptoCurrency.objects.bulk_create(
+            [CryptoCurrency(code=code, name=name, current_price_usd=Decimal(str(price)))
+             for code, name, price in SEED_CURRENCIES],
+            ignore_conflicts=True,
+        )
+        self.prices = {
+            code: float(price) or 1.0
+            for code, price in CryptoCurrency.objects.values_list('code', 'current_price_usd')
+        }
+
+    def load_accounts(self):
+        """Read the seeded users and their default wallet ids, in user id order"""
+        wallets = {}
+        for user_id, code, wallet_id in Wallet.objects.filter(
+            user__username__startswith=f'{self.prefix}_', currency_code__in=[code for code, _, _ in DEFAULT_WALLETS]
+        ).values_list('user_id', 'currency_code', 'id'):
+            wallets.setdefault(user_id, {})[code] = wallet_id
+        self.accounts = [
+            (user_id, codes['USD'], codes['BTC'], codes['ETH'])
+            for user_id, codes in sorted(wallets.items())
+            if len(codes) == len(DEFAULT_WALLETS)
+        ]
+        return len(self.accounts)
+
+    def create_users(self, count):
+        """
+        Create users with their profiles and default wallets
+
+        Returns:
+            int: Rows written across the three tables
+        """
+        password = make_password(f'{self.prefix}-password')  # Hashing once, not per user
+        rows = 0
+        for chunk in range(math.ceil(count / self.batch_size)):
+            rng = self._rng('users', chunk)
+            first = chunk * self.batch_size
+            numbers = range(first, min(first + self.batch_size, count))
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(
+                        username=f'{self.prefix}_{number}',
+                        email=f'{self.prefix}_{number}@example.com',
+                        password=password,
+                        date_joined=self.now - self.span * (1 + rng.random()),
+                    )
+                    for number in numbers
+                ])
+                user_ids = list(self.seeded_users().filter(
+                    username__in=[f'{self.prefix}_{number}' for number in numbers]
+                ).values_list('id', flat=True))
+                CoinbaseUser.objects.bulk_create([CoinbaseUser(user_id=user_id) for user_id in user_ids])
+                Wallet.objects.bulk_create([
+                    Wallet(
+                        user_id=user_id,
+                        currency_code=code,
+                        name=name,
+                        balance=balance,
+                        address=f'{code.lower()}-wallet-{user_id}',
+                    )
+                    for user_id in user_ids
+                    for code, name, balance in DEFAULT_WALLETS
+                ])
+            rows += len(user_ids) * (2 + len(DEFAULT_WALLETS))
+        return rows
+
+    def _chunk_numbers(self, chunk, count):
+        first = chunk * self.batch_size
+        return range(first, min(first + self.batch_size, count))
+
+    def transaction_rows(self, chunk, count):
+        rng = self._rng('transactions', chunk)
+        rows = []
+        for _ in self._chunk_numbers(chunk, count):
+            user_id, usd, btc, eth = rng.choice(self.accounts)
+            code = rng.choice(TRADED_CODES)
+            crypto, other = (btc, eth) if code == 'BTC' else (eth, btc)
+            kind = self._pick(rng, TRANSACTION_TYPES)
+            usd_value = rng.lognormvariate(4.5, 1.2)
+            from_wallet, to_wallet = {
+                'buy': (usd, crypto),
+                'sell': (crypto, usd),
+                'send': (crypto, None),
+                'receive': (None, crypto),
+                'convert': (crypto, other),
+            }[kind]
+            created_at = self._moment(rng)
+            rows.append((
+                self._uuid(rng), user_id, kind, Decimal(f'{usd_value / self._price(rng, code):.8f}'), code,
+                Decimal(f'{usd_value:.2f}'), self._pick(rng, TRANSACTION_STATUSES), created_at,
+                created_at + timedelta(seconds=rng.randint(0, 300)), from_wallet, to_wallet,
+            ))
+        return rows
+
+    def _order_fields(self, rng):
+        """id, user, cryptocurrency, side, from/to wallets and timestamps shared by every order kind"""
+        user_id, usd, btc, eth = rng.choice(self.accounts)
+        code = rng.choice(TRADED_CODES)
+        crypto = btc if code == 'BTC' else eth
+        side = rng.choice(('buy', 'sell'))
+        created_at = self._moment(rng)
+        return (
+            self._uuid(rng), user_id, code, side,
+            usd if side == 'buy' else crypto, crypto if side == 'buy' else usd,
+            created_at, created_at + timedelta(minutes=rng.randint(0, 600)),
+        )
+
+    def _order_state(self, rng, amount, created_at):
+        """status, filled_amount and expires_at for a limit or stop order"""
+        status = self._pick(rng, ORDER_STATUSES)
+        expires_at = created_at + timedelta(days=rng.randint(1, 30)) if rng.random() < 0.3 else None
+        if status == 'open' and expires_at is not None and expires_at < self.now:
+            expires_at = None
+        return status, amount if status == 'filled' else Decimal('0'), expires_at
+
+    def limit_order_rows(self, chunk, count):
+        rng = self._rng('limit_orders', chunk)
+        rows = []
+        for _ in self._chunk_numbers(chunk, count):
+            fields = self._order_fields(rng)
+            code, side = fields[2], fields[3]
+            # Resting orders sit on the passive side of the market
+            offset = rng.uniform(0.01, 0.25)
+            price = self.prices[code] * (1 - offset if side == 'buy' else 1 + offset)
+            amount = Decimal(f'{rng.lognormvariate(4.5, 1.2) / price:.8f}')
+            rows.append(fields + (amount, Decimal(f'{price:.2f}')) + self._order_state(rng, amount, fields[6]))
+        return rows
+
+    def stop_order_rows(self, chunk, count):
+        rng = self._rng('stop_orders', chunk)
+        rows = []
+        for _ in self._chunk_numbers(chunk, count):
+            fields = self._order_fields(rng)
+            code, side = fields[2], fields[3]
+            offset = rng.uniform(0.02, 0.3)
+            stop = self.prices[code] * (1 + offset if side == 'buy' else 1 - offset)
+            amount = Decimal(f'{rng.lognormvariate(4.5, 1.2) / stop:.8f}')
+            limit = Decimal(f"{stop * (1.01 if side == 'buy' else 0.99):.2f}") if rng.random() < 0.3 else None
+            status, filled, expires_at = self._order_state(rng, amount, fields[6])
+            if status == 'filled' and rng.random() < 0.1:
+                status, filled = 'triggered', Decimal('0')
+            rows.append(fields + (amount, Decimal(f'{stop:.2f}'), limit, status, filled, expires_at))
+        return rows
+
+    def recurring_order_rows(self, chunk, count):
+        rng = self._rng('recurring_orders', chunk)
+        rows = []
+        for _ in self._chunk_numbers(chunk, count):
+            fields = self._order_fields(rng)
+            code, side, started = fields[2], fields[3], fields[6]
+            interval = rng.choice(tuple(INTERVAL_DAYS))
+            period = timedelta(days=INTERVAL_DAYS[interval])
+            usd = rng.uniform(10, 500)
+            amount = Decimal(f'{usd:.2f}') if side == 'buy' else Decimal(f'{usd / self.prices[code]:.8f}')
+            # save() would fill next_execution in. Active orders fall due over
+            # the next interval rather than all at once.
+            next_execution = self.now + period * rng.random()
+            last_executed = next_execution - period
+            rows.append(fields + (
+                amount, interval, self._pick(rng, RECURRING_STATUSES), started,
+                last_executed if last_executed > started else None, next_execution,
+            ))
+        return rows
+
+    ORDER_FIELDS = (
+        'id', 'user_id', 'cryptocurrency_id', 'side', 'from_wallet_id', 'to_wallet_id', 'created_at', 'updated_at',
+    )
+    # kind -> (model, fields in row order, row builder)
+    ROW_BUILDERS = {
+        'transactions': (Transaction, (
+            'id', 'user_id', 'transaction_type', 'amount', 'currency', 'native_amount', 'status',
+            'created_at', 'updated_at', 'from_wallet_id', 'to_wallet_id',
+        ), 'transaction_rows'),
+        'limit_orders': (LimitOrder, ORDER_FIELDS + (
+            'amount', 'limit_price', 'status', 'filled_amount', 'expires_at',
+        ), 'limit_order_rows'),
+        'stop_orders': (StopOrder, ORDER_FIELDS + (
+            'amount', 'stop_price', 'limit_price', 'status', 'filled_amount', 'expires_at',
+        ), 'stop_order_rows'),
+        'recurring_orders': (RecurringOrder, tuple(
+            'order_type' if name == 'side' else name for name in ORDER_FIELDS
+        ) + ('amount', 'interval', 'status', 'start_date', 'last_executed', 'next_execution'), 'recurring_order_rows'),
+    }
+
+    @staticmethod
+    def _adapter(field):
+        """Python value -> database parameter for one column, as get_db_prep_save would convert it"""
+        if isinstance(field, models.UUIDField) and not connection.features.has_native_uuid_field:
+            return lambda value: value.hex
+        if isinstance(field, models.DateTimeField):
+            if connection.vendor == 'sqlite' and settings.USE_TZ:
+                # What adapt_datetimefield_value does, without its per-call checks
+                zone = connection.timezone
+                return lambda value: str(value.astimezone(zone).replace(tzinfo=None))
+            return connection.ops.adapt_datetimefield_value
+        return None
+
+    def insert_rows(self, model, field_names, rows):
+        """
+        INSERT plain tuples into model's table, skipping model instances
+
+        Building and preparing a model instance per row costs more than the
+        insert itself at these volumes. Columns not in field_names get their
+        field default. Values must already be valid for their columns.
+        """
+        if not rows:
+            return 0
+        fields = [model._meta.get_field(name) for name in field_names]
+        defaults = [
+            field for field in model._meta.concrete_fields
+            if field not in fields and field.attname not in field_names and not field.db_returning
+        ]
+        adapters = [(index, adapter) for index, adapter in enumerate(map(self._adapter, fields)) if adapter]
+        constants = tuple(field.get_db_prep_save(field.get_default(), connection) for field in defaults)
+
+        params = []
+        for row in rows:
+            if adapters:
+                row = list(row)
+                for index, adapter in adapters:
+                    if row[index] is not None:
+                        row[index] = adapter(row[index])
+            params.append(tuple(row) + constants)
+
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields + defaults)
+        placeholders = '(' + ', '.join(['%s'] * (len(fields) + len(defaults))) + ')'
+        table = quote(model._meta.db_table)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                # One prepared statement run per row is SQLite's fastest path
+                cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES {placeholders}', params)
+            else:
+                # Elsewhere a round trip per row dominates, so send multi-row VALUES
+                per_statement = max(1, (connection.features.max_query_params or 65535) // len(params[0]))
+                for first in range(0, len(params), per_statement):
+                    batch = params[first:first + per_statement]
+                    cursor.execute(
+                        f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholders] * len(batch))}',
+                        [value for row in batch for value in row],
+                    )
+        return len(rows)
+
+    def load_chunk(self, kind, chunk, count):
+        """Build and insert one chunk of rows; returns the rows written"""
+        self._prepare_connection()
+        model, fields, builder = self.ROW_BUILDERS[kind]
+        rows = getattr(self, builder)(chunk, count)
+        with transaction.atomic():
+            return self.insert_rows(model, fields, rows)
+
+    def load(self, kind, count, workers=1):
+        """
+        Insert count rows of one kind, spread over worker processes
+
+        Returns:
+            int: Rows written
+        """
+        if count <= 0 or not self.accounts:
+            return 0
+        tasks = [(kind, chunk, count) for chunk in range(math.ceil(count / self.batch_size))]
+        if workers <= 1 or len(tasks) == 1:
+            return sum(self.load_chunk(*task) for task in tasks)
+
+        global _worker_loader
+        _worker_loader = self
+        # Children must not inherit the parent's open connection
+        connections.close_all()
+        self.prepared_pid = None
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            return sum(pool.imap_unordered(_load_chunk, tasks))
+
+    def create_price_history(self, points, interval=timedelta(minutes=5)):
+        """
+        Write points evenly spaced ticks per currency, ending now
+
+        Each currency follows a geometric random walk that finishes at its
+        current price, so charts and candles join up with live data.
+        """
+        rows = 0
+        for number, code in enumerate(sorted(self.prices)):
+            if points <= 0:
+                break
+            rng = np.random.default_rng([self.seed, number])
+            path = np.exp(np.cumsum(rng.normal(0, 0.002, points)))
+            prices = self.prices[code] * path / path[-1]
+            start = self.now - interval * (points - 1)
+            for first in range(0, points, self.batch_size):
+                with transaction.atomic():
+                    self.insert_rows(PriceHistory, ('currency_id', 'price_usd', 'timestamp', 'period'), [
+                        (code, Decimal(f'{prices[index]:.2f}'), start + interval * index, 'day')
+                        for index in range(first, min(first + self.batch_size, points))
+                    ])
+            rows += points
+        return rows
+
+    def create_news(self, count):
+        codes = sorted(self.prices)
+        names = dict(CryptoCurrency.objects.values_list('code', 'name'))
+        rows = 0
+        for chunk in range(math.ceil(count / self.batch_size)):
+            rng = self._rng('news', chunk)
+            first = chunk * self.batch_size
+            articles = []
+            related = []
+            for number in range(first, min(first + self.batch_size, count)):
+                code = rng.choice(codes)
+                articles.append(News(
+                    title=rng.choice(NEWS_HEADLINES).format(name=names.get(code, code)),
+                    content=f'Seeded article {number} about {code}.',
+                    source=rng.choice(NEWS_SOURCES),
+                    source_url=f'https://news.example.com/{self.prefix}/{number}',
+                    published_at=self._moment(rng),
+                    created_at=self.now,
+                    categories=', '.join(rng.sample(NEWS_CATEGORIES, 2)),
+                    sentiment=rng.choice(('positive', 'neutral', 'negative')),
+                    featured=rng.random() < 0.05,
+                ))
+                related.append(code)
+            with transaction.atomic():
+                News.objects.bulk_create(articles)
+                ids = dict(News.objects.filter(
+                    source_url__in=[article.source_url for article in articles]
+                ).values_list('source_url', 'id'))
+                through = News.related_cryptocurrencies.through
+                through.objects.bulk_create([
+                    through(news_id=ids[article.source_url], cryptocurrency_id=code)
+                    for article, code in zip(articles, related)
+                ])
+            rows += len(articles)
+        return rows
+
+    def run(self, users=0, transactions=0, limit_orders=0, stop_orders=0, recurring_orders=0,
+            price_points=0, news=0, workers=1, defer_indexes=False):
+        """
+        Generate a full dataset
+
+        Args:
+            workers (int): Processes sharing the order and transaction inserts
+            defer_indexes (bool): Rebuild the order, transaction and price
+                history indexes once after loading instead of row by row
+
+        Returns:
+            dict: Kind -> (rows written, seconds taken)
+        """
+        if connection.vendor == 'sqlite' and workers > 1:
+            logger.info("SQLite allows one writer at a time; seeding in a single process")
+            workers = 1
+
+        report = {}
+
+        def timed(kind, func, *args):
+            started = time.perf_counter()
+            report[kind] = (func(*args), time.perf_counter() - started)
+
+        counts = {
+            'transactions': transactions,
+            'limit_orders': limit_orders,
+            'stop_orders': stop_orders,
+            'recurring_orders': recurring_orders,
+        }
+        indexed = [self.ROW_BUILDERS[kind][0] for kind, count in counts.items() if count > 0]
+        if price_points > 0:
+            indexed.append(PriceHistory)
+
+        with muted_signals():
+            self._prepare_connection()
+            self.load_currencies()
+            timed('users', self.create_users, users)
+            self.load_accounts()
+            with deferred_indexes(*indexed) if defer_indexes else nullcontext():
+                for kind, count in counts.items():
+                    timed(kind, self.load, kind, count, workers)
+                timed('price_history', self.create_price_history, price_points)
+            timed('news', self.create_news, news)
+        return report
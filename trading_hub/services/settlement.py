@@ -0,0 +1,225 @@
+import logging
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from trading_hub.models import CoinbaseUser, LimitOrder, Transaction
+from trading_hub.services import ledger, tax_ledger
+from trading_hub.services.order_book import order_books
+
+logger = logging.getLogger(__name__)
+
+
+class SettlementBatch:
+    """
+    Settles a batch of order fills in one database transaction
+
+    Fills are collected with add() during a scheduler tick and written by
+    commit() inside a single transaction.atomic() block: the wallets and
+    orders involved are locked once, a fill whose order another batch
+    settled in the meantime is dropped, each fill is checked against the
+    running balance of its source wallet, Transaction rows are inserted
+    with bulk_create, and wallet balances (through services.ledger) and
+    trader counters are moved with F() expressions. A fill that would
+    overdraw its wallet is rejected and its order is left untouched.
+
+    Buys debit the USD value from the source wallet and credit the crypto
+    amount to the destination wallet; sells debit the crypto amount and
+    credit the USD value.
+    """
+
+    def __init__(self, batch_size=500):
+        """
+        Initialize the batch
+
+        Args:
+            batch_size (int): Rows per bulk insert or update statement
+        """
+        self.batch_size = batch_size
+        self.fills = []
+        self.settled = []
+        self.rejected = []
+        # Fills dropped because their order was no longer open once locked
+        self.stale = []
+
+    def add(self, order, transaction_type, amount, native_amount, description=None):
+        """
+        Queue a fill for an order
+
+        Args:
+            order: LimitOrder, StopOrder or RecurringOrder being filled
+            transaction_type (str): 'buy' or 'sell'
+            amount (Decimal): Crypto amount of the fill
+            native_amount (Decimal): USD value of the fill
+            description (str): Description stored on the Transaction
+        """
+        self.fills.append({
+            'order': order,
+            'transaction_type': transaction_type,
+            'amount': amount,
+            'native_amount': native_amount,
+            'description': description,
+        })
+
+    def __len__(self):
+        return len(self.fills)
+
+    def _debit_and_credit(self, fill):
+        order = fill['order']
+        if fill['transaction_type'] == 'buy':
+            return (order.from_wallet_id, fill['native_amount']), (order.to_wallet_id, fill['amount'])
+        return (order.from_wallet_id, fill['amount']), (order.to_wallet_id, fill['native_amount'])
+
+    def commit(self, now=None):
+        """
+        Write every queued fill in one transaction
+
+        Args:
+            now (datetime): Execution time recorded on the orders (defaults to now)
+
+        Returns:
+            dict: Counts of settled and rejected fills
+        """
+        now = now or timezone.now()
+        fills, self.fills = self.fills, []
+        if not fills:
+            return {'settled': 0, 'rejected': 0}
+
+        with transaction.atomic():
+            fills, stale = self._claim_orders(fills)
+
+            wallet_ids = set()
+            for fill in fills:
+                wallet_ids.add(fill['order'].from_wallet_id)
+                if fill['order'].to_wallet_id:
+                    wallet_ids.add(fill['order'].to_wallet_id)
+            balances = ledger.lock_balances(wallet_ids)
+
+            deltas = defaultdict(Decimal)
+            transactions = []
+            trades = Counter()
+            settled = []
+            rejected = []
+
+            for fill in fills:
+                order = fill['order']
+                (debit_wallet, debit_amount), (credit_wallet, credit_amount) = self._debit_and_credit(fill)
+                if debit_wallet not in balances or balances[debit_wallet] < debit_amount:
+                    rejected.append(order)
+                    continue
+
+                balances[debit_wallet] -= debit_amount
+                deltas[debit_wallet] -= debit_amount
+                if credit_wallet in balances:
+                    balances[credit_wallet] += credit_amount
+                    deltas[credit_wallet] += credit_amount
+
+                transactions.append(Transaction(
+                    user_id=order.user_id,
+                    transaction_type=fill['transaction_type'],
+                    amount=fill['amount'],
+                    currency=order.cryptocurrency_id,
+                    native_amount=fill['native_amount'],
+                    native_currency='USD',
+                    status='completed',
+                    from_wallet_id=order.from_wallet_id,
+                    to_wallet_id=order.to_wallet_id,
+                    description=fill['description'],
+                ))
+                trades[order.user_id] += 1
+                order.record_fill(now)
+                settled.append(order)
+
+            if settled:
+                Transaction.objects.bulk_create(transactions, batch_size=self.batch_size)
+                # bulk_create sends no post_save, so the tax ledgers are told directly
+                pairs = {(tx.user_id, tx.currency) for tx in transactions}
+                transaction.on_commit(lambda: tax_ledger.sync_fills(pairs))
+                ledger.apply_deltas(deltas)
+                self._update_profiles(trades)
+                self._update_orders(settled)
+
+        self.settled.extend(settled)
+        self.rejected.extend(rejected)
+        self.stale.extend(stale)
+        if stale:
+            logger.info("Settlement dropped %s fills for orders settled elsewhere", len(stale))
+        if rejected:
+            logger.info("Settlement rejected %s fills for insufficient balance", len(rejected))
+        return {
+            'settled': len(settled),
+            'rejected': len(rejected),
+        }
+
+    def _claim_orders(self, fills):
+        """
+        Lock the orders being filled and keep the fills they can still take
+
+        Evaluators running at the same time can load the same open order;
+        the row locks (taken in primary key order, so two batches cannot
+        deadlock on them) make the second one wait until the first commits,
+        and it then sees the order already filled and drops its fill.
+
+        Returns:
+            tuple: (fills to settle, orders whose fills were dropped)
+        """
+        ids_by_model = defaultdict(set)
+        for fill in fills:
+            ids_by_model[type(fill['order'])].add(fill['order'].pk)
+
+        current = {}
+        for model, ids in ids_by_model.items():
+            rows = model.objects.select_for_update().filter(pk__in=ids).order_by('pk').only(
+                'pk', *model.SETTLEMENT_FIELDS
+            )
+            for row in rows:
+                current[model, row.pk] = row
+
+        claimed = []
+        stale = []
+        for fill in fills:
+            order = fill['order']
+            row = current.pop((type(order), order.pk), None)
+            if row is None or not order.can_settle(row):
+                stale.append(order)
+                continue
+            claimed.append(fill)
+        return claimed, stale
+
+    def _update_profiles(self, trades):
+        """Add the settled trades to each trader's counters and refresh their rating"""
+        # Traders with the same number of fills in this batch share one UPDATE
+        users_by_count = defaultdict(list)
+        for user_id, count in trades.items():
+            users_by_count[count].append(user_id)
+        for count, user_ids in users_by_count.items():
+            CoinbaseUser.objects.filter(user_id__in=user_ids).update(
+                total_trades=F('total_trades') + count,
+                successful_trades=F('successful_trades') + count,
+            )
+
+        profiles = list(
+            CoinbaseUser.objects.filter(user_id__in=trades.keys())
+            .only('id', 'total_trades', 'successful_trades', 'rating')
+        )
+        for profile in profiles:
+            profile.rating = CoinbaseUser.rating_for(profile.total_trades, profile.successful_trades)
+        CoinbaseUser.objects.bulk_update(profiles, ['rating'], batch_size=self.batch_size)
+
+    def _update_orders(self, orders):
+        by_model = defaultdict(list)
+        for order in orders:
+            by_model[type(order)].append(order)
+
+        for model, model_orders in by_model.items():
+            model.objects.bulk_update(model_orders, model.SETTLEMENT_FIELDS, batch_size=self.batch_size)
+
+        # bulk_update does not send post_save, so take filled limit orders off the book here
+        closed = defaultdict(list)
+        for order in by_model.get(LimitOrder, []):
+            closed[order.cryptocurrency_id].append(order.id)
+        for code, order_ids in closed.items():
+            transaction.on_commit(lambda code=code, order_ids=order_ids: order_books.remove_orders(code, order_ids))
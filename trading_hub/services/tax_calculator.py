@@ -5,9 +5,12 @@ from decimal import Decimal
 from django.utils import timezone
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Sum, Q, F
+from django.db import transaction
+from django.db.models import Count, Sum, Q, F
 
 from trading_hub.models import Transaction, TaxReport, TaxTransaction, CryptoCurrency
+from trading_hub.services.lot_matching import COST_BASIS_METHODS, match_lots, stream_fills, summarize_sales, with_progress
+from trading_hub.services.tax_ledger import TaxLedger, method_for
 
 
 class TaxCalculator:
@@ -20,360 +23,122 @@ class TaxCalculator:
         'acb': 'Average Cost Basis'
     }
 
-    def __init__(self, user, tax_year=None, cost_basis_method='fifo'):
+    def __init__(self, user, tax_year=None, cost_basis_method=None):
         """
         Initialize tax calculator for a user
         
         Args:
             user (User): User to calculate taxes for
             tax_year (int): Tax year to calculate for (defaults to current year)
-            cost_basis_method (str): Method for calculating cost basis ('fifo', 'lifo', 'hifo', 'acb')
+            cost_basis_method (str): Method for calculating cost basis ('fifo', 'lifo', 'hifo', 'acb');
+                defaults to the user's own, which is read from the tax lot ledger.
+                Any other method is calculated from the full history on the fly
         """
         self.user = user
         self.tax_year = tax_year or timezone.now().year
-        self.cost_basis_method = cost_basis_method
+        ledger_method = method_for(user)
+        self.cost_basis_method = cost_basis_method or ledger_method
+        self.uses_ledger = self.cost_basis_method == ledger_method
         
         # Date range for tax year
         self.year_start = datetime(self.tax_year, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
         self.year_end = datetime(self.tax_year, 12, 31, 23, 59, 59, tzinfo=timezone.utc)
 
-    def calculate_cost_basis(self, crypto_code):
+    def calculate_cost_basis(self, crypto_code, progress=None):
         """
         Calculate cost basis for a specific cryptocurrency
         
+        With the user's own method the precomputed realized gains are read
+        from the tax lot ledger after applying any fills it has not seen.
+        Otherwise buys and sells stream from the database oldest first in
+        one query. Either way sales in earlier years use up their lots (or
+        their share of the average cost) too, and each sale only sees what
+        was bought before it.
+        
         Args:
             crypto_code (str): Cryptocurrency code (e.g., BTC, ETH)
+            progress (callable): Called with the number of fills matched so
+                far, every PROGRESS_EVERY fills
             
         Returns:
-            dict: Dictionary with buy and sell transactions and their cost basis
+            list: One dict per sell transaction in the tax year, with its
+                cost basis, proceeds, gain/loss and holding period
         """
-        # Get all buy transactions (to establish cost basis)
-        buys = Transaction.objects.filter(
-            user=self.user,
-            transaction_type='buy',
-            currency=crypto_code,
-            status='completed'
-        ).order_by('created_at')
-        
-        # Get sell transactions for the tax year
-        sells = Transaction.objects.filter(
-            user=self.user,
-            transaction_type='sell',
-            currency=crypto_code,
-            status='completed',
-            created_at__gte=self.year_start,
-            created_at__lte=self.year_end
-        ).order_by('created_at')
-        
-        # Calculate cost basis based on the selected method
-        if self.cost_basis_method == 'fifo':
-            return self._fifo_cost_basis(buys, sells)
-        elif self.cost_basis_method == 'lifo':
-            return self._lifo_cost_basis(buys, sells)
-        elif self.cost_basis_method == 'hifo':
-            return self._hifo_cost_basis(buys, sells)
-        elif self.cost_basis_method == 'acb':
-            return self._average_cost_basis(buys, sells)
-        else:
+        if self.cost_basis_method not in COST_BASIS_METHODS:
             raise ValueError(f"Invalid cost basis method: {self.cost_basis_method}")
 
-    def _fifo_cost_basis(self, buys, sells):
-        """
-        Calculate cost basis using First In, First Out method
-        
-        Args:
-            buys (QuerySet): Buy transactions
-            sells (QuerySet): Sell transactions
-            
-        Returns:
-            dict: Dictionary with cost basis information for each sell transaction
-        """
-        remaining_buys = []
-        for buy in buys:
-            remaining_buys.append({
-                'transaction': buy,
-                'remaining': buy.amount,
-                'price_per_unit': buy.native_amount / buy.amount if buy.amount else Decimal('0')
-            })
-            
-        result = []
-        for sell in sells:
-            sell_amount = sell.amount
-            sell_proceeds = sell.native_amount
-            cost_basis = Decimal('0')
-            matched_amount = Decimal('0')
-            is_long_term = True
-            
-            # Match sell with available buy transactions (FIFO order)
-            while sell_amount > 0 and remaining_buys:
-                buy = remaining_buys[0]
-                
-                if buy['remaining'] <= 0:
-                    remaining_buys.pop(0)
-                    continue
-                
-                # Check if this is a long-term or short-term gain/loss
-                holding_period = sell.created_at - buy['transaction'].created_at
-                is_this_match_long_term = holding_period.days >= 365
-                
-                # If any part of the sell is short-term, the whole sell is short-term
-                if not is_this_match_long_term:
-                    is_long_term = False
-                
-                # Determine how much of this buy to use
-                use_amount = min(sell_amount, buy['remaining'])
-                matched_amount += use_amount
-                
-                # Calculate cost basis for this portion
-                portion_cost = use_amount * buy['price_per_unit']
-                cost_basis += portion_cost
-                
-                # Update the remaining buy amount
-                buy['remaining'] -= use_amount
-                if buy['remaining'] <= 0:
-                    remaining_buys.pop(0)
-                    
-                # Update the remaining sell amount
-                sell_amount -= use_amount
-                
-            # Calculate gains/losses
-            gain_loss = sell_proceeds - cost_basis
-            
-            # Save this information
-            result.append({
-                'transaction': sell,
-                'cost_basis': cost_basis,
-                'proceeds': sell_proceeds,
-                'gain_loss': gain_loss,
-                'is_long_term': is_long_term,
-                'matched_amount': matched_amount
-            })
-            
-        return result
-
-    def _lifo_cost_basis(self, buys, sells):
-        """Calculate cost basis using Last In, First Out method"""
-        remaining_buys = []
-        for buy in buys.order_by('-created_at'):  # Note the reverse order
-            remaining_buys.append({
-                'transaction': buy,
-                'remaining': buy.amount,
-                'price_per_unit': buy.native_amount / buy.amount if buy.amount else Decimal('0')
-            })
-            
-        result = []
-        for sell in sells:
-            sell_amount = sell.amount
-            sell_proceeds = sell.native_amount
-            cost_basis = Decimal('0')
-            matched_amount = Decimal('0')
-            is_long_term = True
-            
-            # Match sell with available buy transactions (LIFO order)
-            while sell_amount > 0 and remaining_buys:
-                buy = remaining_buys[0]
-                
-                if buy['remaining'] <= 0:
-                    remaining_buys.pop(0)
-                    continue
-                
-                # Check if long-term
-                holding_period = sell.created_at - buy['transaction'].created_at
-                is_this_match_long_term = holding_period.days >= 365
-                
-                if not is_this_match_long_term:
-                    is_long_term = False
-                
-                # Determine how much of this buy to use
-                use_amount = min(sell_amount, buy['remaining'])
-                matched_amount += use_amount
-                
-                # Calculate cost basis for this portion
-                portion_cost = use_amount * buy['price_per_unit']
-                cost_basis += portion_cost
-                
-                # Update the remaining amounts
-                buy['remaining'] -= use_amount
-                if buy['remaining'] <= 0:
-                    remaining_buys.pop(0)
-                    
-                sell_amount -= use_amount
-                
-            # Calculate gains/losses
-            gain_loss = sell_proceeds - cost_basis
-            
-            result.append({
-                'transaction': sell,
-                'cost_basis': cost_basis,
-                'proceeds': sell_proceeds,
-                'gain_loss': gain_loss,
-                'is_long_term': is_long_term,
-                'matched_amount': matched_amount
-            })
-            
-        return result
-
-    def _hifo_cost_basis(self, buys, sells):
-        """Calculate cost basis using Highest In, First Out method"""
-        # Convert buys to list for sorting
-        all_buys = []
-        for buy in buys:
-            price_per_unit = buy.native_amount / buy.amount if buy.amount else Decimal('0')
-            all_buys.append({
-                'transaction': buy,
-                'remaining': buy.amount,
-                'price_per_unit': price_per_unit,
-                'created_at': buy.created_at
-            })
-            
-        # Sort buys by price (highest first), then by date (oldest first for ties)
-        remaining_buys = sorted(all_buys, key=lambda x: (-x['price_per_unit'], x['created_at']))
+        if self.uses_ledger:
+            ledger = TaxLedger(self.user, crypto_code)
+            ledger.sync(self.cost_basis_method, progress)
+            sales = ledger.sales(self.year_start, self.year_end)
+        else:
+            fills = with_progress(stream_fills(self.user, crypto_code, until=self.year_end), progress)
+            sales = list(summarize_sales(
+                match_lots(fills, self.cost_basis_method), self.year_start, self.year_end
+            ))
+        sells = Transaction.objects.in_bulk([sale['sell_id'] for sale in sales])
         
         result = []
-        for sell in sells:
-            sell_amount = sell.amount
-            sell_proceeds = sell.native_amount
-            cost_basis = Decimal('0')
-            matched_amount = Decimal('0')
-            is_long_term = True
-            
-            # Match sell with available buy transactions (HIFO order)
-            while sell_amount > 0 and remaining_buys:
-                # Re-sort remaining buys each time to ensure highest price first
-                remaining_buys.sort(key=lambda x: (-x['price_per_unit'], x['created_at']))
-                buy = remaining_buys[0]
-                
-                if buy['remaining'] <= 0:
-                    remaining_buys.pop(0)
-                    continue
-                
-                # Check if long-term
-                holding_period = sell.created_at - buy['transaction'].created_at
-                is_this_match_long_term = holding_period.days >= 365
-                
-                if not is_this_match_long_term:
-                    is_long_term = False
-                
-                # Determine how much of this buy to use
-                use_amount = min(sell_amount, buy['remaining'])
-                matched_amount += use_amount
-                
-                # Calculate cost basis for this portion
-                portion_cost = use_amount * buy['price_per_unit']
-                cost_basis += portion_cost
-                
-                # Update the remaining amounts
-                buy['remaining'] -= use_amount
-                if buy['remaining'] <= 0:
-                    remaining_buys.remove(buy)
-                    
-                sell_amount -= use_amount
-                
-            # Calculate gains/losses
-            gain_loss = sell_proceeds - cost_basis
-            
-            result.append({
-                'transaction': sell,
-                'cost_basis': cost_basis,
-                'proceeds': sell_proceeds,
-                'gain_loss': gain_loss,
-                'is_long_term': is_long_term,
-                'matched_amount': matched_amount
-            })
-            
-        return result
-
-    def _average_cost_basis(self, buys, sells):
-        """Calculate cost basis using Average Cost Basis method"""
-        # Calculate total bought and cost before each sell
-        result = []
-        
-        for sell in sells:
-            # Consider only buys before this sell
-            prior_buys = buys.filter(created_at__lt=sell.created_at)
-            
-            total_amount = prior_buys.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            total_cost = prior_buys.aggregate(total=Sum('native_amount'))['total'] or Decimal('0')
-            
-            if total_amount > 0:
-                avg_cost_per_unit = total_cost / total_amount
-                cost_basis = sell.amount * avg_cost_per_unit
-                gain_loss = sell.native_amount - cost_basis
-                
-                # For ACB, we need to determine if the sale is long-term
-                # Simplification: check if the average purchase date is more than a year ago
-                weighted_dates = [
-                    (buy.amount / total_amount) * (sell.created_at - buy.created_at).days 
-                    for buy in prior_buys
-                ]
-                avg_holding_period = sum(weighted_dates) if weighted_dates else 0
-                is_long_term = avg_holding_period >= 365
-                
-                result.append({
-                    'transaction': sell,
-                    'cost_basis': cost_basis,
-                    'proceeds': sell.native_amount,
-                    'gain_loss': gain_loss,
-                    'is_long_term': is_long_term,
-                    'matched_amount': sell.amount
-                })
-            else:
-                # No prior buys, this might be a coin received from elsewhere
-                result.append({
-                    'transaction': sell,
-                    'cost_basis': Decimal('0'),
-                    'proceeds': sell.native_amount,
-                    'gain_loss': sell.native_amount,  # All proceeds are gains
-                    'is_long_term': False,  # Assume short-term
-                    'matched_amount': sell.amount
-                })
-            
+        for sale in sales:
+            sale['transaction'] = sells[sale.pop('sell_id')]
+            result.append(sale)
         return result
 
-    def generate_tax_report(self, report_format='csv', include_unrealized=False):
+    def generate_tax_report(self, report_format='csv', include_unrealized=False, tax_report=None, progress=None):
         """
         Generate a tax report for the specified year
         
         Args:
             report_format (str): Format of the report ('csv', 'pdf', etc.)
             include_unrealized (bool): Whether to include unrealized gains
+            tax_report (TaxReport): Existing record to fill in, as queued by
+                services.tax_reports; a new one is created when omitted
+            progress (callable): Called with the percentage done (0-100)
+                as fills are matched, against the count of the user's
+                fills, and once the transactions are saved
             
         Returns:
             TaxReport: The generated tax report object
         """
+        progress = progress or (lambda percent: None)
+        
         # Create a tax report record
-        tax_report = TaxReport.objects.create(
-            user=self.user,
-            tax_year=self.tax_year,
-            report_format=report_format,
-            include_unrealized_gains=include_unrealized
-        )
+        if tax_report is None:
+            tax_report = TaxReport.objects.create(
+                user=self.user,
+                tax_year=self.tax_year,
+                report_format=report_format,
+                include_unrealized_gains=include_unrealized,
+                cost_basis_method=self.cost_basis_method
+            )
         
         # Get unique cryptocurrencies the user has transacted with
-        crypto_codes = Transaction.objects.filter(
+        crypto_codes = list(Transaction.objects.filter(
             user=self.user
-        ).values_list('currency', flat=True).distinct()
+        ).values_list('currency', flat=True).distinct())
+        
+        # Matching fills is the bulk of the work, so it is measured in fills
+        fill_counts = dict(Transaction.objects.filter(
+            user=self.user,
+            transaction_type__in=('buy', 'sell'),
+            status='completed',
+        ).values_list('currency').annotate(fills=Count('id')).order_by())
+        total_fills = sum(fill_counts.values()) or 1
+        matched = 0
         
         all_transactions = []
         
-        # Calculate cost basis for each cryptocurrency
+        # Calculate cost basis for each cryptocurrency (up to 80%)
         for crypto_code in crypto_codes:
-            transactions = self.calculate_cost_basis(crypto_code)
-            all_transactions.extend(transactions)
-            
-            # Save tax transaction data
-            for tx_data in transactions:
-                tx = tx_data['transaction']
-                TaxTransaction.objects.update_or_create(
-                    transaction=tx,
-                    defaults={
-                        'cost_basis': tx_data['cost_basis'],
-                        'gain_loss': tx_data['gain_loss'],
-                        'is_long_term': tx_data['is_long_term'],
-                        'tax_year': self.tax_year,
-                        'tax_category': 'capital_gain'  # Default category
-                    }
-                )
+            all_transactions.extend(self.calculate_cost_basis(
+                crypto_code, lambda count: progress(int(80 * (matched + count) / total_fills))
+            ))
+            matched += fill_counts.get(crypto_code, 0)
+            progress(int(80 * matched / total_fills))
+        
+        # Save tax transaction data
+        self._save_tax_transactions(all_transactions)
+        progress(90)
         
         # If requested, include unrealized gains
         if include_unrealized:
@@ -386,11 +151,43 @@ class TaxCalculator:
         # Update the tax report record
         tax_report.report_file = file_path
         tax_report.status = 'completed'
+        tax_report.progress = 100
         tax_report.completed_at = timezone.now()
         tax_report.save()
         
         return tax_report
 
+    def _save_tax_transactions(self, transactions):
+        """
+        Upsert the TaxTransaction row of every sale in the report
+        
+        Rows are written TAX_TRANSACTION_BATCH_SIZE at a time as INSERT ...
+        ON CONFLICT (transaction) DO UPDATE, all in one database transaction,
+        so regenerating a report overwrites the earlier rows in place.
+        
+        Args:
+            transactions (list): Results of calculate_cost_basis()
+        """
+        rows = [
+            TaxTransaction(
+                transaction=tx_data['transaction'],
+                cost_basis=tx_data['cost_basis'],
+                gain_loss=tx_data['gain_loss'],
+                is_long_term=tx_data['is_long_term'],
+                tax_year=self.tax_year,
+                tax_category='capital_gain'  # Default category
+            )
+            for tx_data in transactions
+        ]
+        with transaction.atomic():
+            TaxTransaction.objects.bulk_create(
+                rows,
+                batch_size=getattr(settings, 'TAX_TRANSACTION_BATCH_SIZE', 1000),
+                update_conflicts=True,
+                unique_fields=['transaction'],
+                update_fields=['cost_basis', 'gain_loss', 'is_long_term', 'tax_year', 'tax_category'],
+            )
+
     def _create_report_file(self, transactions, tax_report):
         """
         Create a report file based on the specified format
@@ -527,6 +324,22 @@ class TaxCalculator:
             # Current market value
             current_value = wallet.balance * crypto.current_price_usd
             
+            if self.uses_ledger:
+                # Cost of the units the ledger still holds, under the user's method
+                ledger = TaxLedger(self.user, wallet.currency_code)
+                ledger.sync(self.cost_basis_method)
+                held, held_cost = ledger.open_position()
+                if held > 0:
+                    cost_basis = wallet.balance * held_cost / held
+                    results[wallet.currency_code] = {
+                        'current_value': current_value,
+                        'cost_basis': cost_basis,
+                        'unrealized_gain': current_value - cost_basis,
+                        'balance': wallet.balance,
+                        'price_per_unit': crypto.current_price_usd
+                    }
+                continue
+            
             # Calculate cost basis using the chosen method
             buys = Transaction.objects.filter(
                 user=self.user,
@@ -569,23 +382,37 @@ class TaxCalculator:
         Returns:
             dict: Summary information about gains and losses
         """
-        # Query all tax transactions for this user and tax year
-        tax_txs = TaxTransaction.objects.filter(
-            transaction__user=self.user,
-            tax_year=self.tax_year
-        )
-        
-        # Calculate totals
-        short_term_gains = tax_txs.filter(is_long_term=False).aggregate(
-            total=Sum('gain_loss')
-        )['total'] or Decimal('0')
-        
-        long_term_gains = tax_txs.filter(is_long_term=True).aggregate(
-            total=Sum('gain_loss')
-        )['total'] or Decimal('0')
-        
-        # Count transactions
-        total_transactions = tax_txs.count()
+        if self.uses_ledger:
+            # Realized gains straight from the tax lot ledger
+            sales = []
+            currencies = Transaction.objects.filter(
+                user=self.user, transaction_type__in=('buy', 'sell'), status='completed'
+            ).values_list('currency', flat=True).distinct()
+            for crypto_code in currencies:
+                ledger = TaxLedger(self.user, crypto_code)
+                ledger.sync(self.cost_basis_method)
+                sales.extend(ledger.sales(self.year_start, self.year_end))
+            short_term_gains = sum((sale['gain_loss'] for sale in sales if not sale['is_long_term']), Decimal('0'))
+            long_term_gains = sum((sale['gain_loss'] for sale in sales if sale['is_long_term']), Decimal('0'))
+            total_transactions = len(sales)
+        else:
+            # Query all tax transactions for this user and tax year
+            tax_txs = TaxTransaction.objects.filter(
+                transaction__user=self.user,
+                tax_year=self.tax_year
+            )
+            
+            # Calculate totals
+            short_term_gains = tax_txs.filter(is_long_term=False).aggregate(
+                total=Sum('gain_loss')
+            )['total'] or Decimal('0')
+            
+            long_term_gains = tax_txs.filter(is_long_term=True).aggregate(
+                total=Sum('gain_loss')
+            )['total'] or Decimal('0')
+            
+            # Count transactions
+            total_transactions = tax_txs.count()
         
         # Get unrealized gains
         unrealized_gains = self.calculate_unrealized_gains()
@@ -0,0 +1,382 @@
+import logging
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from trading_hub.models import CoinbaseUser, RealizedGain, TaxLedgerCheckpoint, TaxLot, Transaction
+from trading_hub.services.lot_matching import (
+    AverageCostPool, LotMatcher, match_lots, matcher_for, stream_fills, with_progress
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows written per INSERT while a ledger is rebuilt
+BATCH_SIZE = 2000
+
+# Open lots read per query while a sale consumes them
+LOT_FETCH_SIZE = 100
+
+# How long after it is saved a fill may still be committing. A fill that
+# commits later than this, dated before the checkpoint, goes unnoticed
+# until the ledger is next rebuilt
+LATE_COMMIT_WINDOW = timedelta(minutes=10)
+
+# Dotted path django-q workers import to bring ledgers up to date
+SYNC_TASK = 'trading_hub.services.tax_ledger.sync_ledgers'
+
+LOT_ORDERING = {
+    'fifo': ('acquired_at', 'transaction_id'),
+    'lifo': ('-acquired_at', '-transaction_id'),
+    'hifo': ('-unit_cost', 'acquired_at', 'transaction_id'),
+}
+
+
+def method_for(user):
+    """The cost basis method a user's ledger is kept under"""
+    method = CoinbaseUser.objects.filter(user_id=getattr(user, 'pk', user)).values_list('cost_basis_method', flat=True).first()
+    return method or 'fifo'
+
+
+class OpenLotQueue:
+    """
+    The open TaxLot rows of one currency, in the order a method disposes of them
+
+    Stands in for the in-memory LotQueue so LotMatcher can consume lots
+    straight from the database: only the lots a sale actually reaches are
+    read, a few at a time. New lots are inserted at once; changed
+    remainders are written back in one bulk update by flush().
+    """
+
+    def __init__(self, user_id, currency, method):
+        self.user_id = user_id
+        self.currency = currency
+        self.method = method
+        self._chunk = []
+        self._changed = {}
+
+    def _open_lots(self):
+        return TaxLot.objects.filter(
+            user_id=self.user_id, currency=self.currency, remaining__gt=0
+        ).order_by(*LOT_ORDERING[self.method])
+
+    def __bool__(self):
+        return self.peek() is not None
+
+    def add(self, lot):
+        self.flush()
+        TaxLot.objects.create(
+            user_id=self.user_id,
+            currency=self.currency,
+            transaction_id=lot.transaction_id,
+            acquired_at=lot.acquired_at,
+            amount=lot.amount,
+            cost=lot.cost,
+            remaining=lot.remaining,
+            unit_cost=lot.price_per_unit,
+        )
+
+    def peek(self):
+        if not self._chunk:
+            self.flush()
+            self._chunk = list(self._open_lots()[:LOT_FETCH_SIZE])
+        if not self._chunk:
+            return None
+        lot = self._chunk[0]
+        self._changed[lot.pk] = lot
+        return lot
+
+    def pop(self):
+        self._chunk.pop(0)
+
+    def flush(self):
+        """Write back the remainders sales changed; emptied lots are deleted"""
+        if not self._changed:
+            return
+        changed, self._changed = list(self._changed.values()), {}
+        TaxLot.objects.filter(pk__in=[lot.pk for lot in changed if lot.remaining <= 0]).delete()
+        TaxLot.objects.bulk_update([lot for lot in changed if lot.remaining > 0], ['remaining'])
+        # The chunk may hold lots a newer buy should now come before
+        self._chunk = []
+
+
+class TaxLedger:
+    """
+    Persistent tax lots and realized gains for one user and currency
+
+    sync() applies the completed buys and sells settled since the
+    checkpoint: buys become TaxLot rows (or join the average cost pool on
+    the checkpoint for 'acb'), and sells consume lots in the user's method
+    order, each match stored as a RealizedGain. Reports then read those
+    rows instead of replaying the whole history.
+
+    The ledger is rebuilt from scratch, with the in-memory lot matcher,
+    when the user's method differs from the checkpoint's, or when fills
+    appeared or changed before the checkpoint. None of the checks reads
+    further back than LATE_COMMIT_WINDOW: a fill saved since the last sync
+    (a pending fill completed, an edit) shows in updated_at; a late commit
+    dated before fills already applied raises the count of fills within
+    the window of the checkpoint, read in the same query as the new
+    fills; a deletion clears synced_at through the post_delete signal.
+    """
+
+    def __init__(self, user, currency):
+        self.user_id = getattr(user, 'pk', user)
+        self.currency = currency
+
+    def _fills(self):
+        return Transaction.objects.filter(
+            user_id=self.user_id,
+            currency=self.currency,
+            transaction_type__in=('buy', 'sell'),
+            status='completed',
+        )
+
+    @staticmethod
+    def _up_to(checkpoint):
+        return Q(created_at__lt=checkpoint.last_created_at) | Q(
+            created_at=checkpoint.last_created_at, id__lte=checkpoint.last_transaction_id
+        )
+
+    def _unchanged(self, checkpoint):
+        """Whether no fill up to the checkpoint was saved since the last sync"""
+        if checkpoint.last_created_at is None or checkpoint.synced_at is None:
+            # Never synced: the in-memory rebuild is the fast way through a long history
+            return False
+        return not Transaction.objects.filter(
+            user_id=self.user_id,
+            currency=self.currency,
+            transaction_type__in=('buy', 'sell'),
+            updated_at__gte=checkpoint.synced_at,
+        ).filter(self._up_to(checkpoint)).exists()
+
+    @staticmethod
+    def _tail_count(fills, last_fill):
+        return sum(1 for fill in fills if fill[2] >= last_fill[2] - LATE_COMMIT_WINDOW)
+
+    def sync(self, method=None, progress=None):
+        """
+        Bring the ledger up to date with the user's settled fills
+
+        Args:
+            method (str): Cost basis method; the user's own when omitted
+            progress (callable): Called with the number of fills matched so
+                far, every PROGRESS_EVERY fills
+
+        Returns:
+            TaxLedgerCheckpoint: The updated checkpoint
+        """
+        method = method or method_for(self.user_id)
+        with transaction.atomic():
+            TaxLedgerCheckpoint.objects.get_or_create(user_id=self.user_id, currency=self.currency)
+            # Serializes syncs of the same ledger from different workers
+            checkpoint = TaxLedgerCheckpoint.objects.select_for_update().get(
+                user_id=self.user_id, currency=self.currency
+            )
+            if checkpoint.method != method or not self._unchanged(checkpoint):
+                return self._rebuild(checkpoint, method, progress)
+
+            # Taken before the read, so any fill saved after it is newer
+            started = timezone.now()
+            window = list(self._fills().filter(
+                created_at__gte=checkpoint.last_created_at - LATE_COMMIT_WINDOW
+            ).order_by('created_at', 'id').values_list(
+                'id', 'transaction_type', 'created_at', 'amount', 'native_amount'
+            ))
+            # The fills already applied come first, up to the checkpoint's own
+            applied = next(
+                (index + 1 for index, fill in enumerate(window) if fill[0] == checkpoint.last_transaction_id), None
+            )
+            if applied != checkpoint.tail_count:
+                return self._rebuild(checkpoint, method, progress)
+            fills = window[applied:]
+            if not fills:
+                return checkpoint
+
+            if method == 'acb':
+                matcher = self._pool(checkpoint)
+            else:
+                lots = OpenLotQueue(self.user_id, self.currency, method)
+                matcher = LotMatcher(method, lots=lots)
+            self._save_gains(match_lots(with_progress(fills, progress), method, matcher))
+            if method != 'acb':
+                lots.flush()
+            return self._advance(
+                checkpoint, method, fills[-1], len(fills), self._tail_count(window, fills[-1]), started, matcher
+            )
+
+    def _rebuild(self, checkpoint, method, progress=None):
+        logger.info(
+            "Rebuilding %s tax ledger for user %s under %s", self.currency, self.user_id, method
+        )
+        TaxLot.objects.filter(user_id=self.user_id, currency=self.currency).delete()
+        RealizedGain.objects.filter(user_id=self.user_id, currency=self.currency).delete()
+
+        started = timezone.now()
+        last, count, tail = None, 0, deque()
+
+        def counted(fills):
+            nonlocal last, count
+            for fill in fills:
+                last, count = fill, count + 1
+                tail.append(fill[2])
+                while tail[0] < fill[2] - LATE_COMMIT_WINDOW:
+                    tail.popleft()
+                yield fill
+
+        matcher = matcher_for(method)
+        fills = with_progress(stream_fills(self.user_id, self.currency), progress)
+        self._save_gains(match_lots(counted(fills), method, matcher))
+        if method != 'acb':
+            TaxLot.objects.bulk_create([
+                TaxLot(
+                    user_id=self.user_id,
+                    currency=self.currency,
+                    transaction_id=lot.transaction_id,
+                    acquired_at=lot.acquired_at,
+                    amount=lot.amount,
+                    cost=lot.cost,
+                    remaining=lot.remaining,
+                    unit_cost=lot.price_per_unit,
+                )
+                for lot in matcher.lots
+            ], batch_size=BATCH_SIZE)
+
+        checkpoint.quantity = checkpoint.cost = Decimal('0')
+        checkpoint.weighted_time = 0
+        checkpoint.last_created_at = checkpoint.last_transaction_id = None
+        checkpoint.fill_count = checkpoint.tail_count = 0
+        return self._advance(checkpoint, method, last, count, len(tail), started, matcher)
+
+    def _pool(self, checkpoint):
+        pool = AverageCostPool()
+        pool.quantity = checkpoint.quantity
+        pool.cost = checkpoint.cost
+        pool._weighted_time = checkpoint.weighted_time
+        return pool
+
+    def _save_gains(self, matches):
+        batch = []
+        for match in matches:
+            batch.append(RealizedGain(
+                user_id=self.user_id,
+                currency=self.currency,
+                sell_transaction_id=match['sell_id'],
+                buy_transaction_id=match['buy_id'],
+                acquired_at=match['acquired_at'],
+                disposed_at=match['disposed_at'],
+                amount=match['amount'],
+                cost_basis=match['cost_basis'],
+                proceeds=match['proceeds'],
+                is_long_term=match['is_long_term'],
+            ))
+            if len(batch) >= BATCH_SIZE:
+                RealizedGain.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            RealizedGain.objects.bulk_create(batch)
+
+    def _advance(self, checkpoint, method, last_fill, count, tail_count, started, matcher):
+        checkpoint.method = method
+        checkpoint.synced_at = started
+        if last_fill is not None:
+            checkpoint.last_transaction_id = last_fill[0]
+            checkpoint.last_created_at = last_fill[2]
+            checkpoint.fill_count += count
+            checkpoint.tail_count = tail_count
+        if isinstance(matcher, AverageCostPool):
+            checkpoint.quantity = matcher.quantity
+            checkpoint.cost = matcher.cost
+            checkpoint.weighted_time = matcher._weighted_time
+        checkpoint.save()
+        return checkpoint
+
+    def sales(self, start, end):
+        """
+        Realized gains per sale disposed of between start and end
+
+        Returns:
+            list: Dicts with sell_id, cost_basis, proceeds, gain_loss,
+                is_long_term and matched_amount, oldest sale first
+        """
+        rows = RealizedGain.objects.filter(
+            user_id=self.user_id, currency=self.currency, disposed_at__gte=start, disposed_at__lte=end
+        ).values('sell_transaction_id', 'disposed_at').annotate(
+            cost_basis=Sum('cost_basis'),
+            proceeds=Sum('proceeds'),
+            short_term=Count('id', filter=Q(is_long_term=False)),
+            matched_amount=Sum('amount', filter=Q(acquired_at__isnull=False)),
+        ).order_by('disposed_at', 'sell_transaction_id')
+        return [{
+            'sell_id': row['sell_transaction_id'],
+            'cost_basis': row['cost_basis'],
+            'proceeds': row['proceeds'],
+            'gain_loss': row['proceeds'] - row['cost_basis'],
+            'is_long_term': not row['short_term'],
+            'matched_amount': row['matched_amount'] or Decimal('0'),
+        } for row in rows]
+
+    def open_position(self):
+        """
+        Units still held and their cost basis
+
+        Returns:
+            tuple: (quantity, cost)
+        """
+        checkpoint = TaxLedgerCheckpoint.objects.filter(user_id=self.user_id, currency=self.currency).first()
+        if checkpoint is not None and checkpoint.method == 'acb':
+            return checkpoint.quantity, checkpoint.cost
+        totals = TaxLot.objects.filter(user_id=self.user_id, currency=self.currency, remaining__gt=0).aggregate(
+            quantity=Sum('remaining'),
+            cost=Sum(ExpressionWrapper(
+                F('remaining') * F('cost') / F('amount'),
+                output_field=DecimalField(max_digits=30, decimal_places=10),
+            )),
+        )
+        return totals['quantity'] or Decimal('0'), totals['cost'] or Decimal('0')
+
+
+def sync_fills(pairs):
+    """
+    Queue an update of the ledgers newly settled fills touch
+
+    Called after the settling transaction commits. The sync runs on a
+    django-q worker, or inline when TAX_LEDGER_ASYNC is off or the cluster
+    cannot be reached, so trading does not wait on it.
+
+    Args:
+        pairs (iterable): (user_id, currency) tuples
+    """
+    pairs = sorted(set(pairs))
+    if not getattr(settings, 'TAX_LEDGER_ASYNC', True):
+        return sync_ledgers(pairs)
+
+    try:
+        from django_q.tasks import async_task
+    except ImportError:
+        return sync_ledgers(pairs)
+
+    try:
+        return async_task(SYNC_TASK, pairs, group='tax_ledger')
+    except Exception:
+        # Broker unavailable: sync now rather than leave it to the next report
+        logger.warning("Could not enqueue tax ledger sync, syncing inline", exc_info=True)
+        return sync_ledgers(pairs)
+
+
+def sync_ledgers(pairs):
+    """
+    Bring each ledger up to date; a failure is logged and left for the next read to catch up on
+
+    Args:
+        pairs (iterable): (user_id, currency) tuples
+    """
+    for user_id, currency in pairs:
+        try:
+            TaxLedger(user_id, currency).sync()
+        except Exception:
+            logger.exception("Could not update the %s tax ledger of user %s", currency, user_id)
@@ -0,0 +1,116 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from trading_hub.models import TaxReport
+
+logger = logging.getLogger(__name__)
+
+# Dotted path django-q workers import to build a report
+REPORT_TASK = 'trading_hub.services.tax_reports.build_tax_report'
+
+# Smallest change in percentage worth writing to the report row
+PROGRESS_STEP = 5
+
+
+def enqueue_tax_report(user, tax_year, cost_basis_method, report_format='csv', include_unrealized=False):
+    """
+    Queue a tax report for background generation
+
+    The pending TaxReport row is created at once, so the caller can show it
+    and poll its progress; the work is handed to a django-q worker once
+    the row commits.
+
+    Args:
+        user (User): Owner of the report
+        tax_year (int): Tax year to report on
+        cost_basis_method (str): One of the TaxCalculator methods
+        report_format (str): Format of the report file
+        include_unrealized (bool): Whether to include unrealized gains
+
+    Returns:
+        TaxReport: The pending report
+    """
+    tax_report = TaxReport.objects.create(
+        user=user,
+        tax_year=tax_year,
+        report_format=report_format,
+        include_unrealized_gains=include_unrealized,
+        cost_basis_method=cost_basis_method,
+        status='pending',
+    )
+    transaction.on_commit(lambda: dispatch_tax_report(tax_report.pk))
+    return tax_report
+
+
+def dispatch_tax_report(report_id):
+    """Enqueue a report on the django-q cluster, or build it inline when that is not possible"""
+    if not getattr(settings, 'TAX_REPORTS_ASYNC', True):
+        return build_tax_report(report_id)
+
+    try:
+        from django_q.tasks import async_task
+    except ImportError:
+        return build_tax_report(report_id)
+
+    try:
+        return async_task(REPORT_TASK, str(report_id), group='tax_reports')
+    except Exception:
+        # Broker unavailable: build now rather than leave the report pending
+        logger.warning("Could not enqueue tax report %s, building inline", report_id, exc_info=True)
+        return build_tax_report(report_id)
+
+
+class ReportProgress:
+    """
+    Writes a report's percentage done to its row as the build advances
+
+    Only steps of PROGRESS_STEP or more are written, each as a single
+    UPDATE of the progress column, so polling sees movement without the
+    build paying a query per saved transaction.
+    """
+
+    def __init__(self, report_id):
+        self.report_id = report_id
+        self.written = 0
+
+    def __call__(self, percent):
+        percent = min(int(percent), 99)
+        if percent - self.written >= PROGRESS_STEP:
+            TaxReport.objects.filter(pk=self.report_id).update(progress=percent)
+            self.written = percent
+
+
+def build_tax_report(report_id):
+    """
+    Generate a queued tax report
+
+    Args:
+        report_id (str or UUID): Primary key of a pending TaxReport
+
+    Returns:
+        TaxReport: The report, completed or failed with its error message
+    """
+    from trading_hub.services.tax_calculator import TaxCalculator
+
+    tax_report = TaxReport.objects.select_related('user').get(pk=report_id)
+    if tax_report.status != 'pending':
+        # Already picked up, e.g. a retried task
+        return tax_report
+
+    tax_report.status = 'processing'
+    tax_report.save(update_fields=['status'])
+    try:
+        calculator = TaxCalculator(tax_report.user, tax_report.tax_year, tax_report.cost_basis_method)
+        return calculator.generate_tax_report(
+            report_format=tax_report.report_format,
+            include_unrealized=tax_report.include_unrealized_gains,
+            tax_report=tax_report,
+            progress=ReportProgress(tax_report.pk),
+        )
+    except Exception as e:
+        logger.exception("Could not generate tax report %s", report_id)
+        TaxReport.objects.filter(pk=report_id).update(status='failed', error_message=str(e))
+        tax_report.refresh_from_db()
+        return tax_report
@@ -0,0 +1,291 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Prices are stored as int64 fixed point with eight decimal places
+PRICE_SCALE = 10 ** 8
+
+# Every INDEX_STRIDE-th timestamp is copied into the sparse index
+INDEX_STRIDE = 4096
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+TIMESTAMPS_FILE = 'timestamps.i64'
+PRICES_FILE = 'prices.i64'
+INDEX_FILE = 'index.i64'
+
+
+def to_micros(timestamp):
+    """Aware datetime -> int64 microseconds since the epoch"""
+    delta = timestamp - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds
+
+
+def from_micros(micros):
+    """int64 microseconds since the epoch -> aware datetime"""
+    return EPOCH + timedelta(microseconds=int(micros))
+
+
+def to_fixed(price):
+    """Decimal price -> int64 fixed point"""
+    return int((Decimal(price) * PRICE_SCALE).to_integral_value())
+
+
+def from_fixed(value):
+    """int64 fixed point -> Decimal price"""
+    return Decimal(int(value)).scaleb(-8)
+
+
+class TickSeries:
+    """
+    Append-only tick columns for one currency
+
+    Timestamps and prices live in two flat int64 files that are read through
+    numpy memory maps, so range queries return views onto the page cache
+    rather than copies. A sparse index holding every INDEX_STRIDE-th
+    timestamp narrows each lookup to one stride before the final binary
+    search. Appends must not go back in time and should come from a single
+    writer process; readers pick new rows up on their next query.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the series
+
+        Args:
+            path (str): Directory holding the column files (created on the first append)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._maps = None
+        self._mapped_rows = -1
+        self._repair()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _rows_in(self, name):
+        try:
+            return os.path.getsize(self._file(name)) // 8
+        except FileNotFoundError:
+            return 0
+
+    def _repair(self):
+        """Trim columns left uneven by an interrupted append"""
+        rows = min(self._rows_in(TIMESTAMPS_FILE), self._rows_in(PRICES_FILE))
+        for name in (TIMESTAMPS_FILE, PRICES_FILE):
+            if self._rows_in(name) != rows:
+                logger.warning("Trimming %s in %s to %s rows", name, self.path, rows)
+                with open(self._file(name), 'r+b') as column:
+                    column.truncate(rows * 8)
+        expected = (rows + INDEX_STRIDE - 1) // INDEX_STRIDE
+        if self._rows_in(INDEX_FILE) != expected:
+            self._rebuild_index(rows)
+
+    def _rebuild_index(self, rows):
+        timestamps = self._map(TIMESTAMPS_FILE, rows)
+        with open(self._file(INDEX_FILE), 'wb') as index:
+            index.write(np.ascontiguousarray(timestamps[::INDEX_STRIDE]).tobytes())
+
+    @staticmethod
+    def _empty():
+        return np.empty(0, dtype=np.int64)
+
+    def _map(self, name, rows):
+        if not rows:
+            return self._empty()
+        return np.memmap(self._file(name), dtype=np.int64, mode='r', shape=(rows,))
+
+    def _columns(self):
+        """Current (timestamps, prices, index) maps, remapped when the files grew"""
+        rows = self._rows_in(TIMESTAMPS_FILE)
+        if rows != self._mapped_rows:
+            rows = min(rows, self._rows_in(PRICES_FILE))
+            self._maps = (
+                self._map(TIMESTAMPS_FILE, rows),
+                self._map(PRICES_FILE, rows),
+                self._map(INDEX_FILE, min(self._rows_in(INDEX_FILE), (rows + INDEX_STRIDE - 1) // INDEX_STRIDE)),
+            )
+            self._mapped_rows = rows
+        return self._maps
+
+    def __len__(self):
+        return len(self._columns()[0])
+
+    @property
+    def last_timestamp(self):
+        """Microsecond timestamp of the newest tick, or None when empty"""
+        timestamps = self._columns()[0]
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def append(self, timestamps, prices):
+        """
+        Append ticks in time order
+
+        Args:
+            timestamps: int64 microseconds since the epoch, non-decreasing
+            prices: int64 fixed-point prices (see to_fixed)
+
+        Returns:
+            int: Rows appended
+
+        Raises:
+            ValueError: If the columns differ in length or the ticks go back in time
+        """
+        timestamps = np.ascontiguousarray(timestamps, dtype=np.int64)
+        prices = np.ascontiguousarray(prices, dtype=np.int64)
+        if len(timestamps) != len(prices):
+            raise ValueError("timestamps and prices must be the same length")
+        if not len(timestamps):
+            return 0
+
+        with self._lock:
+            last = self.last_timestamp
+            if np.any(timestamps[1:] < timestamps[:-1]) or (last is not None and timestamps[0] < last):
+                raise ValueError("ticks must be appended in time order")
+
+            os.makedirs(self.path, exist_ok=True)
+            start = len(self)
+            # Prices first: a crash between the writes leaves a price without a timestamp, which _repair trims
+            with open(self._file(PRICES_FILE), 'ab') as column:
+                column.write(prices.tobytes())
+            with open(self._file(TIMESTAMPS_FILE), 'ab') as column:
+                column.write(timestamps.tobytes())
+
+            first_indexed = -start % INDEX_STRIDE
+            if first_indexed < len(timestamps):
+                with open(self._file(INDEX_FILE), 'ab') as index:
+                    index.write(timestamps[first_indexed::INDEX_STRIDE].tobytes())
+        return len(timestamps)
+
+    def append_ticks(self, ticks):
+        """
+        Append (datetime, Decimal price) pairs
+
+        Returns:
+            int: Rows appended
+        """
+        ticks = list(ticks)
+        return self.append(
+            [to_micros(timestamp) for timestamp, _ in ticks],
+            [to_fixed(price) for _, price in ticks],
+        )
+
+    def _position(self, micros):
+        """Row of the first tick at or after micros"""
+        timestamps, _, index = self._columns()
+        # index[k] is timestamps[k * INDEX_STRIDE], so the answer lies in one stride
+        block = int(np.searchsorted(index, micros, side='left'))
+        low = max(block - 1, 0) * INDEX_STRIDE
+        high = min(block * INDEX_STRIDE + 1, len(timestamps)) if block < len(index) else len(timestamps)
+        return low + int(np.searchsorted(timestamps[low:high], micros, side='left'))
+
+    def range(self, start=None, end=None):
+        """
+        Ticks with start <= timestamp < end
+
+        Args:
+            start (datetime): Start of the range (defaults to the first tick)
+            end (datetime): End of the range, exclusive (defaults to after the last tick)
+
+        Returns:
+            tuple: (timestamps, prices) read-only int64 views onto the archive
+        """
+        timestamps, prices, _ = self._columns()
+        first = self._position(to_micros(start)) if start is not None else 0
+        last = self._position(to_micros(end)) if end is not None else len(timestamps)
+        return timestamps[first:last], prices[first:last]
+
+    def range_float(self, start=None, end=None):
+        """range() with prices scaled to float64, for vectorized maths"""
+        timestamps, prices = self.range(start, end)
+        return timestamps, prices / PRICE_SCALE
+
+
+class TickArchive:
+    """Per-currency TickSeries under one root directory"""
+
+    def __init__(self, root=None):
+        """
+        Initialize the archive
+
+        Args:
+            root (str): Archive directory (defaults to the TICK_ARCHIVE_ROOT
+                setting, or tick_archive/ under BASE_DIR)
+        """
+        self.root = str(root or getattr(
+            settings, 'TICK_ARCHIVE_ROOT', os.path.join(settings.BASE_DIR, 'tick_archive')
+        ))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def series(self, code):
+        code = code.upper()
+        with self._lock:
+            series = self._series.get(code)
+            if series is None:
+                series = self._series[code] = TickSeries(os.path.join(self.root, code))
+            return series
+
+    def codes(self):
+        """Currencies that have an archive directory"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def range(self, code, start=None, end=None):
+        return self.series(code).range(start, end)
+
+
+def unarchived_ticks(history, series, chunk_size=2000):
+    """
+    (timestamp, price) pairs of the PriceHistory rows a series does not hold yet
+
+    Rows stamped with the series' last timestamp are read again and as many
+    of them as the series already holds at that timestamp are skipped, so a
+    row sharing the last archived timestamp that committed after the
+    archive run is still picked up. Rows come in (timestamp, id) order, the
+    order they are archived in.
+
+    Args:
+        history (QuerySet): PriceHistory rows of the series' currency
+        series (TickSeries): Series the rows are archived to
+        chunk_size (int): Rows fetched per round trip
+
+    Yields:
+        tuple: (timestamp, price_usd)
+    """
+    last = series.last_timestamp
+    held = 0
+    if last is not None:
+        history = history.filter(timestamp__gte=from_micros(last))
+        held = len(series.range(start=from_micros(last))[0])
+    rows = history.order_by('timestamp', 'id').values_list('timestamp', 'price_usd')
+    for timestamp, price in rows.iterator(chunk_size=chunk_size):
+        if held and to_micros(timestamp) == last:
+            held -= 1
+            continue
+        yield timestamp, price
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_tick_archive():
+    """Shared per-process TickArchive at the configured root"""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = TickArchive()
+        return _archive
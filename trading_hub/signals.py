@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import CoinbaseUser, Wallet
+from .models import CoinbaseUser, Wallet, LimitOrder, StopOrder, CryptoCurrency, TaxLedgerCheckpoint, Transaction
+from .services.order_book import order_books
+from .services.price_events import on_order_placed, on_price_update
+from .services.tax_ledger import sync_fills
 
 # The User post_save signals have already been defined in models.py,
 # so we don't need to repeat them here. This file exists to be imported
@@ -36,3 +40,61 @@ def create_default_wallets(sender, instance, created, **kwargs):
                 balance=0.0,
                 address=f'{code.lower()}-wallet-{instance.id}'
             )
+
+
+@receiver(post_save, sender=LimitOrder)
+def sync_order_book(sender, instance, **kwargs):
+    """Keep the in-memory order book in step with saved limit orders"""
+    transaction.on_commit(lambda: order_books.sync_order(instance))
+
+
+@receiver(post_save, sender=LimitOrder)
+@receiver(post_save, sender=StopOrder)
+def evaluate_marketable_order(sender, instance, created, **kwargs):
+    """Fill or trigger a new order placed where the price already reaches it"""
+    if not created or instance.status != 'open':
+        return
+    marketable = instance.can_execute() if sender is LimitOrder else instance.should_trigger()
+    if marketable:
+        on_order_placed(instance.cryptocurrency_id)
+
+
+@receiver(post_delete, sender=LimitOrder)
+def remove_from_order_book(sender, instance, **kwargs):
+    """Drop deleted limit orders from the in-memory order book"""
+    transaction.on_commit(
+        lambda: order_books.remove_orders(instance.cryptocurrency_id, [instance.id])
+    )
+
+
+@receiver(post_init, sender=CryptoCurrency)
+def remember_loaded_price(sender, instance, **kwargs):
+    """Keep the price an instance was loaded with, so saves can tell how far it moved"""
+    # Read __dict__ directly so deferred price fields are not fetched
+    instance._loaded_price = instance.__dict__.get('current_price_usd')
+
+
+@receiver(post_save, sender=CryptoCurrency)
+def trigger_crossed_orders(sender, instance, created, **kwargs):
+    """Evaluate the orders crossed by a price change"""
+    new_price = instance.__dict__.get('current_price_usd')
+    if not created:
+        on_price_update(instance.code, getattr(instance, '_loaded_price', None), new_price)
+    instance._loaded_price = new_price
+
+
+@receiver(post_save, sender=Transaction)
+def update_tax_ledger(sender, instance, **kwargs):
+    """Apply a settled buy or sell to the user's tax lot ledger once it commits"""
+    if instance.status == 'completed' and instance.transaction_type in ('buy', 'sell'):
+        pair = (instance.user_id, instance.currency)
+        transaction.on_commit(lambda: sync_fills([pair]))
+
+
+@receiver(post_delete, sender=Transaction)
+def invalidate_tax_ledger(sender, instance, **kwargs):
+    """Have the next sync rebuild a ledger one of whose fills was deleted"""
+    if instance.transaction_type in ('buy', 'sell'):
+        TaxLedgerCheckpoint.objects.filter(
+            user_id=instance.user_id, currency=instance.currency
+        ).update(synced_at=None)
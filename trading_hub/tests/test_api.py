@@ -3,12 +3,16 @@ from django.urls import reverse
 from django.contrib.auth.models import User
 from django.utils import timezone
 from decimal import Decimal
+import hashlib
+import hmac
 import json
+import time
 import uuid
 
 from trading_hub.models import (
-    CryptoCurrency, APIKey, Transaction, Wallet
+    CryptoCurrency, APIKey, Transaction, Wallet, LimitOrder, StopOrder, News
 )
+from trading_hub.services.query_budget import QueryBudgetAssertions
 
 class APIKeyAuthenticationTest(TestCase):
     def setUp(self):
@@ -177,3 +181,61 @@ class CalculateCostBasisAPITest(TestCase):
         summary = data['summary']
         # Total cost basis should be 40000 + 45000 = 85000
         self.assertEqual(summary['total_cost_basis'], 85000.0)
+
+
+class QueryBudgetAPITest(QueryBudgetAssertions, TestCase):
+    """API list and detail endpoints stay within their query budgets"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='apibudget', password='testpassword')
+        self.api_key = APIKey.objects.create(user=self.user, name='Budget Key', permissions='read_write')
+        cryptos = [
+            CryptoCurrency.objects.create(code=f'C{n}', name=f'Coin {n}', current_price_usd=Decimal('100.00'))
+            for n in range(5)
+        ]
+        usd = Wallet.objects.get(user=self.user, currency_code='USD')
+        btc = Wallet.objects.get(user=self.user, currency_code='BTC')
+        for n in range(20):
+            Transaction.objects.create(
+                user=self.user, transaction_type='buy', amount=Decimal('0.1'), currency='BTC',
+                native_amount=Decimal('10.00'), status='completed', from_wallet=usd, to_wallet=btc,
+            )
+            LimitOrder.objects.create(
+                user=self.user, cryptocurrency=cryptos[n % 5], side='buy', amount=Decimal('1'),
+                limit_price=Decimal('50.00'), from_wallet=usd, to_wallet=btc,
+            )
+            StopOrder.objects.create(
+                user=self.user, cryptocurrency=cryptos[n % 5], side='sell', amount=Decimal('1'),
+                stop_price=Decimal('80.00'), from_wallet=btc, to_wallet=usd,
+            )
+            article = News.objects.create(
+                title=f'Article {n}', content='...', source='Test', source_url=f'https://example.com/{n}',
+                published_at=timezone.now(),
+            )
+            article.related_cryptocurrencies.set(cryptos[:3])
+
+    def signed(self, url):
+        timestamp = str(int(time.time()))
+        signature = hmac.new(
+            self.api_key.secret.encode(), f'{timestamp}GET{url}'.encode(), hashlib.sha256
+        ).hexdigest()
+        return {'HTTP_X_API_KEY': self.api_key.key, 'HTTP_X_API_SIGNATURE': signature, 'HTTP_X_API_TIMESTAMP': timestamp}
+
+    def assertEndpointWithinBudget(self, url):
+        response = self.assertWithinQueryBudget(url, **self.signed(url))
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_endpoints(self):
+        for name in ('transaction-list', 'wallet-list', 'limitorder-list', 'stoporder-list',
+                     'news-list', 'cryptocurrency-list'):
+            with self.subTest(name):
+                self.assertEndpointWithinBudget(reverse(name))
+
+    def test_detail_endpoints(self):
+        for name, obj in (
+            ('transaction-detail', Transaction.objects.first()),
+            ('limitorder-detail', LimitOrder.objects.first()),
+            ('news-detail', News.objects.first()),
+        ):
+            with self.subTest(name):
+                self.assertEndpointWithinBudget(reverse(name, args=[obj.pk]))
@@ -7,7 +7,7 @@ from trading_hub.forms import (
     KYCForm, AddressForm, BankAccountForm, 
     WireTransferForm, PriceAlertForm, TaxReportForm
 )
-from trading_hub.models import BankAccount
+from trading_hub.models import BankAccount, CryptoCurrency
 
 class KYCFormTest(TestCase):
     def test_kyc_form_valid_data(self):
@@ -149,6 +149,18 @@ class PriceAlertFormTest(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn('target_price', form.errors)
 
+    def test_price_alert_direction_follows_the_current_price(self):
+        """Test PriceAlertForm infers a missing direction from the current price"""
+        CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('60000.00'))
+        for target_price, direction in (('50000.00', 'below'), ('70000.00', 'above')):
+            form = PriceAlertForm(data={'symbol': 'btc', 'target_price': target_price})
+            self.assertTrue(form.is_valid())
+            self.assertEqual(form.cleaned_data['direction'], direction)
+
+        form = PriceAlertForm(data={'symbol': 'BTC', 'target_price': '50000.00', 'direction': 'above'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['direction'], 'above')
+
 class TaxReportFormTest(TestCase):
     def test_tax_report_form_valid_data(self):
         """Test TaxReportForm with valid data"""
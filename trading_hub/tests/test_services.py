@@ -1,13 +1,54 @@
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
 from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import F
 from django.utils import timezone
+from datetime import datetime, timezone as dt_timezone
 from decimal import Decimal
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import shutil
 import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
 
 from trading_hub.models import (
-    CryptoCurrency, Transaction, Wallet, TaxReport, TaxTransaction
+    CoinbaseUser, CryptoCurrency, Transaction, Wallet, TaxReport, TaxTransaction, LimitOrder, StopOrder,
+    RecurringOrder, PriceAlert, PriceHistory, PriceCandle, TradingPair, News, RealizedGain, TaxLedgerCheckpoint,
+    TaxLot
+)
+from trading_hub.services import ledger
+from trading_hub.services.backtest import Backtest, BacktestError
+from trading_hub.services.benchmarks import compare, measure
+from trading_hub.services.candles import CandleAggregator, bucket_start, get_candles, resolution_for_range
+from trading_hub.services.charting import load_series, lttb
+from trading_hub.services import indicators
+from trading_hub.services.lot_matching import AverageCostPool, LotMatcher, match_lots, stream_fills, summarize_sales
+from trading_hub.services.market_stats import MarketStatsTracker, RollingWindow
+from trading_hub.services.order_book import OrderBook, order_books
+from trading_hub.services.order_engine import OrderEvaluator
+from trading_hub.services.price_alerts import PriceAlertEvaluator
+from trading_hub.services.price_client import PriceClient
+from trading_hub.services.price_feed import FileTickSource, PriceIngestor, PriceWriter, parse_tick
+from trading_hub.services.recurring import RecurringOrderRunner
+from trading_hub.services.request_metrics import (
+    LatencyHistogram, MetricsRegistry, QueryTimer, StackSampler, bucket_bounds, bucket_index
 )
+from trading_hub.services.seeding import SeedLoader
+from trading_hub.services.settlement import SettlementBatch
 from trading_hub.services.tax_calculator import TaxCalculator
+from trading_hub.services.tax_ledger import TaxLedger
+from trading_hub.services.tick_archive import INDEX_STRIDE, TickArchive, from_fixed, to_fixed, to_micros
 
 class TaxCalculatorTest(TestCase):
     def setUp(self):
@@ -131,3 +172,1413 @@ class TaxCalculatorTest(TestCase):
             tax_year=timezone.now().year
         )
         self.assertEqual(tax_transactions.count(), 1)  # For the sell transaction
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_report_progress_moves_while_fills_are_matched(self):
+        """Test progress is reported every PROGRESS_EVERY fills, not only between currencies"""
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, transaction_type='buy', amount=Decimal('0.01'), currency='ETH',
+                native_amount=Decimal('30.00'), native_currency='USD', status='completed'
+            )
+            for _ in range(2500)
+        ])
+        reported = []
+        self.calculator.generate_tax_report(progress=reported.append)
+
+        self.assertGreaterEqual(len([percent for percent in reported if 0 < percent < 80]), 2)
+        self.assertEqual(reported, sorted(reported))
+        self.assertEqual(reported[-1], 90)
+
+
+class OrderEvaluatorTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='testpassword')
+        self.btc = CryptoCurrency.objects.create(
+            code='BTC',
+            name='Bitcoin',
+            current_price_usd=Decimal('50000.00')
+        )
+        self.usd_wallet = Wallet.objects.create(
+            user=self.user,
+            currency_code='USD',
+            balance=Decimal('100000.00'),
+            address='evaluator-usd'
+        )
+        self.btc_wallet = Wallet.objects.create(
+            user=self.user,
+            currency_code='BTC',
+            balance=Decimal('2.0'),
+            address='evaluator-btc'
+        )
+
+        self.crossed_buy = self._order('buy', '51000.00')
+        self.resting_buy = self._order('buy', '49000.00')
+        self.crossed_sell = self._order('sell', '49500.00')
+        self.resting_sell = self._order('sell', '52000.00')
+
+        self.evaluator = OrderEvaluator()
+
+    def _order(self, side, limit_price):
+        from_wallet, to_wallet = (
+            (self.usd_wallet, self.btc_wallet) if side == 'buy' else (self.btc_wallet, self.usd_wallet)
+        )
+        return LimitOrder.objects.create(
+            user=self.user,
+            cryptocurrency=self.btc,
+            side=side,
+            amount=Decimal('0.1'),
+            limit_price=Decimal(limit_price),
+            from_wallet=from_wallet,
+            to_wallet=to_wallet
+        )
+
+    def test_crossable_orders_use_a_single_range_query(self):
+        """Only orders the price has crossed are selected, in one query"""
+        with self.assertNumQueries(1):
+            orders = list(self.evaluator.crossable_limit_orders(self.btc))
+
+        self.assertEqual(
+            {order.id for order in orders},
+            {self.crossed_buy.id, self.crossed_sell.id}
+        )
+
+    def test_run_executes_crossed_and_expires_stale_orders(self):
+        """A tick executes crossed orders and expires stale ones"""
+        self.resting_sell.expires_at = timezone.now() - timezone.timedelta(minutes=1)
+        self.resting_sell.save()
+
+        results = self.evaluator.run()
+
+        self.assertEqual(results, {'expired': 1, 'executed': 2, 'stop_expired': 0, 'stop_triggered': 0})
+        self.resting_sell.refresh_from_db()
+        self.resting_buy.refresh_from_db()
+        self.crossed_buy.refresh_from_db()
+        self.assertEqual(self.resting_sell.status, 'expired')
+        self.assertEqual(self.resting_buy.status, 'open')
+        self.assertEqual(self.crossed_buy.status, 'filled')
+
+        # Buys and sells settle against both wallets
+        self.usd_wallet.refresh_from_db()
+        self.btc_wallet.refresh_from_db()
+        self.assertEqual(self.usd_wallet.balance, Decimal('100000.00') - Decimal('5100.00') + Decimal('4950.00'))
+        self.assertEqual(self.btc_wallet.balance, Decimal('2.0'))
+
+    def test_crossed_stop_orders_match_the_price_range(self):
+        """A move from P0 to P1 selects exactly the stops between them, in one query"""
+        def stop(side, stop_price):
+            return StopOrder.objects.create(
+                user=self.user, cryptocurrency=self.btc, side=side, amount=Decimal('0.1'),
+                stop_price=Decimal(stop_price), from_wallet=self.btc_wallet, to_wallet=self.usd_wallet
+            )
+
+        inside = stop('sell', '49000.00')
+        stop('sell', '47000.00')
+        stop('buy', '49000.00')
+
+        with self.assertNumQueries(1):
+            orders = list(self.evaluator.crossed_stop_orders(self.btc, Decimal('50000.00'), Decimal('48000.00')))
+
+        self.assertEqual(orders, [inside])
+
+    def test_run_triggers_stop_orders(self):
+        """Stop market orders settle with the tick and stop-limit orders place a limit order"""
+        stop = StopOrder.objects.create(
+            user=self.user, cryptocurrency=self.btc, side='sell', amount=Decimal('0.5'),
+            stop_price=Decimal('50500.00'), from_wallet=self.btc_wallet, to_wallet=self.usd_wallet
+        )
+        stop_limit = StopOrder.objects.create(
+            user=self.user, cryptocurrency=self.btc, side='buy', amount=Decimal('0.5'),
+            stop_price=Decimal('49000.00'), limit_price=Decimal('48000.00'),
+            from_wallet=self.usd_wallet, to_wallet=self.btc_wallet
+        )
+
+        results = self.evaluator.run()
+
+        self.assertEqual(results['stop_triggered'], 2)
+        stop.refresh_from_db()
+        stop_limit.refresh_from_db()
+        self.assertEqual(stop.status, 'filled')
+        self.assertEqual(stop_limit.status, 'triggered')
+        self.assertTrue(LimitOrder.objects.filter(limit_price=Decimal('48000.00'), status='open').exists())
+
+    def test_overlapping_evaluations_trigger_a_stop_limit_once(self):
+        """An evaluator holding a stale copy of a triggered stop-limit places no second limit order"""
+        stop_limit = StopOrder.objects.create(
+            user=self.user, cryptocurrency=self.btc, side='buy', amount=Decimal('0.5'),
+            stop_price=Decimal('49000.00'), limit_price=Decimal('48000.00'),
+            from_wallet=self.usd_wallet, to_wallet=self.btc_wallet
+        )
+        stale_copy = StopOrder.objects.get(pk=stop_limit.pk)
+
+        self.assertEqual(self.evaluator.run()['stop_triggered'], 1)
+        self.assertFalse(OrderEvaluator()._trigger_stop_order(stale_copy, self.btc.current_price_usd))
+        self.assertEqual(LimitOrder.objects.filter(limit_price=Decimal('48000.00')).count(), 1)
+
+    def test_overlapping_evaluations_fill_an_order_once(self):
+        """Fills queued from orders another evaluator has since filled are dropped"""
+        overlapping = OrderEvaluator()
+        overlapping.queue_limit_orders(self.btc)
+
+        self.assertEqual(self.evaluator.run()['executed'], 2)
+        self.assertEqual(overlapping._settle(), (0, 0))
+        self.assertEqual(len(overlapping.batch.stale), 2)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+
+
+@override_settings(PRICE_EVENTS_ASYNC=False)
+class PriceEventTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='eventuser', password='testpassword')
+        self.btc = CryptoCurrency.objects.create(
+            code='BTC',
+            name='Bitcoin',
+            current_price_usd=Decimal('50000.00')
+        )
+        self.usd_wallet = Wallet.objects.create(
+            user=self.user,
+            currency_code='USD',
+            balance=Decimal('100000.00'),
+            address='event-usd'
+        )
+        self.btc_wallet = Wallet.objects.create(
+            user=self.user,
+            currency_code='BTC',
+            balance=Decimal('2.0'),
+            address='event-btc'
+        )
+
+    def _limit(self, side, limit_price):
+        from_wallet, to_wallet = (
+            (self.usd_wallet, self.btc_wallet) if side == 'buy' else (self.btc_wallet, self.usd_wallet)
+        )
+        return LimitOrder.objects.create(
+            user=self.user, cryptocurrency=self.btc, side=side, amount=Decimal('0.1'),
+            limit_price=Decimal(limit_price), from_wallet=from_wallet, to_wallet=to_wallet
+        )
+
+    def _move_price(self, price):
+        crypto = CryptoCurrency.objects.get(code='BTC')
+        crypto.current_price_usd = Decimal(price)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            crypto.save()
+        return callbacks
+
+    def test_price_fall_fills_crossed_orders_only(self):
+        """A fall fills buys and sell stops between the old and new price"""
+        crossed_buy = self._limit('buy', '49500.00')
+        deeper_buy = self._limit('buy', '48000.00')
+        stop = StopOrder.objects.create(
+            user=self.user, cryptocurrency=self.btc, side='sell', amount=Decimal('0.1'),
+            stop_price=Decimal('49800.00'), from_wallet=self.btc_wallet, to_wallet=self.usd_wallet
+        )
+
+        self._move_price('49000.00')
+
+        crossed_buy.refresh_from_db()
+        deeper_buy.refresh_from_db()
+        stop.refresh_from_db()
+        self.assertEqual(crossed_buy.status, 'filled')
+        self.assertEqual(deeper_buy.status, 'open')
+        self.assertEqual(stop.status, 'filled')
+
+    def test_unchanged_price_schedules_nothing(self):
+        """Saving a currency without a price change does no order work"""
+        self._limit('sell', '50000.00')
+        self.assertEqual(self._move_price('50000.00'), [])
+
+    def test_marketable_orders_fill_once_placed(self):
+        """New orders the price already reaches are evaluated on commit, not left to the sweep"""
+        with self.captureOnCommitCallbacks(execute=True):
+            marketable = self._limit('buy', '50500.00')
+            stop = StopOrder.objects.create(
+                user=self.user, cryptocurrency=self.btc, side='sell', amount=Decimal('0.1'),
+                stop_price=Decimal('50200.00'), from_wallet=self.btc_wallet, to_wallet=self.usd_wallet
+            )
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            resting = self._limit('buy', '49000.00')
+
+        marketable.refresh_from_db()
+        stop.refresh_from_db()
+        self.assertEqual((marketable.status, stop.status), ('filled', 'filled'))
+        self.assertEqual(resting.status, 'open')
+        # Only the order book sync is scheduled for a resting order
+        self.assertEqual(len(callbacks), 1)
+
+
+class SettlementBatchTest(TestCase):
+    def setUp(self):
+        self.btc = CryptoCurrency.objects.create(
+            code='BTC',
+            name='Bitcoin',
+            current_price_usd=Decimal('50000.00')
+        )
+        self.traders = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'settler{i}', password='testpassword')
+            usd = Wallet.objects.create(user=user, currency_code='USD', balance=Decimal('10000.00'), address=f'settle-usd-{i}')
+            btc = Wallet.objects.create(user=user, currency_code='BTC', balance=Decimal('1.0'), address=f'settle-btc-{i}')
+            self.traders.append((user, usd, btc))
+
+    def _order(self, trader, side, limit_price, amount='0.1'):
+        user, usd, btc = trader
+        from_wallet, to_wallet = (usd, btc) if side == 'buy' else (btc, usd)
+        return LimitOrder.objects.create(
+            user=user,
+            cryptocurrency=self.btc,
+            side=side,
+            amount=Decimal(amount),
+            limit_price=Decimal(limit_price),
+            from_wallet=from_wallet,
+            to_wallet=to_wallet
+        )
+
+    def test_commit_query_count_does_not_grow_with_fills(self):
+        """Every fill in the batch is written with a fixed number of statements"""
+        batch = SettlementBatch()
+        orders = [self._order(trader, 'buy', '1000.00') for trader in self.traders for _ in range(4)]
+        for order in orders:
+            batch.add(order, **order.settlement_fill())
+
+        # lock orders, lock wallets, insert transactions, update wallets, update
+        # counters, read and update ratings, update orders, plus savepoint handling
+        with self.assertNumQueries(10):
+            results = batch.commit()
+
+        self.assertEqual(results, {'settled': 12, 'rejected': 0})
+        self.assertEqual(Transaction.objects.filter(status='completed').count(), 12)
+        for user, usd, btc in self.traders:
+            usd.refresh_from_db()
+            btc.refresh_from_db()
+            self.assertEqual(usd.balance, Decimal('9600.00'))
+            self.assertEqual(btc.balance, Decimal('1.4'))
+            self.assertEqual(CoinbaseUser.objects.get(user=user).total_trades, 4)
+        self.assertFalse(LimitOrder.objects.exclude(status='filled').exists())
+
+    def test_overdraft_is_rejected_within_the_batch(self):
+        """Fills are checked against the running balance, not the balance at load time"""
+        trader = self.traders[0]
+        first = self._order(trader, 'sell', '50000.00', amount='0.75')
+        second = self._order(trader, 'sell', '50000.00', amount='0.5')
+        batch = SettlementBatch()
+        batch.add(first, **first.settlement_fill())
+        batch.add(second, **second.settlement_fill())
+
+        self.assertEqual(batch.commit(), {'settled': 1, 'rejected': 1})
+        self.assertEqual(batch.rejected, [second])
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'open')
+        trader[2].refresh_from_db()
+        self.assertEqual(trader[2].balance, Decimal('0.25'))
+
+    def test_order_settles_once_across_batches(self):
+        """A second evaluator that loaded the same open order drops its fill"""
+        user, usd, btc = self.traders[0]
+        order = self._order(self.traders[0], 'buy', '1000.00')
+        stale_copy = LimitOrder.objects.get(pk=order.pk)
+        first, second = SettlementBatch(), SettlementBatch()
+        first.add(order, **order.settlement_fill())
+        second.add(stale_copy, **stale_copy.settlement_fill())
+
+        self.assertEqual(first.commit(), {'settled': 1, 'rejected': 0})
+        self.assertEqual(second.commit(), {'settled': 0, 'rejected': 0})
+        self.assertEqual(second.stale, [stale_copy])
+
+        self.assertEqual(Transaction.objects.filter(user=user).count(), 1)
+        usd.refresh_from_db()
+        btc.refresh_from_db()
+        self.assertEqual(usd.balance, Decimal('9900.00'))
+        self.assertEqual(btc.balance, Decimal('1.1'))
+        self.assertEqual(CoinbaseUser.objects.get(user=user).total_trades, 1)
+
+
+class RecurringOrderRunnerTest(TestCase):
+    def setUp(self):
+        self.btc = CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('50000.00'))
+        self.eth = CryptoCurrency.objects.create(code='ETH', name='Ethereum', current_price_usd=Decimal('2500.00'))
+        self.now = timezone.now()
+        self.orders = []
+        for i in range(4):
+            user = User.objects.create_user(username=f'dca{i}', password='testpassword')
+            usd = Wallet.objects.create(user=user, currency_code='USD', balance=Decimal('1000.00'), address=f'dca-usd-{i}')
+            for crypto in (self.btc, self.eth):
+                target = Wallet.objects.create(user=user, currency_code=crypto.code, address=f'dca-{crypto.code}-{i}')
+                self.orders.append(RecurringOrder.objects.create(
+                    user=user, cryptocurrency=crypto, order_type='buy', amount=Decimal('100.00'),
+                    interval='monthly', from_wallet=usd, to_wallet=target,
+                    start_date=self.now - timezone.timedelta(days=31),
+                    next_execution=self.now - timezone.timedelta(minutes=5)
+                ))
+        self.not_due = self.orders[0]
+        RecurringOrder.objects.filter(pk=self.not_due.pk).update(next_execution=self.now + timezone.timedelta(days=1))
+
+    def test_due_orders_run_in_chunks_with_constant_queries(self):
+        """Due orders are priced once per currency and advanced in bulk"""
+        runner = RecurringOrderRunner(now=self.now, chunk_size=100)
+        with self.assertNumQueries(15):
+            results = runner.run()
+
+        self.assertEqual(results, {'executed': 7, 'skipped': 0, 'completed': 0})
+        for order in self.orders[1:]:
+            order.refresh_from_db()
+            self.assertEqual(order.last_executed, self.now)
+            self.assertGreater(order.next_execution, self.now)
+        self.assertEqual(Wallet.objects.get(address='dca-ETH-1').balance, Decimal('0.04'))
+        self.assertEqual(RecurringOrderRunner(now=self.now).run()['executed'], 0)
+
+
+class PriceAlertEvaluatorTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alertuser', password='testpassword')
+        CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('50000.00'))
+        CryptoCurrency.objects.create(code='ETH', name='Ethereum', current_price_usd=Decimal('2500.00'))
+
+    def _alert(self, symbol, target_price, direction):
+        return PriceAlert.objects.create(
+            user=self.user, symbol=symbol, target_price=Decimal(target_price), direction=direction
+        )
+
+    def test_only_crossed_alerts_trigger(self):
+        """Alerts trigger when the price reaches their target in their direction"""
+        hit_above = self._alert('BTC', '49000', 'above')
+        hit_below = self._alert('ETH', '2600', 'below')
+        waiting_above = self._alert('BTC', '55000', 'above')
+        waiting_below = self._alert('ETH', '2000', 'below')
+
+        # distinct symbols, prices, one range query per symbol, one update, users
+        with self.assertNumQueries(6):
+            results = PriceAlertEvaluator().run()
+
+        self.assertEqual(results, {'symbols': 2, 'triggered': 2})
+        self.assertEqual(
+            set(PriceAlert.objects.filter(triggered=True).values_list('id', flat=True)),
+            {hit_above.id, hit_below.id}
+        )
+        self.assertFalse(PriceAlert.objects.filter(id__in=[waiting_above.id, waiting_below.id], triggered=True).exists())
+
+
+class PriceIngestorTest(TestCase):
+    def setUp(self):
+        CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('50000.00'))
+        CryptoCurrency.objects.create(code='ETH', name='Ethereum', current_price_usd=Decimal('2500.00'))
+
+    def _feed(self, lines):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as feed:
+            feed.write('\n'.join(lines))
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_parse_tick_formats(self):
+        """CSV and JSON lines parse, anything else is skipped"""
+        tick = parse_tick('btc,50100.5,1700000000,0.25')
+        self.assertEqual((tick.symbol, tick.price, tick.volume), ('BTC', Decimal('50100.5'), Decimal('0.25')))
+        self.assertEqual(tick.timestamp.timestamp(), 1700000000)
+        self.assertEqual(parse_tick('{"symbol": "ETH", "price": "2501"}').price, Decimal('2501'))
+        self.assertIsNone(parse_tick('BTC,not-a-price'))
+
+    def test_ticks_are_coalesced_into_batched_writes(self):
+        """Thousands of ticks become one price write and one history row per symbol"""
+        lines = [f'BTC,{50000 + i % 100}.00,{1700000000 + i}' for i in range(3000)]
+        lines += ['ETH,2600.00', 'DOGE,0.10', 'BTC,51234.00']
+        ingestor = PriceIngestor(FileTickSource(self._feed(lines)), window=60, writer=PriceWriter(consumers=[]))
+
+        # in_bulk, bulk_update, bulk_create, plus the savepoint pair
+        with self.assertNumQueries(5):
+            stats = ingestor.run()
+
+        self.assertEqual(stats, {'ticks': 3003, 'flushes': 1, 'written': 2, 'unknown': 1})
+        self.assertEqual(CryptoCurrency.objects.get(code='BTC').current_price_usd, Decimal('51234.00'))
+        self.assertEqual(PriceHistory.objects.filter(currency_id='BTC').count(), 1)
+
+    def test_flushes_feed_candles(self):
+        """The default writer rolls each flushed window into candles"""
+        lines = ['BTC,50000.00,1700000000', 'BTC,50500.00,1700000010', 'BTC,49900.00,1700000020']
+        PriceIngestor(FileTickSource(self._feed(lines)), window=60).run()
+
+        candle = PriceCandle.objects.get(currency_id='BTC', resolution='1m')
+        self.assertEqual(
+            (candle.open, candle.high, candle.low, candle.close, candle.tick_count),
+            (Decimal('50000.00'), Decimal('50500.00'), Decimal('49900.00'), Decimal('49900.00'), 3)
+        )
+
+
+class CandleAggregatorTest(TestCase):
+    def setUp(self):
+        self.btc = CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('50000.00'))
+        # A Monday, on the hour
+        self.start = timezone.datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+    def test_bucket_start(self):
+        ts = self.start + timezone.timedelta(days=2, hours=3, minutes=7, seconds=30)
+        self.assertEqual(bucket_start(ts, '5m'), self.start + timezone.timedelta(days=2, hours=3, minutes=5))
+        self.assertEqual(bucket_start(ts, '1d'), timezone.datetime(2024, 1, 3, tzinfo=timezone.utc))
+        self.assertEqual(bucket_start(ts, '1w'), timezone.datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    def test_flushes_merge_into_existing_candles(self):
+        """Later flushes extend the stored buckets instead of adding rows"""
+        aggregator = CandleAggregator()
+        aggregator.add_tick('BTC', self.start, Decimal('100'), Decimal('1'))
+        aggregator.add_tick('BTC', self.start + timezone.timedelta(seconds=20), Decimal('120'), Decimal('2'))
+        self.assertEqual(aggregator.flush(), {'created': 5, 'updated': 0})
+
+        aggregator.add_tick('BTC', self.start + timezone.timedelta(seconds=40), Decimal('90'), Decimal('3'))
+        aggregator.add_tick('BTC', self.start + timezone.timedelta(minutes=1), Decimal('95'))
+        self.assertEqual(aggregator.flush(), {'created': 1, 'updated': 5})
+
+        minute = PriceCandle.objects.get(currency=self.btc, resolution='1m', bucket_start=self.start)
+        self.assertEqual(
+            (minute.open, minute.high, minute.low, minute.close, minute.volume, minute.tick_count),
+            (Decimal('100'), Decimal('120'), Decimal('90'), Decimal('90'), Decimal('6'), 3)
+        )
+        hour = PriceCandle.objects.get(currency=self.btc, resolution='1h')
+        self.assertEqual((hour.close, hour.tick_count), (Decimal('95'), 4))
+
+    def test_chart_ranges_read_a_bounded_number_of_candles(self):
+        """Long ranges are served from coarser candles"""
+        aggregator = CandleAggregator()
+        for minute in range(3 * 24 * 60):
+            aggregator.add_tick('BTC', self.start + timezone.timedelta(minutes=minute), Decimal(1000 + minute))
+        aggregator.flush()
+
+        end = self.start + timezone.timedelta(days=3)
+        self.assertEqual(resolution_for_range(self.start, self.start + timezone.timedelta(hours=2)), '1m')
+        self.assertEqual(resolution_for_range(self.start, end), '1h')
+
+        with self.assertNumQueries(1):
+            resolution, candles = get_candles('BTC', self.start, end)
+        self.assertEqual((resolution, len(candles)), ('1h', 72))
+        self.assertEqual(candles[0]['open'], Decimal('1000'))
+        self.assertEqual(candles[-1]['close'], Decimal(1000 + 3 * 24 * 60 - 1))
+
+        resolution, candles = get_candles('BTC', self.start, end, resolution='1m', max_points=100)
+        self.assertEqual(len(candles), 100)
+        self.assertEqual(candles[-1]['close'], Decimal(1000 + 3 * 24 * 60 - 1))
+
+
+class TickArchiveTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.archive = TickArchive(self.root)
+        self.start = timezone.datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def test_range_queries_are_views_onto_the_archive(self):
+        """Appends in several chunks are found through the sparse index"""
+        series = self.archive.series('btc')
+        base = to_micros(self.start)
+        rows = 3 * INDEX_STRIDE + 17
+        for chunk in range(0, rows, 1000):
+            seconds = range(chunk, min(chunk + 1000, rows))
+            series.append([base + s * 10 ** 6 for s in seconds], [to_fixed(Decimal(50000 + s)) for s in seconds])
+
+        series = TickArchive(self.root).series('BTC')
+        self.assertEqual(len(series), rows)
+        timestamps, prices = series.range(
+            self.start + timezone.timedelta(seconds=INDEX_STRIDE - 5),
+            self.start + timezone.timedelta(seconds=2 * INDEX_STRIDE + 5),
+        )
+        self.assertEqual(len(timestamps), INDEX_STRIDE + 10)
+        self.assertEqual(from_fixed(prices[0]), Decimal(50000 + INDEX_STRIDE - 5))
+        self.assertFalse(timestamps.flags.owndata)
+        self.assertEqual(len(series.range(end=self.start)[0]), 0)
+
+        with self.assertRaises(ValueError):
+            series.append([base], [to_fixed(Decimal('1'))])
+
+    def test_archive_price_history_command(self):
+        """PriceHistory rows are copied once, even when the command is re-run"""
+        btc = CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('50000.00'))
+        for hour in range(5):
+            PriceHistory.objects.create(
+                currency=btc, price_usd=Decimal('50000.25') + hour,
+                timestamp=self.start + timezone.timedelta(hours=hour), period='day',
+            )
+
+        call_command('archive_price_history', root=self.root, stdout=io.StringIO())
+        call_command('archive_price_history', root=self.root, stdout=io.StringIO())
+
+        timestamps, prices = TickArchive(self.root).range('BTC')
+        self.assertEqual(len(timestamps), 5)
+        self.assertEqual(from_fixed(prices[-1]), Decimal('50004.25'))
+
+        # A tick sharing the last archived timestamp that committed after the run
+        PriceHistory.objects.create(
+            currency=btc, price_usd=Decimal('50004.75'), timestamp=self.start + timezone.timedelta(hours=4), period='day',
+        )
+        call_command('archive_price_history', root=self.root, stdout=io.StringIO())
+        call_command('archive_price_history', root=self.root, stdout=io.StringIO())
+
+        timestamps, prices = TickArchive(self.root).range('BTC')
+        self.assertEqual([from_fixed(price) for price in prices[-2:]], [Decimal('50004.25'), Decimal('50004.75')])
+        self.assertEqual(len(timestamps), 6)
+
+    def test_series_continues_past_the_archive_with_price_history(self):
+        """Ticks written after the last archive run still reach charts and backtests"""
+        btc = CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('50000.00'))
+        for hour in range(6):
+            PriceHistory.objects.create(
+                currency=btc, price_usd=Decimal('50000.25') + hour,
+                timestamp=self.start + timezone.timedelta(hours=hour), period='day',
+            )
+        archive = TickArchive(self.root)
+        # The archive holds the first three hours; the rest arrived since
+        archive.series('BTC').append(
+            [to_micros(self.start + timezone.timedelta(hours=hour)) for hour in range(3)],
+            [to_fixed(Decimal('40000') + hour) for hour in range(3)],
+        )
+
+        timestamps, prices = load_series('BTC', archive=archive)
+        self.assertEqual(len(timestamps), 6)
+        self.assertEqual(prices.tolist(), [40000.0, 40001.0, 40002.0, 50003.25, 50004.25, 50005.25])
+        self.assertTrue((timestamps[1:] > timestamps[:-1]).all())
+
+        timestamps, prices = load_series('BTC', start=self.start + timezone.timedelta(hours=4), archive=archive)
+        self.assertEqual(prices.tolist(), [50004.25, 50005.25])
+
+        # Only the row at the last archived timestamp the archive does not hold is added
+        PriceHistory.objects.create(
+            currency=btc, price_usd=Decimal('50002.75'), timestamp=self.start + timezone.timedelta(hours=2), period='day',
+        )
+        timestamps, prices = load_series('BTC', archive=archive)
+        self.assertEqual(prices.tolist(), [40000.0, 40001.0, 40002.0, 50002.75, 50003.25, 50004.25, 50005.25])
+
+
+class LttbTest(TestCase):
+    def test_keeps_endpoints_and_extremes(self):
+        """Downsampling keeps the first and last points and the spikes"""
+        x = np.arange(10000)
+        y = np.sin(x / 500.0)
+        y[3333] = 50
+        y[7777] = -50
+
+        kept = lttb(x, y, 200)
+        self.assertEqual(len(kept), 200)
+        self.assertEqual((kept[0], kept[-1]), (0, 9999))
+        self.assertTrue(np.all(np.diff(kept) > 0))
+        self.assertIn(3333, kept)
+        self.assertIn(7777, kept)
+        self.assertEqual(list(lttb(x[:5], y[:5], 200)), [0, 1, 2, 3, 4])
+
+
+class MarketStatsTrackerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='statsuser', password='testpassword')
+        self.btc = CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('50000.00'))
+        self.eth = CryptoCurrency.objects.create(code='ETH', name='Ethereum', current_price_usd=Decimal('2000.00'))
+        self.pair = TradingPair.objects.create(base_currency=self.btc, quote_currency=self.eth)
+        self.eth_wallet = Wallet.objects.create(
+            user=self.user, currency_code='ETH', balance=Decimal('0'), address='eth-address-stats'
+        )
+        self.now = timezone.now()
+
+    def test_ring_buffer_drops_minutes_outside_the_window(self):
+        window = RollingWindow(size=10)
+        window.add_price(100, 10.0, 12.0, 9.0, 11.0)
+        window.add_volume(100, 5.0)
+        window.add_price(105, 11.0, 20.0, 11.0, 15.0)
+        self.assertEqual(
+            window.summary(105),
+            {'open': 10.0, 'high': 20.0, 'low': 9.0, 'close': 15.0, 'change_percent': 50.0, 'volume': 5.0}
+        )
+
+        # Minute 110 reuses minute 100's slot
+        window.add_price(110, 16.0, 16.0, 16.0, 16.0)
+        window.add_price(100, 1.0, 1.0, 1.0, 1.0)
+        stats = window.summary(110)
+        self.assertEqual((stats['open'], stats['low'], stats['volume']), (11.0, 11.0, 0.0))
+
+    def test_flush_writes_rolling_stats(self):
+        """Prices and completed trades land in the 24h columns with one write per model"""
+        Transaction.objects.create(
+            user=self.user, transaction_type='buy', amount=Decimal('0.1'), currency='BTC',
+            native_amount=Decimal('5000.00'), status='completed',
+        )
+        Transaction.objects.create(
+            user=self.user, transaction_type='convert', amount=Decimal('0.2'), currency='BTC',
+            native_amount=Decimal('10000.00'), status='completed', to_wallet=self.eth_wallet,
+        )
+        Transaction.objects.create(
+            user=self.user, transaction_type='buy', amount=Decimal('1'), currency='BTC',
+            native_amount=Decimal('50000.00'), status='failed',
+        )
+        cache.set('trending_cryptos', ['stale'])
+
+        tracker = MarketStatsTracker()
+        tracker.warm(self.now)
+        tracker.record_price('BTC', self.now - timezone.timedelta(hours=23), 40000, 41000, 39000, 40000)
+        tracker.record_price('ETH', self.now - timezone.timedelta(hours=23), 2000, 2000, 2000, 2000)
+        tracker.record_price('BTC', self.now - timezone.timedelta(minutes=1), 50000, 51000, 49000, 50000)
+        tracker.record_price('BTC', self.now - timezone.timedelta(hours=25), 10000, 10000, 10000, 10000)
+
+        with self.assertNumQueries(5):
+            # fill poll, one update per model, plus the savepoint pair
+            self.assertEqual(tracker.flush(self.now), {'currencies': 2, 'pairs': 1})
+
+        self.btc.refresh_from_db()
+        self.assertEqual(self.btc.price_change_24h_percent, Decimal('25.00'))
+        self.assertEqual(self.btc.volume_24h_usd, Decimal('15000.00'))
+        self.pair.refresh_from_db()
+        self.assertEqual(self.pair.last_price, Decimal('25'))
+        self.assertEqual(self.pair.price_change_24h_percent, Decimal('25.00'))
+        self.assertEqual(self.pair.volume_24h, Decimal('0.2'))
+        self.assertIsNone(cache.get('trending_cryptos'))
+
+        # Polling again does not count the same trades twice
+        tracker.flush(self.now)
+        self.btc.refresh_from_db()
+        self.assertEqual(self.btc.volume_24h_usd, Decimal('15000.00'))
+
+
+class IndicatorsTest(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.close = 50000 + np.cumsum(rng.normal(0, 25, 5000))
+        self.high = self.close + rng.random(5000) * 20
+        self.low = self.close - rng.random(5000) * 20
+        self.volume = rng.random(5000)
+
+    def assertSeriesEqual(self, vectorized, incremental):
+        incremental = np.array([np.nan if value is None else value for value in incremental], dtype=float)
+        np.testing.assert_array_equal(np.isnan(vectorized), np.isnan(incremental))
+        np.testing.assert_allclose(vectorized, incremental, rtol=1e-9)
+
+    def test_known_values(self):
+        np.testing.assert_allclose(indicators.sma([1, 2, 3, 4, 5], 3), [np.nan, np.nan, 2, 3, 4])
+        np.testing.assert_allclose(indicators.ema([10, 10, 10, 40], 2), [10, 10, 10, 30])
+        self.assertEqual(indicators.rsi(np.arange(30.0), 14)[-1], 100.0)
+        middle, upper, lower = indicators.bollinger([2, 4, 4, 4, 5, 5, 7, 9], 8)
+        self.assertEqual((middle[-1], upper[-1], lower[-1]), (5.0, 9.0, 1.0))
+
+    def test_long_series_match_a_plain_recurrence(self):
+        """The blocked EMA agrees with the textbook loop across many blocks"""
+        alpha = 2 / 201
+        expected = [self.close[0]]
+        for value in self.close[1:]:
+            expected.append(expected[-1] + alpha * (value - expected[-1]))
+        np.testing.assert_allclose(indicators.ema(self.close, 200), expected, rtol=1e-12)
+
+    def test_incremental_updates_match_vectorized(self):
+        """Appending candles one at a time gives the same series as a full recompute"""
+        sma = indicators.IncrementalSMA(20)
+        self.assertSeriesEqual(indicators.sma(self.close, 20), [sma.update(value) for value in self.close])
+        ema = indicators.IncrementalEMA(12)
+        self.assertSeriesEqual(indicators.ema(self.close, 12), [ema.update(value) for value in self.close])
+        rsi = indicators.IncrementalRSI(14)
+        self.assertSeriesEqual(indicators.rsi(self.close, 14), [rsi.update(value) for value in self.close])
+        bands = indicators.IncrementalBollinger(20)
+        updates = [bands.update(value) for value in self.close]
+        self.assertSeriesEqual(
+            indicators.bollinger(self.close, 20)[1],
+            [None if update is None else update[1] for update in updates]
+        )
+        atr = indicators.IncrementalATR(14)
+        self.assertSeriesEqual(
+            indicators.atr(self.high, self.low, self.close, 14),
+            [atr.update(*candle) for candle in zip(self.high, self.low, self.close)]
+        )
+        vwap = indicators.IncrementalVWAP()
+        self.assertSeriesEqual(
+            indicators.vwap(self.high, self.low, self.close, self.volume),
+            [vwap.update(*candle) for candle in zip(self.high, self.low, self.close, self.volume)]
+        )
+
+
+class BacktestTest(TestCase):
+    def setUp(self):
+        self.start = timezone.datetime(2024, 1, 1, tzinfo=timezone.utc)
+        # One price per hour: down from 100 to 50 over two days, then back up to 150
+        prices = np.concatenate([np.linspace(100, 50, 49), np.linspace(50, 150, 97)[1:]])
+        timestamps = [self.start + timezone.timedelta(hours=hour) for hour in range(len(prices))]
+        self.backtest = Backtest(
+            [int(timestamp.timestamp()) * 10 ** 6 for timestamp in timestamps], prices
+        )
+
+    def test_limit_and_stop_fills_use_the_model_predicates(self):
+        limit = self.backtest.fills_for({'type': 'limit', 'side': 'buy', 'amount': '2', 'limit_price': '60'})
+        self.assertEqual(len(limit), 1)
+        self.assertEqual((limit[0]['price'], limit[0]['usd']), (60.0, 120.0))
+        self.assertLessEqual(self.backtest.prices[limit[0]['index']], 60)
+
+        expired = self.backtest.fills_for({
+            'type': 'limit', 'side': 'buy', 'amount': '2', 'limit_price': '60',
+            'expires_at': (self.start + timezone.timedelta(hours=10)).isoformat(),
+        })
+        self.assertEqual(expired, [])
+
+        # A buy stop at 120 triggers on the way back up; the limit then fills straight away
+        stop_limit = self.backtest.fills_for({
+            'type': 'stop', 'side': 'buy', 'amount': '1', 'stop_price': '120', 'limit_price': '125',
+        })
+        self.assertEqual((stop_limit[0]['reason'], stop_limit[0]['price']), ('stop-limit', 125.0))
+
+        with self.assertRaises(BacktestError):
+            self.backtest.fills_for({'type': 'limit', 'side': 'buy', 'amount': '-1', 'limit_price': '60'})
+
+    def test_recurring_buys_report_pnl_and_drawdown(self):
+        """Daily buys of $100 through a dip and a recovery"""
+        result = self.backtest.run([{'type': 'recurring', 'side': 'buy', 'amount': '100', 'interval': 'daily'}])
+        summary = result['summary']
+
+        # Due every 24h up to the end of the hourly series at 144h
+        prices = [75.0, 50.0, 75.0, 100.0, 125.0, 150.0]
+        self.assertEqual([fill['price'] for fill in result['fills']], prices)
+        self.assertEqual(summary['invested_usd'], 600.0)
+        position = sum(100 / price for price in prices)
+        self.assertAlmostEqual(summary['position'], position, places=6)
+        self.assertAlmostEqual(summary['pnl_usd'], round(position * 150 - 600, 2), places=2)
+        self.assertGreater(summary['max_drawdown_percent'], 0)
+        self.assertEqual(result['equity']['values'][0], 600.0)
+
+    def test_monthly_interval_keeps_to_month_end(self):
+        jan_31 = timezone.datetime(2024, 1, 31, 9, 30, tzinfo=timezone.utc)
+        self.assertEqual(RecurringOrder.interval_after('monthly', jan_31), timezone.datetime(2024, 2, 29, 9, 30, tzinfo=timezone.utc))
+
+
+class LotMatchingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='lots', password='testpassword')
+        self.start = timezone.now() - timezone.timedelta(days=700)
+
+    def fill(self, day, kind, amount, price):
+        return (day, kind, self.start + timezone.timedelta(days=day), Decimal(amount), Decimal(amount) * Decimal(price))
+
+    def matched(self, fills, method):
+        return [(m['buy_id'], m['amount'], m['cost_basis']) for m in match_lots(fills, method)]
+
+    def test_methods_pick_lots_in_their_order(self):
+        fills = [
+            self.fill(1, 'buy', '1', '100'),
+            self.fill(2, 'buy', '1', '300'),
+            self.fill(3, 'buy', '1', '200'),
+            self.fill(4, 'sell', '1.5', '250'),
+        ]
+        self.assertEqual(self.matched(fills, 'fifo'), [(1, Decimal('1'), Decimal('100')), (2, Decimal('0.5'), Decimal('150'))])
+        self.assertEqual(self.matched(fills, 'lifo'), [(3, Decimal('1'), Decimal('200')), (2, Decimal('0.5'), Decimal('150'))])
+        self.assertEqual(self.matched(fills, 'hifo'), [(2, Decimal('1'), Decimal('300')), (3, Decimal('0.5'), Decimal('100'))])
+
+    def test_sales_only_see_earlier_lots(self):
+        fills = [
+            self.fill(1, 'buy', '1', '100'),
+            self.fill(2, 'sell', '1', '150'),
+            self.fill(3, 'buy', '1', '500'),
+            self.fill(4, 'sell', '2', '150'),
+        ]
+        matches = list(match_lots(fills, 'lifo'))
+        self.assertEqual([m['buy_id'] for m in matches], [1, 3, None])
+        sales = list(summarize_sales(iter(matches)))
+        self.assertEqual(sales[1]['matched_amount'], Decimal('1'))
+        self.assertEqual(sales[1]['proceeds'], Decimal('300'))
+        self.assertEqual(sales[1]['gain_loss'], Decimal('-200'))
+        self.assertFalse(sales[1]['is_long_term'])
+
+    def test_heap_hifo_matches_a_full_sort(self):
+        rng = np.random.default_rng(3)
+        matcher, lots = LotMatcher('hifo'), []
+        for day in range(2000):
+            if rng.random() < 0.6 or not lots:
+                price = Decimal(int(rng.integers(100, 200)))
+                matcher.acquire(day, self.start, Decimal('1'), price)
+                lots.append([-price, day, Decimal('1')])
+                continue
+
+            # Reference: re-sort the open lots before every sale
+            need, expected = Decimal('0.7'), []
+            lots.sort()
+            while need > 0 and lots:
+                used = min(need, lots[0][2])
+                expected.append((lots[0][1], used, used * -lots[0][0]))
+                lots[0][2] -= used
+                need -= used
+                if lots[0][2] <= 0:
+                    lots.pop(0)
+            matches = matcher.dispose(day, self.start, Decimal('0.7'), Decimal('105'))
+            self.assertEqual([(m['buy_id'], m['amount'], m['cost_basis']) for m in matches], expected)
+
+    def test_calculator_uses_up_lots_sold_in_earlier_years(self):
+        year = timezone.now().year
+        rows = [
+            ('buy', '1', '10000', datetime(year - 2, 3, 1)),
+            ('buy', '1', '20000', datetime(year - 1, 3, 1)),
+            ('sell', '1', '30000', datetime(year - 1, 6, 1)),
+            ('sell', '1', '40000', datetime(year, 1, 2)),
+        ]
+        for kind, amount, native, created in rows:
+            tx = Transaction.objects.create(
+                user=self.user, transaction_type=kind, amount=Decimal(amount), currency='BTC',
+                native_amount=Decimal(native), native_currency='USD', status='completed',
+            )
+            Transaction.objects.filter(pk=tx.pk).update(created_at=created.replace(tzinfo=dt_timezone.utc))
+
+        results = TaxCalculator(self.user, year, 'fifo').calculate_cost_basis('BTC')
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['transaction'].native_amount, Decimal('40000'))
+        # The January sale gets the second lot; the first went with last year's sale
+        self.assertEqual(results[0]['cost_basis'], Decimal('20000'))
+        self.assertEqual(results[0]['gain_loss'], Decimal('20000'))
+        self.assertFalse(results[0]['is_long_term'])
+
+class AverageCostPoolTest(TestCase):
+    def setUp(self):
+        self.start = datetime(2022, 1, 1, tzinfo=dt_timezone.utc)
+
+    def at(self, days):
+        return self.start + timezone.timedelta(days=days)
+
+    def test_sales_keep_the_running_average(self):
+        pool = AverageCostPool()
+        pool.acquire(1, self.at(0), Decimal('1'), Decimal('100'))
+        pool.acquire(2, self.at(100), Decimal('3'), Decimal('500'))
+
+        first = list(pool.dispose(3, self.at(200), Decimal('2'), Decimal('400')))
+        self.assertEqual(first[0]['cost_basis'], Decimal('300'))
+        self.assertEqual(pool.open_position(), (Decimal('2'), Decimal('300')))
+
+        # A buy after the sale moves the average; the earlier sale does not
+        pool.acquire(4, self.at(300), Decimal('2'), Decimal('500'))
+        second = list(pool.dispose(5, self.at(400), Decimal('2'), Decimal('600')))
+        self.assertEqual(second[0]['cost_basis'], Decimal('400'))
+
+    def test_holding_period_uses_the_weighted_acquisition_time(self):
+        pool = AverageCostPool()
+        pool.acquire(1, self.at(0), Decimal('1'), Decimal('100'))
+        pool.acquire(2, self.at(400), Decimal('1'), Decimal('100'))
+        # Average acquisition on day 200
+        short, = pool.dispose(3, self.at(500), Decimal('1'), Decimal('150'))
+        self.assertEqual(short['acquired_at'], self.at(200))
+        self.assertFalse(short['is_long_term'])
+        long, = pool.dispose(4, self.at(565), Decimal('1'), Decimal('150'))
+        self.assertTrue(long['is_long_term'])
+
+    def test_calculator_streams_one_query_per_asset(self):
+        user = User.objects.create_user(username='acb', password='testpassword')
+        year = timezone.now().year
+        for day in range(60):
+            kind = 'sell' if day % 3 == 2 else 'buy'
+            tx = Transaction.objects.create(
+                user=user, transaction_type=kind, amount=Decimal('1'), currency='ETH',
+                native_amount=Decimal(1000 + day * 10), native_currency='USD', status='completed',
+            )
+            Transaction.objects.filter(pk=tx.pk).update(created_at=datetime(year, 1, 1, tzinfo=dt_timezone.utc) + timezone.timedelta(days=day))
+
+        calculator = TaxCalculator(user, year, 'acb')
+        # The fill stream, then the sale rows for the results
+        with self.assertNumQueries(2):
+            results = calculator.calculate_cost_basis('ETH')
+        self.assertEqual(len(results), 20)
+        # Day 2: two units bought at 1000 and 1010
+        self.assertEqual(results[0]['cost_basis'], Decimal('1005'))
+        self.assertEqual(results[0]['gain_loss'], Decimal('15'))
+
+@override_settings(TAX_LEDGER_ASYNC=False)
+class TaxLedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ledger', password='testpassword')
+        self.start = timezone.now() - timezone.timedelta(days=800)
+        self.day = 0
+
+    def fill(self, kind, amount, native, days=1):
+        self.day += days
+        tx = Transaction.objects.create(
+            user=self.user, transaction_type=kind, amount=Decimal(amount), currency='BTC',
+            native_amount=Decimal(native), native_currency='USD', status='completed',
+        )
+        Transaction.objects.filter(pk=tx.pk).update(created_at=self.start + timezone.timedelta(days=self.day))
+        return tx
+
+    @staticmethod
+    def rounded(sales):
+        # Stored gains carry 8 decimal places, so compare to the cent
+        cent = Decimal('0.01')
+        return [
+            (sale['sell_id'], sale['cost_basis'].quantize(cent), sale['proceeds'].quantize(cent), sale['is_long_term'])
+            for sale in sales
+        ]
+
+    def replayed(self, method):
+        return self.rounded(summarize_sales(match_lots(stream_fills(self.user, 'BTC'), method)))
+
+    def ledger_sales(self, ledger):
+        return self.rounded(ledger.sales(self.start, timezone.now()))
+
+    def test_incremental_syncs_match_a_full_replay(self):
+        rng = np.random.default_rng(11)
+        for method in ('fifo', 'lifo', 'hifo', 'acb'):
+            Transaction.objects.filter(user=self.user).delete()
+            ledger = TaxLedger(self.user, 'BTC')
+            for step in range(40):
+                if rng.random() < 0.6:
+                    self.fill('buy', '1', int(rng.integers(100, 300)) * 10)
+                else:
+                    self.fill('sell', '0.75', int(rng.integers(100, 300)) * 10)
+                if step % 4 == 0:
+                    ledger.sync(method)
+            ledger.sync(method)
+            self.assertEqual(TaxLedgerCheckpoint.objects.get(user=self.user).fill_count, 40)
+            self.assertEqual(self.ledger_sales(ledger), self.replayed(method), method)
+
+    def test_sells_consume_lots_and_delete_emptied_ones(self):
+        ledger = TaxLedger(self.user, 'BTC')
+        first = self.fill('buy', '1', '100')
+        self.fill('buy', '1', '300')
+        ledger.sync('fifo')
+        self.fill('sell', '1.5', '600')
+        ledger.sync('fifo')
+
+        self.assertFalse(TaxLot.objects.filter(transaction=first).exists())
+        self.assertEqual(TaxLot.objects.get().remaining, Decimal('0.5'))
+        self.assertEqual(ledger.open_position(), (Decimal('0.5'), Decimal('150')))
+        gains = RealizedGain.objects.order_by('acquired_at')
+        self.assertEqual([gain.cost_basis for gain in gains], [Decimal('100'), Decimal('150')])
+
+    def test_partial_sells_match_between_incremental_and_rebuilt_ledgers(self):
+        fills = [('buy', '3', '100.01'), ('sell', '1', '40'), ('buy', '7', '333.33'), ('sell', '2.5', '150'), ('sell', '0.3', '19.99')]
+        for method in ('fifo', 'lifo', 'hifo'):
+            Transaction.objects.filter(user=self.user).delete()
+            ledger = TaxLedger(self.user, 'BTC')
+            for kind, amount, native in fills:
+                self.fill(kind, amount, native)
+                ledger.sync(method)
+            incremental = (ledger.sales(self.start, timezone.now()), ledger.open_position())
+
+            TaxLedgerCheckpoint.objects.filter(user=self.user).update(synced_at=None)
+            ledger.sync(method)
+            self.assertEqual((ledger.sales(self.start, timezone.now()), ledger.open_position()), incremental, method)
+
+    def test_method_change_rebuilds_the_ledger(self):
+        self.fill('buy', '1', '100')
+        self.fill('buy', '1', '300')
+        self.fill('sell', '1', '200')
+        ledger = TaxLedger(self.user, 'BTC')
+        ledger.sync()
+        self.assertEqual(ledger.sales(self.start, timezone.now())[0]['cost_basis'], Decimal('100'))
+
+        CoinbaseUser.objects.filter(user=self.user).update(cost_basis_method='hifo')
+        ledger.sync()
+        self.assertEqual(TaxLedgerCheckpoint.objects.get(user=self.user).method, 'hifo')
+        self.assertEqual(ledger.sales(self.start, timezone.now())[0]['cost_basis'], Decimal('300'))
+
+    def test_fills_landing_before_the_checkpoint_rebuild_the_ledger(self):
+        self.fill('buy', '1', '100')
+        self.fill('sell', '1', '200', days=10)
+        ledger = TaxLedger(self.user, 'BTC')
+        ledger.sync('fifo')
+        # A buy that commits late, dated before the sale it should have covered
+        self.day -= 5
+        self.fill('buy', '1', '50')
+        ledger.sync('fifo')
+        self.assertEqual(self.ledger_sales(ledger), self.replayed('fifo'))
+        self.assertEqual(TaxLedgerCheckpoint.objects.get(user=self.user).fill_count, 3)
+
+    def test_late_commits_within_the_window_rebuild_the_ledger(self):
+        self.fill('buy', '1', '100')
+        self.fill('sell', '1', '200', days=0)
+        ledger = TaxLedger(self.user, 'BTC')
+        ledger.sync('fifo')
+        # Saved before the sync read, committed after it, dated just before the sale
+        late = self.fill('buy', '1', '50', days=0)
+        cursor = TaxLedgerCheckpoint.objects.get(user=self.user)
+        Transaction.objects.filter(pk=late.pk).update(
+            created_at=cursor.last_created_at - timezone.timedelta(minutes=1),
+            updated_at=cursor.synced_at - timezone.timedelta(seconds=1),
+        )
+        ledger.sync('fifo')
+        self.assertEqual(self.ledger_sales(ledger), self.replayed('fifo'))
+
+    def test_cancelled_and_deleted_fills_rebuild_the_ledger(self):
+        first = self.fill('buy', '1', '100')
+        second = self.fill('buy', '1', '300')
+        self.fill('sell', '1', '200')
+        ledger = TaxLedger(self.user, 'BTC')
+        ledger.sync('fifo')
+
+        first.refresh_from_db()
+        first.status = 'failed'
+        first.save()
+        ledger.sync('fifo')
+        self.assertEqual(ledger.sales(self.start, timezone.now())[0]['cost_basis'], Decimal('300'))
+
+        second.delete()
+        ledger.sync('fifo')
+        self.assertEqual(self.ledger_sales(ledger), self.replayed('fifo'))
+        self.assertEqual(TaxLedgerCheckpoint.objects.get(user=self.user).fill_count, 1)
+
+    def test_settled_fills_update_the_ledger_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            buy = self.fill('buy', '2', '500')
+        self.assertEqual(TaxLot.objects.get().transaction_id, buy.pk)
+
+    def test_calculator_reads_the_ledger_for_the_users_method(self):
+        self.fill('buy', '1', '100')
+        self.fill('buy', '1', '300')
+        sell = self.fill('sell', '1', '250', days=500)
+        year = (self.start + timezone.timedelta(days=self.day)).year
+
+        calculator = TaxCalculator(self.user, year)
+        self.assertTrue(calculator.uses_ledger)
+        result, = calculator.calculate_cost_basis('BTC')
+        self.assertEqual((result['transaction'], result['cost_basis'], result['is_long_term']), (sell, Decimal('100'), True))
+        self.assertTrue(RealizedGain.objects.filter(sell_transaction=sell).exists())
+
+        # Other methods are answered from a replay and leave the ledger alone
+        what_if = TaxCalculator(self.user, year, 'hifo')
+        self.assertFalse(what_if.uses_ledger)
+        self.assertEqual(what_if.calculate_cost_basis('BTC')[0]['cost_basis'], Decimal('300'))
+        self.assertEqual(TaxLedgerCheckpoint.objects.get(user=self.user).method, 'fifo')
+
+class TaxTransactionUpsertTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='taxpayer', password='testpassword')
+        self.year = timezone.now().year
+        buy = Transaction.objects.create(
+            user=self.user, transaction_type='buy', status='completed', currency='BTC',
+            amount=Decimal('10'), native_amount=Decimal('1000')
+        )
+        Transaction.objects.filter(pk=buy.pk).update(created_at=datetime(self.year, 1, 1, tzinfo=dt_timezone.utc))
+        for day in range(1, 6):
+            sell = Transaction.objects.create(
+                user=self.user, transaction_type='sell', status='completed', currency='BTC',
+                amount=Decimal('1'), native_amount=Decimal('150')
+            )
+            Transaction.objects.filter(pk=sell.pk).update(created_at=datetime(self.year, 1, 1 + day, tzinfo=dt_timezone.utc))
+
+    @override_settings(TAX_TRANSACTION_BATCH_SIZE=2)
+    def test_rows_are_upserted_in_batches(self):
+        calculator = TaxCalculator(self.user, self.year)
+        sales = calculator.calculate_cost_basis('BTC')
+        stale = TaxTransaction.objects.create(
+            transaction=sales[0]['transaction'], gain_loss=Decimal('0'), tax_year=2000
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            calculator._save_tax_transactions(sales)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 3)
+
+        self.assertEqual(TaxTransaction.objects.count(), 5)
+        stale.refresh_from_db()
+        self.assertEqual(stale.tax_year, self.year)
+        self.assertEqual(stale.gain_loss, Decimal('50'))
+        self.assertEqual(
+            set(TaxTransaction.objects.values_list('tax_category', flat=True)), {'capital_gain'}
+        )
+
+class SeedLoaderTest(TestCase):
+    def test_seed_command_loads_every_kind_without_signals(self):
+        call_command(
+            'seed_load_data', users=4, transactions=30, limit_orders=10, stop_orders=5, recurring_orders=5,
+            price_points=12, news=3, batch_size=8, stdout=io.StringIO(),
+        )
+        users = User.objects.filter(username__startswith='seed_')
+        self.assertEqual(users.count(), 4)
+        # Profiles and default wallets are written in bulk, once per user
+        self.assertEqual(CoinbaseUser.objects.filter(user__in=users).count(), 4)
+        self.assertEqual(Wallet.objects.filter(user__in=users).count(), 12)
+        self.assertEqual(Transaction.objects.filter(user__in=users).count(), 30)
+        self.assertEqual(LimitOrder.objects.count(), 10)
+        self.assertEqual(StopOrder.objects.count(), 5)
+        self.assertFalse(RecurringOrder.objects.filter(next_execution__isnull=True).exists())
+        self.assertEqual(RecurringOrder.objects.count(), 5)
+        self.assertEqual(PriceHistory.objects.count(), 12 * CryptoCurrency.objects.count())
+        self.assertEqual(News.objects.filter(related_cryptocurrencies__isnull=False).count(), 3)
+
+        # Seeded rows keep their generated times and wallets match the transaction type
+        buy = Transaction.objects.filter(transaction_type='buy').select_related('from_wallet', 'to_wallet').first()
+        self.assertEqual(buy.from_wallet.currency_code, 'USD')
+        self.assertEqual(buy.to_wallet.currency_code, buy.currency)
+        self.assertLess(Transaction.objects.order_by('created_at').first().created_at, timezone.now() - timezone.timedelta(days=1))
+
+    def test_same_seed_generates_same_rows(self):
+        now = timezone.now()
+        first = SeedLoader(seed=7, batch_size=20, now=now)
+        second = SeedLoader(seed=7, batch_size=20, now=now)
+        for loader in (first, second):
+            loader.prices = {'BTC': 50000.0, 'ETH': 3000.0}
+            loader.accounts = [(1, 10, 11, 12), (2, 20, 21, 22)]
+        self.assertEqual(first.transaction_rows(1, 50), second.transaction_rows(1, 50))
+        self.assertEqual(len(first.transaction_rows(2, 50)), 10)
+        self.assertNotEqual(first.transaction_rows(0, 50), first.transaction_rows(1, 50))
+        self.assertEqual(first.limit_order_rows(0, 5), second.limit_order_rows(0, 5))
+
+
+class BenchmarkTest(TestCase):
+    def test_measure_rolls_each_run_back_and_counts_queries(self):
+        currency = CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('50000.00'))
+
+        def bump():
+            CryptoCurrency.objects.filter(code='BTC').update(current_price_usd=F('current_price_usd') + 1)
+            CryptoCurrency.objects.get(code='BTC')
+
+        summary = measure(bump, repeat=5, warmup=1)
+        self.assertEqual(summary['runs'], 5)
+        self.assertEqual(summary['queries'], 2)
+        self.assertLessEqual(summary['p50_ms'], summary['p95_ms'])
+        currency.refresh_from_db()
+        self.assertEqual(currency.current_price_usd, Decimal('50000.00'))
+
+    def test_compare_flags_query_growth_and_slower_medians(self):
+        baseline = {'small': {
+            'dashboard': {'p50_ms': 10.0, 'queries': 6},
+            'tax_report': {'p50_ms': 40.0, 'queries': 120},
+            'api_news': {'p50_ms': 0.2, 'queries': 5},
+        }}
+        results = {'small': {
+            'dashboard': {'p50_ms': 11.0, 'queries': 7},
+            'tax_report': {'p50_ms': 60.0, 'queries': 120},
+            # Far over the tolerance, but by less than a millisecond
+            'api_news': {'p50_ms': 0.9, 'queries': 5},
+            'create_trade': {'p50_ms': 500.0, 'queries': 50},
+        }}
+        regressions = compare(results, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('small/dashboard: 7 queries', regressions[0])
+        self.assertIn('small/tax_report: p50 60.00 ms', regressions[1])
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_buckets_are_contiguous_and_tight(self):
+        previous_high = -1
+        for index in range(bucket_index(10 ** 9) + 1):
+            low, high = bucket_bounds(index)
+            self.assertEqual(low, previous_high + 1)
+            self.assertEqual(bucket_index(low), index)
+            self.assertEqual(bucket_index(high), index)
+            self.assertLessEqual(high - low, low / 32 + 1)
+            previous_high = high
+
+    def test_percentiles_track_exact_values(self):
+        rng = np.random.default_rng(7)
+        latencies = rng.lognormal(mean=10, sigma=1.2, size=20000)
+        histogram = LatencyHistogram()
+        for value in latencies:
+            histogram.record(value)
+        for q in (50, 90, 99):
+            exact = np.percentile(latencies, q)
+            self.assertAlmostEqual(histogram.percentile(q) / exact, 1, delta=0.02)
+        self.assertEqual(histogram.max, int(latencies.max()))
+
+    def test_collect_merges_every_process(self):
+        workers = [MetricsRegistry(), MetricsRegistry()]
+        for worker, millis in zip(workers, (10, 30)):
+            for _ in range(50):
+                worker.record('dashboard', millis / 1000, queries=4, db_seconds=0.002)
+            worker.record('api:wallet-list', 0.005, status_code=500)
+            worker.flush()
+
+        endpoints = MetricsRegistry().collect()
+        dashboard = endpoints['dashboard'].summary()
+        self.assertEqual(dashboard['count'], 100)
+        self.assertAlmostEqual(dashboard['p50_ms'], 10, delta=0.2)
+        self.assertAlmostEqual(dashboard['p99_ms'], 30, delta=0.5)
+        self.assertEqual(dashboard['queries_per_request'], 4)
+        self.assertAlmostEqual(dashboard['db_ms_per_request'], 2)
+        self.assertEqual(endpoints['api:wallet-list'].summary()['errors'], 2)
+
+    def test_query_timer_counts_without_debug(self):
+        with QueryTimer() as timer:
+            list(CryptoCurrency.objects.all())
+            CryptoCurrency.objects.filter(code='BTC').exists()
+        self.assertEqual(timer.count, 2)
+        self.assertGreater(timer.seconds, 0)
+
+    def test_stack_sampler_sees_the_running_function(self):
+        def busy_loop():
+            deadline = time.perf_counter() + 0.1
+            while time.perf_counter() < deadline:
+                pass
+
+        with StackSampler(interval=0.002) as sampler:
+            busy_loop()
+        self.assertGreater(sampler.samples, 5)
+        self.assertIn(':busy_loop:', sampler.collapsed())
+
+class StubPriceHandler(BaseHTTPRequestHandler):
+    """Answers like the price API after a short delay, counting requests per coin"""
+    prices = {'bitcoin': 50000.5, 'ethereum': 2500.25}
+    delay = 0.2
+    requests_seen = []
+
+    def do_GET(self):
+        coin_id = parse_qs(urlparse(self.path).query)['ids'][0]
+        self.requests_seen.append(coin_id)
+        time.sleep(self.delay)
+        if coin_id not in self.prices:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps({coin_id: {'usd': self.prices[coin_id]}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PriceClientTest(TestCase):
+    def setUp(self):
+        StubPriceHandler.requests_seen = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubPriceHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client = PriceClient(base_url=f'http://127.0.0.1:{self.server.server_port}/price', timeout=2, ttl=30)
+
+    def test_concurrent_callers_share_one_request(self):
+        """Fan-out is concurrent, duplicate symbols coalesce and answers are cached"""
+        async def fetch():
+            return await asyncio.gather(
+                self.client.get_prices(['BTC', 'ETH']),
+                self.client.get_price('bitcoin'),
+                self.client.get_price('BTC'),
+            )
+
+        started = time.monotonic()
+        prices, bitcoin, btc = asyncio.run(fetch())
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(prices, {'BTC': Decimal('50000.5'), 'ETH': Decimal('2500.25')})
+        self.assertEqual(bitcoin, btc)
+        self.assertEqual(sorted(StubPriceHandler.requests_seen), ['bitcoin', 'ethereum'])
+        self.assertLess(elapsed, 2 * StubPriceHandler.delay)
+
+        self.assertEqual(self.client.get_price_sync('BTC'), Decimal('50000.5'))
+        self.assertEqual(len(StubPriceHandler.requests_seen), 2)
+
+    def test_failures_return_none_and_are_not_cached(self):
+        """Unknown coins and timeouts give None"""
+        self.assertIsNone(self.client.get_price_sync('NOPE'))
+        self.assertIsNone(self.client.get_price_sync('NOPE'))
+        self.assertEqual(StubPriceHandler.requests_seen, ['nope', 'nope'])
+
+        impatient = PriceClient(base_url=self.client.base_url, timeout=0.05)
+        self.assertIsNone(impatient.get_price_sync('ETH'))
+
+
+class LedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ledgeruser', password='testpassword')
+        self.usd_wallet = Wallet.objects.create(
+            user=self.user,
+            currency_code='USD',
+            balance=Decimal('1000.00'),
+            address='ledger-usd'
+        )
+        self.btc_wallet = Wallet.objects.create(
+            user=self.user,
+            currency_code='BTC',
+            balance=Decimal('0.5'),
+            address='ledger-btc'
+        )
+
+    def test_transfer_returns_new_balances(self):
+        """A transfer debits and credits both wallets and reports the result"""
+        # Stale instances must not matter: the ledger works from the locked rows
+        Wallet.objects.filter(pk=self.usd_wallet.pk).update(balance=Decimal('1500.00'))
+
+        balances = ledger.transfer(self.usd_wallet, self.btc_wallet, Decimal('1200.00'), Decimal('0.02'))
+
+        self.assertEqual(balances, (Decimal('300.00'), Decimal('0.52')))
+        self.usd_wallet.refresh_from_db()
+        self.assertEqual(self.usd_wallet.balance, Decimal('300.00'))
+
+    def test_overdraft_writes_nothing(self):
+        """A debit that would go below zero raises and leaves every wallet unchanged"""
+        with self.assertRaises(ledger.InsufficientFunds) as raised:
+            ledger.post([(self.btc_wallet, Decimal('1.0')), (self.usd_wallet, Decimal('-1000.01'))])
+
+        self.assertEqual(raised.exception.wallet_id, self.usd_wallet.pk)
+        self.btc_wallet.refresh_from_db()
+        self.assertEqual(self.btc_wallet.balance, Decimal('0.5'))
+
+
+class OrderBookTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        order_books.clear()
+        self.user = User.objects.create_user(username='bookuser', password='testpassword')
+        self.btc = CryptoCurrency.objects.create(
+            code='BTC',
+            name='Bitcoin',
+            current_price_usd=Decimal('50000.00')
+        )
+        self.usd_wallet = Wallet.objects.create(
+            user=self.user,
+            currency_code='USD',
+            balance=Decimal('100000.00'),
+            address='book-usd'
+        )
+        self.btc_wallet = Wallet.objects.create(
+            user=self.user,
+            currency_code='BTC',
+            balance=Decimal('5.0'),
+            address='book-btc'
+        )
+
+    def _order(self, side, limit_price, amount='1.0'):
+        from_wallet, to_wallet = (
+            (self.usd_wallet, self.btc_wallet) if side == 'buy' else (self.btc_wallet, self.usd_wallet)
+        )
+        return LimitOrder.objects.create(
+            user=self.user,
+            cryptocurrency=self.btc,
+            side=side,
+            amount=Decimal(amount),
+            limit_price=Decimal(limit_price),
+            from_wallet=from_wallet,
+            to_wallet=to_wallet
+        )
+
+    def test_price_time_priority(self):
+        """Best prices come first and orders at one price keep arrival order"""
+        book = OrderBook('BTC')
+        book.add_order('a', 'buy', Decimal('100'), Decimal('1'))
+        book.add_order('b', 'buy', Decimal('101'), Decimal('2'))
+        book.add_order('c', 'buy', Decimal('101'), Decimal('3'))
+        book.add_order('d', 'sell', Decimal('103'), Decimal('1'))
+        book.add_order('e', 'sell', Decimal('102'), Decimal('1'))
+
+        self.assertEqual(book.best_bid(), Decimal('101'))
+        self.assertEqual(book.best_ask(), Decimal('102'))
+        self.assertEqual(book.spread(), Decimal('1'))
+        self.assertEqual([order_id for order_id, _, _ in book.iter_orders('buy')], ['b', 'c', 'a'])
+        self.assertEqual(book.depth()['bids'][0], {'price': Decimal('101'), 'amount': Decimal('5'), 'orders': 2})
+
+        # Partial fills keep queue position; emptying a level removes it
+        book.add_order('b', 'buy', Decimal('101'), Decimal('1'))
+        self.assertEqual([order_id for order_id, _, _ in book.iter_orders('buy')], ['b', 'c', 'a'])
+        book.remove_order('b')
+        book.remove_order('c')
+        self.assertEqual(book.best_bid(), Decimal('100'))
+        self.assertEqual(len(book.bids), 1)
+
+    def test_registry_loads_and_tracks_orders(self):
+        """Books load open orders once and follow creates, cancels and fills"""
+        resting = self._order('buy', '49000.00')
+        self._order('sell', '51000.00', amount='0.5')
+
+        book = order_books.get('BTC')
+        self.assertEqual(book.best_bid(), Decimal('49000.00'))
+        self.assertEqual(book.best_ask(), Decimal('51000.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            better = self._order('buy', '49500.00')
+        with self.assertNumQueries(0):
+            self.assertEqual(order_books.get('BTC').best_bid(), Decimal('49500.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            better.cancel()
+        with self.captureOnCommitCallbacks(execute=True):
+            resting.status = 'filled'
+            resting.save()
+
+        with self.assertNumQueries(0):
+            book = order_books.get('BTC')
+            self.assertIsNone(book.best_bid())
+            self.assertEqual(book.top_of_book()['ask_amount'], Decimal('0.5'))
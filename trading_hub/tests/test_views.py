@@ -1,14 +1,26 @@
-from django.test import TestCase, Client
-from django.urls import reverse
+from django.test import TestCase, Client, RequestFactory, modify_settings, override_settings
+from django.http import HttpResponse
+from django.core.cache import cache
+from django.urls import resolve, reverse
 from django.contrib.auth.models import User
 from django.utils import timezone
 from decimal import Decimal
+import importlib
 import json
+import tempfile
+import time
 
 from trading_hub.models import (
     CryptoCurrency, Wallet, Transaction, LimitOrder, 
-    StopOrder, RecurringOrder, TaxReport
+    StopOrder, RecurringOrder, TaxReport, TaxTransaction, PriceHistory
 )
+from trading_hub.services.candles import CandleAggregator
+from trading_hub.services.order_book import order_books
+from trading_hub.middleware.metrics import RequestMetricsMiddleware
+from trading_hub.middleware.query_budget import QueryBudgetMiddleware
+from trading_hub.services.query_budget import QueryBudgetAssertions, QueryBudgetExceeded, QueryCounter, query_budget
+from trading_hub.services.request_metrics import registry
+from trading_hub.services.tax_reports import enqueue_tax_report
 
 class DashboardViewTest(TestCase):
     def setUp(self):
@@ -201,3 +213,423 @@ class TaxCenterViewTest(TestCase):
         self.assertTrue(2022 in response.context['tax_years'])
         self.assertTrue(2023 in response.context['tax_years'])
         self.assertTrue(timezone.now().year in response.context['tax_years'])
+
+@override_settings(TAX_REPORTS_ASYNC=False, MEDIA_ROOT=tempfile.mkdtemp())
+class TaxReportGenerationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpassword')
+        
+        now = timezone.now()
+        buy = Transaction.objects.create(
+            user=self.user, transaction_type='buy', status='completed', currency='BTC',
+            amount=Decimal('1.0'), native_amount=Decimal('20000.00'), native_currency='USD'
+        )
+        sell = Transaction.objects.create(
+            user=self.user, transaction_type='sell', status='completed', currency='BTC',
+            amount=Decimal('0.5'), native_amount=Decimal('15000.00'), native_currency='USD'
+        )
+        Transaction.objects.filter(pk=buy.pk).update(created_at=now.replace(month=1, day=1, hour=0))
+        Transaction.objects.filter(pk=sell.pk).update(created_at=now)
+    
+    def test_create_tax_report_runs_in_background(self):
+        """Test the report is queued pending and completed by the task"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('create_tax_report'), {
+                'tax_year': timezone.now().year,
+                'cost_basis_method': 'fifo',
+                'report_format': 'csv',
+            })
+        report = TaxReport.objects.get(user=self.user)
+        self.assertRedirects(response, reverse('tax_report_detail', args=[report.id]), fetch_redirect_response=False)
+        self.assertEqual(report.status, 'pending')
+        self.assertEqual(report.progress, 0)
+        self.assertEqual(len(callbacks), 1)
+        
+        callbacks[0]()
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'completed')
+        self.assertEqual(report.progress, 100)
+        self.assertEqual(report.cost_basis_method, 'fifo')
+        self.assertTrue(report.report_file)
+        self.assertEqual(TaxTransaction.objects.filter(transaction__user=self.user).count(), 1)
+    
+    def test_failed_report_records_error(self):
+        """Test an error during generation marks the report failed"""
+        with self.captureOnCommitCallbacks(execute=True):
+            report = enqueue_tax_report(self.user, timezone.now().year, 'nope')
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'failed')
+        self.assertIn('Invalid cost basis method', report.error_message)
+        
+        data = self.client.get(reverse('tax_report_status', args=[report.id])).json()
+        self.assertEqual(data['status'], 'failed')
+        self.assertIn('Invalid cost basis method', data['error'])
+    
+    def test_tax_report_status(self):
+        """Test the status endpoint reports progress and the download link"""
+        report = TaxReport.objects.create(user=self.user, tax_year=2023, status='processing', progress=40)
+        response = self.client.get(reverse('tax_report_status', args=[report.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'id': str(report.id), 'status': 'processing', 'progress': 40})
+        
+        TaxReport.objects.filter(pk=report.pk).update(status='completed', progress=100)
+        data = self.client.get(reverse('tax_report_status', args=[report.id])).json()
+        self.assertEqual(data['download_url'], reverse('download_tax_report', args=[report.id]))
+    
+    def test_tax_report_status_is_private(self):
+        """Test other users cannot poll a report"""
+        other = User.objects.create_user(username='other', password='testpassword')
+        report = TaxReport.objects.create(user=other, tax_year=2023)
+        response = self.client.get(reverse('tax_report_status', args=[report.id]))
+        self.assertEqual(response.status_code, 404)
+
+class OrderBookViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        order_books.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = Client()
+
+        self.btc = CryptoCurrency.objects.create(
+            code='BTC',
+            name='Bitcoin',
+            current_price_usd=Decimal('50000.00')
+        )
+        self.usd_wallet = Wallet.objects.create(
+            user=self.user,
+            currency_code='USD',
+            balance=Decimal('100000.0'),
+            address='usd-address-book'
+        )
+        self.btc_wallet = Wallet.objects.create(
+            user=self.user,
+            currency_code='BTC',
+            balance=Decimal('1.0'),
+            address='btc-address-book'
+        )
+        for price, amount in (('49000.00', '0.5'), ('48000.00', '1.0')):
+            LimitOrder.objects.create(
+                user=self.user,
+                cryptocurrency=self.btc,
+                side='buy',
+                amount=Decimal(amount),
+                limit_price=Decimal(price),
+                from_wallet=self.usd_wallet,
+                to_wallet=self.btc_wallet
+            )
+        LimitOrder.objects.create(
+            user=self.user,
+            cryptocurrency=self.btc,
+            side='sell',
+            amount=Decimal('0.2'),
+            limit_price=Decimal('51000.00'),
+            from_wallet=self.btc_wallet,
+            to_wallet=self.usd_wallet,
+            status='cancelled'
+        )
+
+    def test_depth_chart_data_is_cumulative_and_open_only(self):
+        """Depth data aggregates open orders from the best price outwards"""
+        response = self.client.get(reverse('depth_chart_data'), {'code': 'btc'})
+        data = json.loads(response.content)
+
+        self.assertEqual(data['code'], 'BTC')
+        self.assertEqual(data['labels'], [49000.0, 48000.0])
+        self.assertEqual(data['bids'], [0.5, 1.5])
+        self.assertEqual(data['asks'], [])
+
+
+class PriceChartDataViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.btc = CryptoCurrency.objects.create(
+            code='BTC',
+            name='Bitcoin',
+            current_price_usd=Decimal('50000.00')
+        )
+        now = timezone.now()
+        PriceHistory.objects.bulk_create(
+            PriceHistory(
+                currency=self.btc,
+                price_usd=Decimal('50000.00') + (minute % 60) * (1 if minute % 120 < 60 else -1),
+                timestamp=now - timezone.timedelta(minutes=1000 - minute),
+                period='day'
+            )
+            for minute in range(1000)
+        )
+        self.url = reverse('price_chart_data', args=['btc'])
+
+    def test_chart_data_is_downsampled(self):
+        """A day of minute points comes back as the requested number of points"""
+        response = self.client.get(self.url, {'range': '1d', 'points': 100})
+        data = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['source_points'], 1000)
+        self.assertEqual(len(data['timestamps']), 100)
+        self.assertEqual(len(data['prices']), 100)
+        self.assertEqual(data['timestamps'], sorted(data['timestamps']))
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_etag_changes_only_with_new_ticks(self):
+        """Polling clients get 304 until a newer tick is stored"""
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        latest = PriceHistory.objects.create(currency=self.btc, price_usd=Decimal('50100.00'), timestamp=timezone.now(), period='day')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # A tick landing at the newest timestamp counts as new too
+        etag = response['ETag']
+        PriceHistory.objects.create(currency=self.btc, price_usd=Decimal('50200.00'), timestamp=latest.timestamp, period='day')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(self.url, {'range': '10y'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('price_chart_data', args=['NOPE'])).status_code, 404)
+
+
+class PriceIndicatorsViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('50000.00'))
+        aggregator = CandleAggregator(resolutions=['1h'])
+        now = timezone.now()
+        for hour in range(200):
+            aggregator.add_tick('BTC', now - timezone.timedelta(hours=200 - hour), Decimal(50000 + hour * 10), Decimal('1'))
+        aggregator.flush()
+        self.url = reverse('price_indicators', args=['btc'])
+
+    def test_indicators_cover_the_range_and_are_warmed_up(self):
+        response = self.client.get(self.url, {'range': '1d', 'resolution': '1h', 'indicators': 'sma,macd', 'period': 10})
+        data = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        # The hourly buckets starting inside the last day; the last tick is an hour old
+        self.assertEqual(len(data['timestamps']), 23)
+        self.assertEqual(len(data['indicators']['sma']['sma']), 23)
+        self.assertNotIn(None, data['indicators']['sma']['sma'])
+        self.assertEqual(data['indicators']['sma']['sma'][-1], data['close'][-1] - 45)
+        self.assertEqual(set(data['indicators']['macd']), {'macd', 'signal', 'histogram'})
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'indicators': 'magic'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'period': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('price_indicators', args=['NOPE'])).status_code, 404)
+
+
+class BacktestViewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpassword')
+        self.btc = CryptoCurrency.objects.create(code='BTC', name='Bitcoin', current_price_usd=Decimal('50000.00'))
+        self.usd_wallet = Wallet.objects.create(
+            user=self.user, currency_code='USD', balance=Decimal('100000.0'), address='usd-address-backtest'
+        )
+        self.btc_wallet = Wallet.objects.create(
+            user=self.user, currency_code='BTC', balance=Decimal('1.0'), address='btc-address-backtest'
+        )
+        start = timezone.now() - timezone.timedelta(days=10)
+        PriceHistory.objects.bulk_create(
+            PriceHistory(
+                currency=self.btc,
+                price_usd=Decimal(50000 - hour * 50),
+                timestamp=start + timezone.timedelta(hours=hour),
+                period='day'
+            )
+            for hour in range(240)
+        )
+        self.order = LimitOrder.objects.create(
+            user=self.user, cryptocurrency=self.btc, side='buy', amount=Decimal('0.1'),
+            limit_price=Decimal('45000.00'), from_wallet=self.usd_wallet, to_wallet=self.btc_wallet
+        )
+
+    def _post(self, body):
+        return self.client.post(reverse('api_backtest'), json.dumps(body), content_type='application/json')
+
+    def test_backtests_strategies_and_saved_orders(self):
+        response = self._post({
+            'code': 'btc',
+            'orders': [{'type': 'limit', 'id': str(self.order.id)}],
+            'strategies': [{'type': 'stop', 'side': 'sell', 'amount': '0.1', 'stop_price': '40000'}],
+        })
+        data = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([fill['reason'] for fill in data['fills']], ['limit', 'stop'])
+        self.assertEqual(data['summary']['invested_usd'], 4500.0)
+        self.assertEqual(data['points'], 240)
+
+    def test_rejects_invalid_requests(self):
+        self.assertEqual(self._post({'code': 'BTC', 'strategies': [{'type': 'magic'}]}).status_code, 400)
+        self.assertEqual(self._post({'code': 'BTC'}).status_code, 400)
+        self.assertEqual(self._post({'code': 'BTC', 'orders': [{'type': 'limit', 'id': 'nope'}]}).status_code, 400)
+        self.assertEqual(self._post({'code': 'NOPE', 'strategies': []}).status_code, 404)
+
+
+class QueryBudgetViewTest(QueryBudgetAssertions, TestCase):
+    """Page views stay within their query budgets however much the user holds"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='budgetuser', password='testpassword')
+        self.client.login(username='budgetuser', password='testpassword')
+        for number in range(10):
+            code = f'C{number}'
+            CryptoCurrency.objects.create(code=code, name=f'Coin {number}', current_price_usd=Decimal('10.00') * (number + 1))
+            wallet = Wallet.objects.create(
+                user=self.user, currency_code=code, name=f'{code} Wallet', balance=Decimal('2'), address=f'budget-{code}'
+            )
+            for _ in range(6):
+                Transaction.objects.create(
+                    user=self.user, transaction_type='buy', amount=Decimal('1'), currency=code,
+                    native_amount=Decimal('10.00'), status='completed', to_wallet=wallet,
+                )
+
+    def test_dashboard(self):
+        self.assertWithinQueryBudget(reverse('dashboard'))
+
+    def test_wallet_list_prices_wallets_in_one_query(self):
+        response = self.assertWithinQueryBudget(reverse('wallet_list'))
+        # The USD wallet from the signup signal plus two coins in each of ten currencies
+        self.assertEqual(
+            response.context['total_value_usd'], Decimal('1000') + sum(Decimal('20.00') * (n + 1) for n in range(10))
+        )
+
+    def test_asset_list(self):
+        self.assertWithinQueryBudget(reverse('asset_list'))
+
+    def test_transaction_history(self):
+        self.assertWithinQueryBudget(reverse('transaction_history'))
+
+    def test_budgets_do_not_grow_with_data(self):
+        """An N+1 shows up as a higher count once more rows exist"""
+        counts = []
+        for extra in range(2):
+            with QueryCounter() as counter:
+                self.client.get(reverse('wallet_list'))
+            counts.append(counter.count)
+            code = f'X{extra}'
+            CryptoCurrency.objects.create(code=code, name=code, current_price_usd=Decimal('1.00'))
+            Wallet.objects.create(user=self.user, currency_code=code, name=code, address=f'budget-{code}')
+        self.assertEqual(counts[0], counts[1])
+
+
+class QueryBudgetMiddlewareTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _run(self, limit):
+        def wallet_prices(request):
+            for _ in range(4):
+                CryptoCurrency.objects.filter(code='BTC').exists()
+            return HttpResponse('ok')
+
+        view = query_budget(limit)(wallet_prices)
+        middleware = QueryBudgetMiddleware(lambda request: middleware.process_view(request, view, (), {}) or view(request))
+        return middleware(self.factory.get('/coinbase/wallets/'))
+
+    def test_warns_with_structured_details_when_over_budget(self):
+        with self.assertLogs('performance', level='WARNING') as logs:
+            self._run(2)
+        details = logs.records[0].query_budget
+        self.assertEqual((details['view'], details['queries'], details['budget']), ('wallet_prices', 4, 2))
+        self.assertEqual(details['repeated_count'], 4)
+        self.assertIn('trading_hub_cryptocurrency', details['repeated_query'])
+
+    def test_within_budget_is_silent(self):
+        with self.assertNoLogs('performance', level='WARNING'):
+            self.assertEqual(self._run(4).status_code, 200)
+
+    @override_settings(QUERY_BUDGET_MODE='raise')
+    def test_raise_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self._run(1)
+
+
+class RequestMetricsViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.staff = User.objects.create_user(username='ops', password='testpassword', is_staff=True)
+        self.client = Client()
+        self.client.login(username='ops', password='testpassword')
+
+    def tearDown(self):
+        registry.reset()
+
+    def _middleware(self, view):
+        return RequestMetricsMiddleware(view)
+
+    def test_records_latency_and_queries_per_url_name(self):
+        request = RequestFactory().get(reverse('asset_list'))
+        request.resolver_match = resolve(reverse('asset_list'))
+        request.user = self.staff
+
+        def view(request):
+            list(CryptoCurrency.objects.all())
+            return HttpResponse('ok')
+
+        for _ in range(3):
+            self._middleware(view)(request)
+        stats = registry.collect()['asset_list'].summary()
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['queries_per_request'], 1)
+        self.assertGreater(stats['p99_ms'], 0)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        request = RequestFactory().get('/nowhere/')
+        self._middleware(lambda request: HttpResponse('ok'))(request)
+        self.assertEqual(registry.collect(), {})
+
+    def test_staff_can_request_a_profile(self):
+        request = RequestFactory().get('/nowhere/', HTTP_X_PROFILE='1')
+        request.user = self.staff
+
+        def view(request):
+            time.sleep(0.05)
+            return HttpResponse('ok')
+
+        response = self._middleware(view)(request)
+        profile_id = int(response['X-Profile-Id'])
+
+        metrics = self.client.get(reverse('request_metrics')).json()
+        self.assertEqual(metrics['endpoints']['unresolved']['count'], 1)
+        self.assertEqual(metrics['profiles'][0]['id'], profile_id)
+        self.assertGreater(metrics['profiles'][0]['samples'], 0)
+
+        stacks = self.client.get(reverse('request_profile', args=[profile_id]))
+        self.assertIn(':view:', stacks.content.decode())
+
+    def test_profile_header_is_ignored_for_other_users(self):
+        request = RequestFactory().get('/nowhere/', HTTP_X_PROFILE='1')
+        request.user = User.objects.create_user(username='trader', password='testpassword')
+        response = self._middleware(lambda request: HttpResponse('ok'))(request)
+        self.assertNotIn('X-Profile-Id', response)
+
+    @modify_settings(MIDDLEWARE={'append': 'trading_hub.middleware.metrics.RequestMetricsMiddleware'})
+    def test_requests_through_the_stack_are_recorded(self):
+        self.client.get(reverse('request_metrics'), HTTP_X_PROFILE='1')
+        metrics = self.client.get(reverse('request_metrics')).json()
+        self.assertEqual(metrics['endpoints']['request_metrics']['count'], 1)
+        self.assertEqual(len(metrics['profiles']), 1)
+
+    def test_project_middleware_records_requests(self):
+        project = importlib.import_module('the_bit_hub_project.settings')
+        self.assertIn('trading_hub.middleware.metrics.RequestMetricsMiddleware', project.MIDDLEWARE)
+        with override_settings(MIDDLEWARE=project.MIDDLEWARE, ALLOWED_IPS=project.ALLOWED_IPS):
+            response = self.client.get(reverse('request_metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(registry.collect()['request_metrics'].summary()['count'], 1)
+
+    def test_metrics_are_staff_only(self):
+        User.objects.create_user(username='trader', password='testpassword')
+        self.client.login(username='trader', password='testpassword')
+        self.assertEqual(self.client.get(reverse('request_metrics')).status_code, 302)
@@ -12,6 +12,8 @@ urlpatterns = [
     path('assets/<str:code>/buy/', views.buy_crypto, name='buy_crypto'),
     path('assets/<str:code>/sell/', views.sell_crypto, name='sell_crypto'),
     path('assets/<str:code>/send/', views.send_crypto, name='send_crypto'),
+    path('assets/<str:code>/chart-data/', views.price_chart_data, name='price_chart_data'),
+    path('assets/<str:code>/indicators/', views.price_indicators, name='price_indicators'),
     
     # Limit Orders
     path('assets/<str:code>/limit-order/', views.create_limit_order, name='create_limit_order'),
@@ -165,9 +167,17 @@ urlpatterns += [
     path('taxes/', views.tax_center, name='tax_center'),
     path('taxes/create-report/', views.create_tax_report, name='create_tax_report'),
     path('taxes/reports/<uuid:report_id>/', views.tax_report_detail, name='tax_report_detail'),
+    path('taxes/reports/<uuid:report_id>/status/', views.tax_report_status, name='tax_report_status'),
     path('taxes/reports/<uuid:report_id>/download/', views.download_tax_report, name='download_tax_report'),
     path('taxes/summary/', views.annual_tax_summary, name='annual_tax_summary'),  # Default route
     path('taxes/summary/<int:year>/', views.annual_tax_summary, name='annual_tax_summary_with_year'),
     path('taxes/calculator/', views.cost_basis_calculator, name='cost_basis_calculator'),
     path('api/taxes/calculate-cost-basis/', views.api_calculate_cost_basis, name='api_calculate_cost_basis'),
+    path('api/backtest/', views.api_backtest, name='api_backtest'),
+]
+
+# Request metrics (staff only)
+urlpatterns += [
+    path('metrics/', views.request_metrics, name='request_metrics'),
+    path('metrics/profiles/<int:profile_id>/', views.request_profile, name='request_profile'),
 ]
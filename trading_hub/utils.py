@@ -1,19 +1,14 @@
-import requests
+from .services.price_client import get_price_client
 
 
 def get_bitcoin_price():
-    url = 'https://api.coingecko.com/api/v3/simple/price?ids=bitcoin&vs_currencies=usd'
-    response = requests.get(url)
-    data = response.json()
-    return data['bitcoin']['usd']
+    return get_price_client().get_price_sync('bitcoin')
 
 
 def get_current_price(symbol):
-    # Implement the logic to get the current price for the given symbol
-    if symbol == 'bitcoin':
-        return get_bitcoin_price()
-    # Add more symbols as needed
-    return None
+    # Served by the shared pooled client: cached briefly, and concurrent
+    # callers for the same symbol share one request
+    return get_price_client().get_price_sync(symbol)
 
 
 def notify_user(user, message):
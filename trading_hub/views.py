@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 from django.db import transaction
 from decimal import Decimal
@@ -22,12 +22,25 @@ from django.views.generic import ListView, CreateView, UpdateView, DeleteView, D
 from django.urls import reverse_lazy
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST, require_http_methods  # Added require_http_methods import here
+from django.views.decorators.http import require_POST, require_http_methods, condition  # Added require_http_methods import here
+from django.utils.cache import patch_cache_control
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login, authenticate
 from django.db.models import Q
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .services.tax_calculator import TaxCalculator  # Added TaxCalculator import here
+from .services.order_book import order_books
+from .services.charting import ChartSeries, DEFAULT_POINTS, RANGES
+from .services.candles import EPOCH, MAX_POINTS, RESOLUTIONS, get_candles, resolution_for_range
+from .services import indicators
+from .services.backtest import Backtest, BacktestError, parse_spec_datetime, spec_for_order
+from .services import ledger
+from .services.query_budget import query_budget
+from .services.request_metrics import get_profile, recent_profiles, registry
+from .services.tax_ledger import method_for
+from .services.tax_reports import enqueue_tax_report
 import os  # Added os import here
 from django.core.cache import cache
 from django.db.models import Prefetch, Sum, Count
@@ -43,6 +56,7 @@ except (ImportError, ModuleNotFoundError):
             model = APIKey
             fields = ['name', 'permissions', 'allowed_ips']
 
+@query_budget(6)
 @login_required
 def dashboard(request):
     # Get user's wallets - cache for 5 minutes
@@ -95,6 +109,7 @@ def dashboard(request):
         'trending_cryptos': trending_cryptos,
     })
 
+@query_budget(4)
 @login_required
 def asset_list(request):
     user_wallets = Wallet.objects.filter(user=request.user)
@@ -202,7 +217,27 @@ def create_trade(request, code):
                 # Calculate USD cost (with a small spread)
                 usd_amount = amount * crypto.current_price_usd * Decimal('1.005')  # 0.5% spread
                 
-                if usd_wallet.balance < usd_amount:
+                # Create the transaction
+                try:
+                    with transaction.atomic():
+                        # Update wallet balances; the ledger refuses to overdraw the USD wallet
+                        usd_wallet.balance, crypto_wallet.balance = ledger.transfer(
+                            usd_wallet, crypto_wallet, usd_amount, amount
+                        )
+                        tx = Transaction.objects.create(
+                            user=request.user,
+                            transaction_type='buy',
+                            amount=amount,
+                            currency=crypto.code,
+                            native_amount=usd_amount,
+                            native_currency='USD',
+                            status='completed',
+                            description=f"Market buy of {amount} {crypto.code}",
+                            from_wallet=usd_wallet,
+                            to_wallet=crypto_wallet
+                        )
+                except ledger.InsufficientFunds:
+                    usd_wallet.refresh_from_db()
                     messages.error(request, "Insufficient USD balance.")
                     return render(request, 'trading_hub/create_trade.html', {
                         'crypto': crypto, 
@@ -211,33 +246,34 @@ def create_trade(request, code):
                         'is_buy': is_buy,
                     })
                 
-                # Create the transaction
-                with transaction.atomic():
-                    tx = Transaction.objects.create(
-                        user=request.user,
-                        transaction_type='buy',
-                        amount=amount,
-                        currency=crypto.code,
-                        native_amount=usd_amount,
-                        native_currency='USD',
-                        status='completed',
-                        description=f"Market buy of {amount} {crypto.code}",
-                        from_wallet=usd_wallet,
-                        to_wallet=crypto_wallet
-                    )
-                    
-                    # Update wallet balances
-                    usd_wallet.balance -= usd_amount
-                    usd_wallet.save()
-                    
-                    crypto_wallet.balance += amount
-                    crypto_wallet.save()
-                
                 messages.success(request, f"Successfully bought {amount} {crypto.code}")
                 return redirect('crypto_detail', code=crypto.code)
             else:
                 # Sell crypto
-                if crypto_wallet.balance < amount:
+                # Calculate USD amount (with a small spread)
+                usd_amount = amount * crypto.current_price_usd * Decimal('0.995')  # 0.5% spread
+                
+                # Create the transaction
+                try:
+                    with transaction.atomic():
+                        # Update wallet balances; the ledger refuses to overdraw the crypto wallet
+                        crypto_wallet.balance, usd_wallet.balance = ledger.transfer(
+                            crypto_wallet, usd_wallet, amount, usd_amount
+                        )
+                        tx = Transaction.objects.create(
+                            user=request.user,
+                            transaction_type='sell',
+                            amount=amount,
+                            currency=crypto.code,
+                            native_amount=usd_amount,
+                            native_currency='USD',
+                            status='completed',
+                            description=f"Market sell of {amount} {crypto.code}",
+                            from_wallet=crypto_wallet,
+                            to_wallet=usd_wallet
+                        )
+                except ledger.InsufficientFunds:
+                    crypto_wallet.refresh_from_db()
                     messages.error(request, f"Insufficient {crypto.code} balance.")
                     return render(request, 'trading_hub/create_trade.html', {
                         'crypto': crypto, 
@@ -245,31 +281,6 @@ def create_trade(request, code):
                         'usd_wallet': usd_wallet,
                         'is_buy': is_buy,
                     })
-                    
-                # Calculate USD amount (with a small spread)
-                usd_amount = amount * crypto.current_price_usd * Decimal('0.995')  # 0.5% spread
-                
-                # Create the transaction
-                with transaction.atomic():
-                    tx = Transaction.objects.create(
-                        user=request.user,
-                        transaction_type='sell',
-                        amount=amount,
-                        currency=crypto.code,
-                        native_amount=usd_amount,
-                        native_currency='USD',
-                        status='completed',
-                        description=f"Market sell of {amount} {crypto.code}",
-                        from_wallet=crypto_wallet,
-                        to_wallet=usd_wallet
-                    )
-                    
-                    # Update wallet balances
-                    crypto_wallet.balance -= amount
-                    crypto_wallet.save()
-                    
-                    usd_wallet.balance += usd_amount
-                    usd_wallet.save()
                 
                 messages.success(request, f"Successfully sold {amount} {crypto.code}")
                 return redirect('crypto_detail', code=crypto.code)
@@ -317,32 +328,31 @@ def send_crypto(request, code):
                 
             if not address:
                 raise ValueError("Recipient address is required")
-                
-            if wallet.balance < amount:
+            
+            # For demo purposes, just create a transaction
+            try:
+                with transaction.atomic():
+                    # Update wallet balance
+                    wallet.balance = ledger.debit(wallet, amount)
+                    tx = Transaction.objects.create(
+                        user=request.user,
+                        transaction_type='send',
+                        amount=amount,
+                        currency=crypto.code,
+                        native_amount=amount * crypto.current_price_usd,
+                        native_currency='USD',
+                        status='completed',
+                        description=f"Sent {amount} {crypto.code} to {address[:10]}...",
+                        from_wallet=wallet,
+                    )
+            except ledger.InsufficientFunds:
+                wallet.refresh_from_db()
                 messages.error(request, f"Insufficient {crypto.code} balance.")
                 return render(request, 'trading_hub/send_crypto.html', {
                     'crypto': crypto, 
                     'wallet': wallet,
                 })
             
-            # For demo purposes, just create a transaction
-            with transaction.atomic():
-                tx = Transaction.objects.create(
-                    user=request.user,
-                    transaction_type='send',
-                    amount=amount,
-                    currency=crypto.code,
-                    native_amount=amount * crypto.current_price_usd,
-                    native_currency='USD',
-                    status='completed',
-                    description=f"Sent {amount} {crypto.code} to {address[:10]}...",
-                    from_wallet=wallet,
-                )
-                
-                # Update wallet balance
-                wallet.balance -= amount
-                wallet.save()
-            
             messages.success(request, f"Successfully sent {amount} {crypto.code}")
             return redirect('crypto_detail', code=crypto.code)
                 
@@ -731,6 +741,7 @@ def recurring_order_detail(request, order_id):
     
     return render(request, 'trading_hub/recurring_order_detail.html', {'order': order})
 
+@query_budget(4)
 @login_required
 def transaction_history(request):
     # Use pagination to improve performance for users with many transactions
@@ -755,23 +766,26 @@ def transaction_detail(request, transaction_id):
     transaction = get_object_or_404(Transaction, id=transaction_id, user=request.user)
     return render(request, 'trading_hub/transaction_detail.html', {'transaction': transaction})
 
+@query_budget(4)
 @login_required
 def wallet_list(request):
     """View to display all user's wallets"""
-    wallets = Wallet.objects.filter(user=request.user)
+    wallets = list(Wallet.objects.filter(user=request.user))
     
     wallet_data = []
     total_value_usd = Decimal('0.00')
     
+    # Prices for every wallet currency in one query
+    crypto_prices = dict(
+        CryptoCurrency.objects.filter(code__in={wallet.currency_code for wallet in wallets})
+        .values_list('code', 'current_price_usd')
+    )
+    
     for wallet in wallets:
         if wallet.currency_code == 'USD':
             value_usd = wallet.balance
         else:
-            try:
-                crypto = CryptoCurrency.objects.get(code=wallet.currency_code)
-                value_usd = wallet.balance * crypto.current_price_usd
-            except CryptoCurrency.DoesNotExist:
-                value_usd = Decimal('0.00')
+            value_usd = wallet.balance * crypto_prices.get(wallet.currency_code, Decimal('0.00'))
         
         wallet_data.append({
             'wallet': wallet,
@@ -828,30 +842,29 @@ def create_crypto_trade(request, base_code, quote_code):
             conversion_rate = quote_crypto.current_price_usd / base_crypto.current_price_usd
             quote_amount = amount * conversion_rate
 
-            # Validate sufficient balance
-            if base_wallet.balance < amount:
-                raise ValueError(f"Insufficient {base_code} balance")
-
             # Create and execute the transaction
-            transaction = Transaction.objects.create(
-                user=request.user,
-                transaction_type='convert',
-                from_wallet=base_wallet,
-                to_wallet=quote_wallet,
-                from_amount=amount,
-                to_amount=quote_amount,
-                price_usd=base_crypto.current_price_usd,
-                status='completed'
-            )
+            with transaction.atomic():
+                # Update wallet balances; the ledger refuses to overdraw the base wallet
+                try:
+                    ledger.transfer(base_wallet, quote_wallet, amount, quote_amount)
+                except ledger.InsufficientFunds:
+                    raise ValueError(f"Insufficient {base_code} balance")
 
-            # Update wallet balances
-            base_wallet.balance -= amount
-            quote_wallet.balance += quote_amount
-            base_wallet.save()
-            quote_wallet.save()
+                tx = Transaction.objects.create(
+                    user=request.user,
+                    transaction_type='convert',
+                    amount=amount,
+                    currency=base_code,
+                    native_amount=amount * base_crypto.current_price_usd,
+                    native_currency='USD',
+                    status='completed',
+                    description=f"Converted {amount} {base_code} to {quote_amount} {quote_code}",
+                    from_wallet=base_wallet,
+                    to_wallet=quote_wallet
+                )
 
             messages.success(request, f"Successfully converted {amount} {base_code} to {quote_amount:.8f} {quote_code}")
-            return redirect('transaction_detail', transaction_id=transaction.id)
+            return redirect('transaction_detail', transaction_id=tx.id)
 
         except (ValueError, TypeError) as e:
             messages.error(request, f"Error creating trade: {str(e)}")
@@ -916,35 +929,30 @@ def convert_crypto(request, from_code, to_code):
             if amount <= 0:
                 raise ValueError("Amount must be greater than zero")
                 
-            if from_wallet.balance < amount:
-                messages.error(request, f"Insufficient {from_code} balance")
-                return redirect('convert_crypto', from_code=from_code, to_code=to_code)
-                
             # Calculate conversion rate using USD prices
             conversion_rate = to_crypto.current_price_usd / from_crypto.current_price_usd
             converted_amount = amount * conversion_rate
             
             # Create and execute the conversion transaction
-            with transaction.atomic():
-                tx = Transaction.objects.create(
-                    user=request.user,
-                    transaction_type='convert',
-                    amount=amount,
-                    currency=from_code,
-                    native_amount=amount * from_crypto.current_price_usd,
-                    native_currency='USD',
-                    status='completed',
-                    description=f"Converted {amount} {from_code} to {converted_amount} {to_code}",
-                    from_wallet=from_wallet,
-                    to_wallet=to_wallet
-                )
-                
-                # Update wallet balances
-                from_wallet.balance -= amount
-                from_wallet.save()
-                
-                to_wallet.balance += converted_amount
-                to_wallet.save()
+            try:
+                with transaction.atomic():
+                    # Update wallet balances
+                    ledger.transfer(from_wallet, to_wallet, amount, converted_amount)
+                    tx = Transaction.objects.create(
+                        user=request.user,
+                        transaction_type='convert',
+                        amount=amount,
+                        currency=from_code,
+                        native_amount=amount * from_crypto.current_price_usd,
+                        native_currency='USD',
+                        status='completed',
+                        description=f"Converted {amount} {from_code} to {converted_amount} {to_code}",
+                        from_wallet=from_wallet,
+                        to_wallet=to_wallet
+                    )
+            except ledger.InsufficientFunds:
+                messages.error(request, f"Insufficient {from_code} balance")
+                return redirect('convert_crypto', from_code=from_code, to_code=to_code)
                 
             messages.success(request, f"Successfully converted {amount} {from_code} to {converted_amount:.8f} {to_code}")
             return redirect('dashboard')
@@ -988,39 +996,39 @@ def payment_methods(request):
     return render(request, 'trading_hub/payment_methods.html')
 
 def order_book(request):
-    limit_orders = LimitOrder.objects.all()
-    stop_orders = StopOrder.objects.all()
+    code = request.GET.get('code', 'BTC').upper()
+    book = order_books.get(code)
     context = {
-        'limit_orders': limit_orders,
-        'stop_orders': stop_orders,
+        'code': code,
+        'cryptocurrencies': CryptoCurrency.objects.order_by('code'),
+        'top_of_book': book.top_of_book(),
+        'depth': book.depth(levels=25),
     }
     return render(request, 'trading_hub/order_book.html', context)
 
 def depth_chart_data(request):
-    limit_orders = LimitOrder.objects.all().order_by('limit_price')
-    stop_orders = StopOrder.objects.all().order_by('stop_price')
+    code = request.GET.get('code', 'BTC').upper()
+    depth = order_books.get(code).depth(levels=100)
 
+    # Cumulative amounts walking away from the best bid and best ask
+    labels = []
     bids = []
     asks = []
-    labels = []
 
-    for order in limit_orders:
-        if order.side == 'buy':
-            bids.append(order.amount)
-            labels.append(order.limit_price)
-        else:
-            asks.append(order.amount)
-            labels.append(order.limit_price)
+    running = Decimal('0')
+    for level in depth['bids']:
+        running += level['amount']
+        labels.append(float(level['price']))
+        bids.append(float(running))
 
-    for order in stop_orders:
-        if order.side == 'buy':
-            bids.append(order.amount)
-            labels.append(order.stop_price)
-        else:
-            asks.append(order.amount)
-            labels.append(order.stop_price)
+    running = Decimal('0')
+    for level in depth['asks']:
+        running += level['amount']
+        labels.append(float(level['price']))
+        asks.append(float(running))
 
     data = {
+        'code': code,
         'labels': labels,
         'bids': bids,
         'asks': asks,
@@ -1028,6 +1036,159 @@ def depth_chart_data(request):
 
     return JsonResponse(data)
 
+def _chart_series(request, code):
+    """Build (once per request) the ChartSeries the chart-data view serves"""
+    if not hasattr(request, 'chart_series'):
+        try:
+            request.chart_series = ChartSeries(
+                code,
+                range_key=request.GET.get('range', '1d'),
+                points=request.GET.get('points', DEFAULT_POINTS),
+            )
+        except ValueError:
+            request.chart_series = None
+    return request.chart_series
+
+def chart_data_etag(request, code):
+    series = _chart_series(request, code)
+    if series is None or not CryptoCurrency.objects.filter(code=series.code).exists():
+        return None
+    return series.etag()
+
+@condition(etag_func=chart_data_etag)
+def price_chart_data(request, code):
+    """
+    Downsampled price series for charts
+
+    Clients polling with If-None-Match get a 304 until a new tick lands, and
+    the downsampled payload is computed once per tick and shared through the
+    cache.
+    """
+    series = _chart_series(request, code)
+    if series is None:
+        return JsonResponse({'error': 'Invalid range or points'}, status=400)
+    if not CryptoCurrency.objects.filter(code=series.code).exists():
+        return JsonResponse({'error': f'Cryptocurrency {code} not found'}, status=404)
+
+    data = cache.get_or_set(
+        f'chart_data_{series.etag()}',
+        series.data,
+        getattr(settings, 'CHART_DATA_CACHE_TIMEOUT', 300),
+    )
+    response = JsonResponse(data)
+    patch_cache_control(response, max_age=getattr(settings, 'CHART_DATA_MAX_AGE', 5))
+    return response
+
+# Candles read before the requested range so indicators are warmed up at its start
+INDICATOR_WARMUP = 100
+
+def price_indicators(request, code):
+    """
+    Technical indicators over the candles for a chart range
+
+    Query parameters: range (as for the chart data), resolution (defaults to
+    the one the chart would use), indicators (comma separated, defaults to
+    all of them) and period (overrides the look-back of sma, ema, rsi,
+    bollinger and atr).
+    """
+    code = code.upper()
+    range_key = request.GET.get('range', '1d')
+    names = [name for name in request.GET.get('indicators', ','.join(indicators.INDICATORS)).split(',') if name]
+    resolution = request.GET.get('resolution')
+    try:
+        period = int(request.GET['period']) if request.GET.get('period') else None
+    except ValueError:
+        period = 0
+    if (range_key not in RANGES or (resolution and resolution not in RESOLUTIONS)
+            or any(name not in indicators.INDICATORS for name in names) or period is not None and period < 2):
+        return JsonResponse({'error': 'Invalid range, resolution, indicators or period'}, status=400)
+    if not CryptoCurrency.objects.filter(code=code).exists():
+        return JsonResponse({'error': f'Cryptocurrency {code} not found'}, status=404)
+
+    end = timezone.now()
+    start = end - RANGES[range_key] if RANGES[range_key] else EPOCH
+    resolution = resolution or resolution_for_range(start, end)
+    warmup = timedelta(seconds=INDICATOR_WARMUP * RESOLUTIONS[resolution])
+    resolution, candles = get_candles(code, start - warmup, end, resolution, max_points=MAX_POINTS + INDICATOR_WARMUP)
+
+    columns = indicators.candle_columns(candles)
+    # Only the requested range is returned; the warm-up candles just prime the indicators
+    first = next((i for i, candle in enumerate(candles) if candle['bucket_start'] >= start), len(candles))
+
+    data = {
+        'code': code,
+        'range': range_key,
+        'resolution': resolution,
+        'timestamps': [int(candle['bucket_start'].timestamp() * 1000) for candle in candles[first:]],
+        'close': indicators.to_json(columns['close'][first:]),
+        'indicators': {
+            name: {
+                output: indicators.to_json(values[first:])
+                for output, values in indicators.compute(name, columns, period).items()
+            }
+            for name in names
+        },
+    }
+    response = JsonResponse(data)
+    patch_cache_control(response, max_age=getattr(settings, 'CHART_DATA_MAX_AGE', 5))
+    return response
+
+@login_required
+@require_POST
+def api_backtest(request):
+    """
+    Backtest order strategies over a currency's price history
+
+    Takes a JSON body with code, optional ISO 8601 start and end, a list of
+    strategy specs (see services.backtest) and/or a list of the user's own
+    orders as {"type": "limit" | "stop" | "recurring", "id": ...} to replay.
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Request body must be JSON'}, status=400)
+
+    order_models = {'limit': LimitOrder, 'stop': StopOrder, 'recurring': RecurringOrder}
+    try:
+        code = str(data.get('code', '')).upper()
+        if not CryptoCurrency.objects.filter(code=code).exists():
+            return JsonResponse({'error': f'Cryptocurrency {code} not found'}, status=404)
+
+        specs = list(data.get('strategies', []))
+        for reference in data.get('orders', []):
+            model = order_models.get(reference.get('type'))
+            if model is None:
+                raise BacktestError("order type must be limit, stop or recurring")
+            order = model.objects.filter(id=reference.get('id'), user=request.user, cryptocurrency_id=code).first()
+            if order is None:
+                return JsonResponse({'error': f"Order {reference.get('id')} not found"}, status=404)
+            specs.append(spec_for_order(order))
+        if not specs:
+            raise BacktestError("at least one strategy or order is required")
+
+        start = parse_spec_datetime(data, 'start')
+        end = parse_spec_datetime(data, 'end')
+        return JsonResponse(Backtest.for_currency(code, start, end).run(specs))
+    except (BacktestError, AttributeError, TypeError, ValidationError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@staff_member_required
+def request_metrics(request):
+    """Latency percentiles and database load per URL name, across all workers"""
+    endpoints = registry.collect()
+    return JsonResponse({
+        'endpoints': {name: stats.summary() for name, stats in sorted(endpoints.items())},
+        'profiles': recent_profiles(),
+    })
+
+@staff_member_required
+def request_profile(request, profile_id):
+    """A sampled profile's stacks, in the collapsed format flamegraph tools read"""
+    profile = get_profile(profile_id)
+    if profile is None:
+        return JsonResponse({'error': f'Profile {profile_id} not found'}, status=404)
+    return HttpResponse(profile['stacks'], content_type='text/plain')
+
 @login_required
 def device_list(request):
     devices = Device.objects.filter(user=request.user)
@@ -1705,23 +1866,20 @@ def create_tax_report(request):
             report_format = form.cleaned_data['report_format']
             include_unrealized = form.cleaned_data['include_unrealized_gains']
             
-            # Initialize tax calculator
-            calculator = TaxCalculator(
-                user=request.user,
-                tax_year=tax_year,
-                cost_basis_method=cost_basis_method
-            )
-            
-            # Generate the report
-            tax_report = calculator.generate_tax_report(
+            # Generated by a background worker; the page polls tax_report_status
+            tax_report = enqueue_tax_report(
+                request.user,
+                tax_year,
+                cost_basis_method,
                 report_format=report_format,
                 include_unrealized=include_unrealized
             )
             
-            messages.success(request, "Tax report generated successfully.")
+            messages.info(request, "Your tax report is being generated.")
             return redirect('tax_report_detail', report_id=tax_report.id)
     else:
-        form = TaxReportForm()
+        # Reports under the user's own method are read from the tax lot ledger
+        form = TaxReportForm(initial={'cost_basis_method': method_for(request.user)})
     
     context = {
         'form': form
@@ -1755,6 +1913,29 @@ def tax_report_detail(request, report_id):
     
     return render(request, 'trading_hub/tax/report_detail.html', context)
 
+@login_required
+@require_http_methods(["GET"])
+def tax_report_status(request, report_id):
+    """Progress of a tax report, polled while it is generated"""
+    tax_report = get_object_or_404(
+        TaxReport.objects.only('id', 'user_id', 'status', 'progress', 'error_message'),
+        id=report_id,
+        user=request.user
+    )
+    data = {
+        'id': str(tax_report.id),
+        'status': tax_report.status,
+        'progress': tax_report.progress,
+    }
+    if tax_report.status == 'completed':
+        data['download_url'] = reverse('download_tax_report', args=[tax_report.id])
+    elif tax_report.status == 'failed':
+        data['error'] = tax_report.error_message
+    
+    response = JsonResponse(data)
+    patch_cache_control(response, no_cache=True, no_store=True)
+    return response
+
 @login_required
 @require_http_methods(["GET"])
 def download_tax_report(request, report_id):
@@ -1831,7 +2012,8 @@ def api_calculate_cost_basis(request):
     try:
         data = json.loads(request.body)
         crypto_code = data.get('crypto_code')
-        cost_basis_method = data.get('cost_basis_method', 'fifo')
+        # Defaults to the user's own method, which the tax lot ledger answers
+        cost_basis_method = data.get('cost_basis_method')
         tax_year = data.get('tax_year', timezone.now().year)
         
         if not crypto_code: